@@ -8,14 +8,29 @@
 """
 
 import heapq
+import os
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
 
 import networkx as nx
 import numpy as np
 from scipy.spatial.distance import euclidean
-import matplotlib.pyplot as plt
 
 from CDT_Graph import SG_graph
-from util import segment_dividers
+from CSR_Graph import CSR_graph
+from Instrument import count, counters, show_progress, timed
+from Landmark import Landmarks
+from Layout import Layout
+from Path_Cache import PathCache, layout_fingerprint, path_in_region
+from Route_Array import RouteArray
+from util import segment_dividers, unique_rows_in_order
+
+
+# pairwise (默认) 每对角点用 Manhattan 启发式搜索一次, 该启发式会高估欧氏距离,
+# 得到的路径可能不是最短; multi 与 bidirectional 返回真正最短的角点对,
+# 所以切换模式会改变实际布局上的路径与总长度
+SEARCH_MODES: tuple[str, ...] = ("pairwise", "multi", "bidirectional")
+DETAIL_MODES: tuple[str, ...] = ("greedy", "dp", "funnel")
 
 
 class PriorityQueue:
@@ -25,6 +40,9 @@ class PriorityQueue:
 
     def __init__(self) -> None:
         self.elements: list[tuple[float, tuple[np.float64, np.float64]]] = []
+        # 入队次数与出队时丢弃的过期条目数
+        self.pushed: int = 0
+        self.stale: int = 0
 
     def empty(self) -> bool:
         """
@@ -37,12 +55,56 @@ class PriorityQueue:
         put the item into the priorityqueue
         """
         heapq.heappush(self.elements, (priority, point))
+        self.pushed += 1
 
-    def get(self) -> tuple[np.float64, np.float64]:
+    def get(
+        self, closed: set | np.ndarray | None = None
+    ) -> tuple[np.float64, np.float64] | None:
         """
         get the top one
+        entries whose item is already in closed are stale and discarded,
+        closed is a set of items or a boolean array indexed by int ids,
+        return None when only stale entries are left
+        """
+        is_mask: bool = isinstance(closed, np.ndarray)
+        while self.elements:
+            point = heapq.heappop(self.elements)[1]
+            if closed is not None and (closed[point] if is_mask else point in closed):
+                self.stale += 1
+                continue
+            return point
+        return None
+
+    def top_priority(self) -> float:
+        """
+        the priority of the top one without popping it
+        """
+        return self.elements[0][0]
+
+
+class SearchBuffers:
+    """
+    came_from / cost_so_far arrays shared by consecutive CSR searches
+    instead of allocating them for every corner pair, the arrays a search
+    returns stay valid until the next search with the same buffers
+    """
+
+    def __init__(self, num_nodes: int = 0) -> None:
+        self.came_from: np.ndarray = np.empty(num_nodes, dtype=np.int32)
+        self.cost_so_far: np.ndarray = np.empty(num_nodes)
+
+    def take(self, num_nodes: int) -> tuple[np.ndarray, np.ndarray]:
         """
-        return heapq.heappop(self.elements)[1]
+        clean arrays for a graph with num_nodes nodes
+        """
+        if len(self.came_from) < num_nodes:
+            self.__init__(num_nodes)
+        # 原地重置比重新分配快, 也比记录写过的节点再逐个重置快
+        came_from: np.ndarray = self.came_from[:num_nodes]
+        cost_so_far: np.ndarray = self.cost_so_far[:num_nodes]
+        came_from.fill(-1)
+        cost_so_far.fill(np.inf)
+        return came_from, cost_so_far
 
 
 def heuristic(
@@ -67,13 +129,33 @@ def Euclidean(
     return np.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
 
 
+def record_search(
+    stats: dict | None, frontier: PriorityQueue | tuple[PriorityQueue, ...], expanded: int
+) -> None:
+    """
+    add the counters of one search into stats
+    a bidirectional search passes both of its frontiers
+    """
+    if stats is None:
+        return
+    frontiers = frontier if isinstance(frontier, tuple) else (frontier,)
+    stats["searches"] = stats.get("searches", 0) + 1
+    stats["expanded"] = stats.get("expanded", 0) + expanded
+    stats["pushed"] = stats.get("pushed", 0) + sum(each.pushed for each in frontiers)
+    stats["stale"] = stats.get("stale", 0) + sum(each.stale for each in frontiers)
+
+
 def a_star_search(
     graph: nx.Graph,
     start: tuple[np.float64, np.float64],
     goal: tuple[np.float64, np.float64],
+    stats: dict | None = None,
 ):
     """
     a searching algorithm to find the best path
+    expanded nodes go into a closed set and are never relaxed again,
+    so stale heap entries are dropped
+    pass a dict as stats to collect the expanded / pushed counters
     """
     frontier = PriorityQueue()
     frontier.put(start, 0)
@@ -81,14 +163,22 @@ def a_star_search(
     cost_so_far: dict[tuple[np.float64, np.float64], float] = {}
     came_from[start] = None
     cost_so_far[start] = 0
+    closed: set = set()
+    expanded: int = 0
 
     while not frontier.empty():
-        current: tuple[np.float64, np.float64] = frontier.get()
+        current: tuple[np.float64, np.float64] = frontier.get(closed)
+        if current is None:
+            break
 
         if current == goal:
             break
 
+        closed.add(current)
+        expanded += 1
         for next in list(graph.neighbors(current)):
+            if next in closed:
+                continue
             new_cost = cost_so_far[current] + euclidean(current, next)
             if next not in cost_so_far or new_cost < cost_so_far[next]:
                 cost_so_far[next] = new_cost
@@ -96,9 +186,349 @@ def a_star_search(
                 frontier.put(next, priority)
                 came_from[next] = current
 
+    record_search(stats, frontier, expanded)
+    return came_from, cost_so_far
+
+
+def a_star_search_csr(
+    graph: CSR_graph,
+    start: int,
+    goal: int,
+    stats: dict | None = None,
+    landmarks: Landmarks | None = None,
+    buffers: SearchBuffers | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    a searching algorithm on the CSR graph, nodes are int ids
+    came_from[start] is start itself and unreached nodes are -1
+    with landmarks the ALT lower bound replaces the Manhattan heuristic
+    with buffers the returned arrays are reused by the next search
+    """
+    if buffers is None:
+        buffers = SearchBuffers()
+    came_from, cost_so_far = buffers.take(graph.num_nodes)
+    goal_x, goal_y = graph.coords[goal]
+    frontier = PriorityQueue()
+    frontier.put(start, 0)
+    came_from[start] = start
+    cost_so_far[start] = 0
+    closed: np.ndarray = np.zeros(graph.num_nodes, dtype=bool)
+    expanded: int = 0
+
+    while not frontier.empty():
+        current: int = frontier.get(closed)
+        if current is None:
+            break
+
+        if current == goal:
+            break
+
+        closed[current] = True
+        expanded += 1
+        # 一次性松弛当前节点的全部邻边, 已关闭的节点不再打开
+        lo, hi = graph.indptr[current], graph.indptr[current + 1]
+        nbrs: np.ndarray = graph.indices[lo:hi]
+        new_cost: np.ndarray = cost_so_far[current] + graph.weights[lo:hi]
+        better: np.ndarray = (new_cost < cost_so_far[nbrs]) & ~closed[nbrs]
+        if not better.any():
+            continue
+        nbrs, new_cost = nbrs[better], new_cost[better]
+        cost_so_far[nbrs] = new_cost
+        came_from[nbrs] = current
+        if landmarks is None:
+            nbr_pos: np.ndarray = graph.coords[nbrs]
+            priority: np.ndarray = (
+                new_cost
+                + np.abs(nbr_pos[:, 0] - goal_x)
+                + np.abs(nbr_pos[:, 1] - goal_y)
+            )
+        else:
+            priority = new_cost + landmarks.lower_bound(nbrs, [goal])
+        for next, next_priority in zip(nbrs.tolist(), priority.tolist()):
+            frontier.put(next, next_priority)
+
+    record_search(stats, frontier, expanded)
     return came_from, cost_so_far
 
 
+def multi_a_star_search(
+    graph: nx.Graph,
+    starts: list[tuple[np.float64, np.float64]],
+    goals: list[tuple[np.float64, np.float64]],
+    stats: dict | None = None,
+):
+    """
+    one search from all starts at cost 0, stopping at the first settled goal
+    h(n) is the Euclidean distance to the nearest goal, which never
+    overestimates, so the first settled goal is the truly closest pair;
+    equal-cost ties prefer the earlier start and then the earlier goal
+    the pairwise loop uses the Manhattan heuristic, which can overestimate,
+    so its path may be longer than this one and is not always the same
+    """
+    goal_pos: np.ndarray = np.array(goals, dtype=np.float64)
+    goal_order: dict = {}
+    for idx, goal in enumerate(goals):
+        goal_order.setdefault(goal, idx)
+
+    def goal_heuristic(point: tuple[np.float64, np.float64]) -> float:
+        return np.sqrt(((goal_pos - point) ** 2).sum(axis=1)).min()
+
+    frontier = PriorityQueue()
+    came_from: dict[tuple[np.float64, np.float64], tuple[np.float64, np.float64]] = {}
+    cost_so_far: dict[tuple[np.float64, np.float64], float] = {}
+    # 记录每个节点来自哪个起点
+    source: dict[tuple[np.float64, np.float64], int] = {}
+    for idx, start in enumerate(starts):
+        if start in source or not graph.has_node(start):
+            continue
+        came_from[start] = None
+        cost_so_far[start] = 0
+        source[start] = idx
+        frontier.put(start, goal_heuristic(start))
+
+    best = None
+    closed: set = set()
+    expanded: int = 0
+    while not frontier.empty():
+        if best is not None and frontier.top_priority() > best[0]:
+            break
+        current: tuple[np.float64, np.float64] = frontier.get(closed)
+        if current is None:
+            break
+        closed.add(current)
+
+        if current in goal_order:
+            # 同代价的终点继续收集, 按(起点, 终点)顺序取第一个
+            rank = (cost_so_far[current], source[current], goal_order[current])
+            if best is None or rank < best:
+                best = rank
+            continue
+
+        expanded += 1
+        for next in list(graph.neighbors(current)):
+            if next in closed:
+                continue
+            new_cost = cost_so_far[current] + euclidean(current, next)
+            if (
+                next not in cost_so_far
+                or new_cost < cost_so_far[next]
+                or (new_cost == cost_so_far[next] and source[current] < source[next])
+            ):
+                cost_so_far[next] = new_cost
+                source[next] = source[current]
+                priority = new_cost + goal_heuristic(next)
+                frontier.put(next, priority)
+                came_from[next] = current
+
+    record_search(stats, frontier, expanded)
+    if best is None:
+        return came_from, cost_so_far, None, None
+    return came_from, cost_so_far, starts[best[1]], goals[best[2]]
+
+
+def multi_a_star_search_csr(
+    graph: CSR_graph,
+    starts: np.ndarray,
+    goals: np.ndarray,
+    stats: dict | None = None,
+    landmarks: Landmarks | None = None,
+    buffers: SearchBuffers | None = None,
+) -> tuple[np.ndarray, np.ndarray, int, int]:
+    """
+    multi_a_star_search on the CSR graph, returns the start and goal ids (-1 if none)
+    with landmarks the heuristic is the ALT bound to the nearest goal
+    with buffers the returned arrays are reused by the next search
+    """
+    if buffers is None:
+        buffers = SearchBuffers()
+    came_from, cost_so_far = buffers.take(graph.num_nodes)
+    source: np.ndarray = np.full(graph.num_nodes, len(starts), dtype=np.int32)
+    goal_order: np.ndarray = np.full(graph.num_nodes, -1, dtype=np.int32)
+    for idx, goal in reversed(list(enumerate(goals.tolist()))):
+        if goal >= 0:
+            goal_order[goal] = idx
+    valid_goals: np.ndarray = goals[goals >= 0]
+    goal_pos: np.ndarray = graph.coords[valid_goals]
+    if len(goal_pos) == 0:
+        return came_from, cost_so_far, -1, -1
+
+    def goal_heuristic(nodes: np.ndarray) -> np.ndarray:
+        if landmarks is not None:
+            return landmarks.lower_bound(nodes, valid_goals)
+        delta: np.ndarray = graph.coords[nodes][:, None, :] - goal_pos[None, :, :]
+        return np.sqrt((delta**2).sum(axis=2)).min(axis=1)
+
+    frontier = PriorityQueue()
+    for idx, start in enumerate(starts.tolist()):
+        if start < 0 or source[start] < len(starts):
+            continue
+        came_from[start] = start
+        cost_so_far[start] = 0
+        source[start] = idx
+        frontier.put(start, float(goal_heuristic(np.array([start]))[0]))
+
+    best = None
+    closed: np.ndarray = np.zeros(graph.num_nodes, dtype=bool)
+    expanded: int = 0
+    while not frontier.empty():
+        if best is not None and frontier.top_priority() > best[0]:
+            break
+        current: int = frontier.get(closed)
+        if current is None:
+            break
+        closed[current] = True
+
+        if goal_order[current] >= 0:
+            rank = (cost_so_far[current], source[current], goal_order[current])
+            if best is None or rank < best:
+                best = rank
+            continue
+
+        expanded += 1
+        lo, hi = graph.indptr[current], graph.indptr[current + 1]
+        nbrs: np.ndarray = graph.indices[lo:hi]
+        new_cost: np.ndarray = cost_so_far[current] + graph.weights[lo:hi]
+        better: np.ndarray = (
+            (new_cost < cost_so_far[nbrs])
+            | ((new_cost == cost_so_far[nbrs]) & (source[current] < source[nbrs]))
+        ) & ~closed[nbrs]
+        if not better.any():
+            continue
+        nbrs, new_cost = nbrs[better], new_cost[better]
+        cost_so_far[nbrs] = new_cost
+        came_from[nbrs] = current
+        source[nbrs] = source[current]
+        priority: np.ndarray = new_cost + goal_heuristic(nbrs)
+        for next, next_priority in zip(nbrs.tolist(), priority.tolist()):
+            frontier.put(next, next_priority)
+
+    record_search(stats, frontier, expanded)
+    if best is None:
+        return came_from, cost_so_far, -1, -1
+    return came_from, cost_so_far, int(starts[best[1]]), int(goals[best[2]])
+
+
+def bidirectional_a_star_search_csr(
+    graph: CSR_graph,
+    starts: np.ndarray,
+    goals: np.ndarray,
+    stats: dict | None = None,
+    landmarks: Landmarks | None = None,
+) -> tuple[int, int, np.ndarray | None]:
+    """
+    multi-source / multi-target A* from both ends at once
+    both searches use the average potential p(v) = (h_goal(v) - h_start(v)) / 2,
+    forward keys are g + p and backward keys are g - p, so both see
+    non-negative reduced costs and stop once the two smallest keys add up
+    to the cheapest meeting cost found so far
+    with landmarks h_goal / h_start are ALT bounds instead of Euclidean ones
+    return the start id, goal id (-1 if none) and the node ids of the path
+    """
+    valid_starts: np.ndarray = starts[starts >= 0]
+    valid_goals: np.ndarray = goals[goals >= 0]
+    if len(valid_starts) == 0 or len(valid_goals) == 0:
+        return -1, -1, None
+
+    def lower_bound(nodes: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        if landmarks is not None:
+            return landmarks.lower_bound(nodes, ends)
+        delta: np.ndarray = graph.coords[nodes][:, None, :] - graph.coords[ends][None, :, :]
+        return np.sqrt((delta**2).sum(axis=2)).min(axis=1)
+
+    def potential(nodes: np.ndarray) -> np.ndarray:
+        return (lower_bound(nodes, valid_goals) - lower_bound(nodes, valid_starts)) / 2
+
+    # 下标0为正向 (从起点出发), 1为反向 (从终点出发)
+    came_from: list[np.ndarray] = [
+        np.full(graph.num_nodes, -1, dtype=np.int32) for _ in range(2)
+    ]
+    cost_so_far: list[np.ndarray] = [np.full(graph.num_nodes, np.inf) for _ in range(2)]
+    frontier: tuple[PriorityQueue, PriorityQueue] = (PriorityQueue(), PriorityQueue())
+    closed: tuple[np.ndarray, np.ndarray] = (
+        np.zeros(graph.num_nodes, dtype=bool),
+        np.zeros(graph.num_nodes, dtype=bool),
+    )
+    sign: tuple[float, float] = (1.0, -1.0)
+    for side, ends in enumerate((valid_starts, valid_goals)):
+        came_from[side][ends] = ends
+        cost_so_far[side][ends] = 0
+        for end, key in zip(ends.tolist(), (sign[side] * potential(ends)).tolist()):
+            frontier[side].put(end, key)
+
+    best_cost: float = np.inf
+    meet: int = -1
+    # 起点本身就是终点
+    shared: np.ndarray = valid_starts[np.isin(valid_starts, valid_goals)]
+    if len(shared):
+        best_cost, meet = 0.0, int(shared[0])
+
+    expanded: int = 0
+    while not frontier[0].empty() and not frontier[1].empty():
+        if frontier[0].top_priority() + frontier[1].top_priority() >= best_cost:
+            break
+        # 扩展键值较小的一侧
+        side: int = int(frontier[1].top_priority() < frontier[0].top_priority())
+        current: int = frontier[side].get(closed[side])
+        if current is None:
+            continue
+        closed[side][current] = True
+        expanded += 1
+
+        lo, hi = graph.indptr[current], graph.indptr[current + 1]
+        nbrs: np.ndarray = graph.indices[lo:hi]
+        new_cost: np.ndarray = cost_so_far[side][current] + graph.weights[lo:hi]
+        better: np.ndarray = (new_cost < cost_so_far[side][nbrs]) & ~closed[side][nbrs]
+        if not better.any():
+            continue
+        nbrs, new_cost = nbrs[better], new_cost[better]
+        cost_so_far[side][nbrs] = new_cost
+        came_from[side][nbrs] = current
+
+        # 与另一侧已到达的节点相遇
+        through: np.ndarray = new_cost + cost_so_far[1 - side][nbrs]
+        idx: int = int(np.argmin(through))
+        if through[idx] < best_cost:
+            best_cost, meet = float(through[idx]), int(nbrs[idx])
+
+        priority: np.ndarray = new_cost + sign[side] * potential(nbrs)
+        for next, next_priority in zip(nbrs.tolist(), priority.tolist()):
+            frontier[side].put(next, next_priority)
+
+    record_search(stats, frontier, expanded)
+    if meet < 0:
+        return -1, -1, None
+    forward: np.ndarray = reconstruct_path_csr(
+        came_from[0], _search_root(came_from[0], meet), meet
+    )
+    backward: np.ndarray = reconstruct_path_csr(
+        came_from[1], _search_root(came_from[1], meet), meet
+    )
+    return int(forward[0]), int(backward[0]), np.concatenate((forward, backward[-2::-1]))
+
+
+def _search_root(came_from: np.ndarray, node: int) -> int:
+    """
+    follow came_from up to the start of the search tree
+    """
+    while came_from[node] != node:
+        node = int(came_from[node])
+    return node
+
+
+def reconstruct_path_csr(came_from: np.ndarray, start: int, goal: int) -> np.ndarray:
+    """
+    walk back from goal to start and return the node ids in order
+    """
+    if came_from[goal] < 0:  # no path was found
+        return np.empty(0, dtype=np.int32)
+    path: list[int] = [goal]
+    current: int = goal
+    while current != start:
+        current = int(came_from[current])
+        path.append(current)
+    return np.array(path[::-1], dtype=np.int32)
+
+
 def reconstruct_path(
     came_from: dict[tuple[np.float64, np.float64], tuple[np.float64, np.float64]],
     start: tuple[np.float64, np.float64],
@@ -119,7 +549,65 @@ def reconstruct_path(
     return path
 
 
-def find_shortest_path(start_name: str, targe_name: str, compo_dict: dict):
+def find_shortest_path(
+    start_name: str,
+    targe_name: str,
+    compo_dict: dict,
+    graph: nx.Graph | CSR_graph | None = None,
+    mode: str = "pairwise",
+    stats: dict | None = None,
+    landmarks: Landmarks | None = None,
+    buffers: SearchBuffers | None = None,
+):
+    """
+    search the shortest path between two components' corners
+    mode "pairwise" runs one A* per corner pair,
+    mode "multi" runs a single multi-source / multi-target A*,
+    mode "bidirectional" (CSR graph only) searches from both components at once
+    multi and bidirectional return the shortest corner pair, pairwise (the
+    default) uses the inadmissible Manhattan heuristic and may return a
+    longer path, so the modes give different routes on real layouts
+    search counters are added into stats when it is given (or into the
+    "search" counters of the active collector),
+    landmarks (CSR graph only) switch the heuristic to the ALT bound,
+    buffers (CSR graph, pairwise and multi) are reused across calls
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"unknown search mode {mode}, expect one of {SEARCH_MODES}")
+    if stats is None:
+        stats = counters("search")
+    if graph is None:
+        graph = sg.graph
+    if isinstance(graph, CSR_graph):
+        return _find_shortest_path_csr(
+            graph,
+            compo_dict[start_name],
+            compo_dict[targe_name],
+            mode,
+            stats,
+            landmarks,
+            buffers,
+        )
+    if landmarks is not None:
+        raise ValueError("landmarks are indexed by node id and need a CSR_graph")
+    if mode == "bidirectional":
+        raise ValueError("the bidirectional search runs on a CSR_graph")
+    if mode == "multi":
+        starts = [tuple(np.float64(x) for x in start) for start in compo_dict[start_name]]
+        targets = [
+            tuple(np.float64(x) for x in target) for target in compo_dict[targe_name]
+        ]
+        came_from, _, best_start, best_target = multi_a_star_search(
+            graph, starts, targets, stats
+        )
+        if best_target is None:
+            return None, None, None
+        return (
+            best_start,
+            best_target,
+            reconstruct_path(came_from, best_start, best_target),
+        )
+
     shortest_path = None
     shortest_distance = float("inf")
     best_start = None
@@ -130,7 +618,7 @@ def find_shortest_path(start_name: str, targe_name: str, compo_dict: dict):
             start = tuple(np.float64(x) for x in start)
             target = tuple(np.float64(x) for x in target)
             # print(start,target)
-            came_from, cost_so_far = a_star_search(sg.graph, start, target)
+            came_from, cost_so_far = a_star_search(graph, start, target, stats)
             if target in cost_so_far and cost_so_far[target] < shortest_distance:
                 shortest_distance = cost_so_far[target]
                 shortest_path = reconstruct_path(came_from, start, target)
@@ -140,14 +628,123 @@ def find_shortest_path(start_name: str, targe_name: str, compo_dict: dict):
     return best_start, best_target, shortest_path
 
 
-def construct_path(
-    data_path: str, nearest_incomp: dict, nearest_outcomp: dict, compo_dict: dict
+def _find_shortest_path_csr(
+    graph: CSR_graph,
+    start_pos: np.ndarray,
+    target_pos: np.ndarray,
+    mode: str = "pairwise",
+    stats: dict | None = None,
+    landmarks: Landmarks | None = None,
+    buffers: SearchBuffers | None = None,
 ):
-    all_path: list[list[tuple[np.float64, np.float64]]] = []
-    with open(data_path, mode="r", encoding="utf-8") as f:
-        line = f.read().split("\n")
-        # print(line)
-    route_list = [lin.split("\t") for lin in line]
+    """
+    same as find_shortest_path but searching on int node ids
+    """
+    best_start, best_target, shortest_path = _search_ids_csr(
+        graph,
+        graph.node_ids(start_pos),
+        graph.node_ids(target_pos),
+        mode,
+        stats,
+        landmarks,
+        buffers,
+    )
+    if shortest_path is None:
+        return None, None, None
+    # 出口处再转换回坐标元组, 下游接口保持不变
+    best_start, best_target = graph.to_points([best_start, best_target])
+    return best_start, best_target, graph.to_points(shortest_path)
+
+
+def _search_ids_csr(
+    graph: CSR_graph,
+    start_ids: np.ndarray,
+    target_ids: np.ndarray,
+    mode: str = "pairwise",
+    stats: dict | None = None,
+    landmarks: Landmarks | None = None,
+    buffers: SearchBuffers | None = None,
+) -> tuple[int | None, int | None, np.ndarray | None]:
+    """
+    dispatch the search mode, the path stays as node ids
+    the bidirectional search keeps its own arrays and ignores buffers
+    """
+    if mode == "multi":
+        return _multi_search_csr(graph, start_ids, target_ids, stats, landmarks, buffers)
+    if mode == "bidirectional":
+        return bidirectional_a_star_search_csr(
+            graph, start_ids, target_ids, stats, landmarks
+        )
+    return _pairwise_search_csr(graph, start_ids, target_ids, stats, landmarks, buffers)
+
+
+def _pairwise_search_csr(
+    graph: CSR_graph,
+    start_ids: np.ndarray,
+    target_ids: np.ndarray,
+    stats: dict | None = None,
+    landmarks: Landmarks | None = None,
+    buffers: SearchBuffers | None = None,
+) -> tuple[int | None, int | None, np.ndarray | None]:
+    """
+    one A* for every corner pair, keep the cheapest
+    """
+    if buffers is None:
+        buffers = SearchBuffers(graph.num_nodes)
+    shortest_path = None
+    shortest_distance = float("inf")
+    best_start = None
+    best_target = None
+
+    for start in start_ids.tolist():
+        for target in target_ids.tolist():
+            if start < 0 or target < 0:
+                continue
+            came_from, cost_so_far = a_star_search_csr(
+                graph, start, target, stats, landmarks, buffers
+            )
+            if cost_so_far[target] < shortest_distance:
+                shortest_distance = cost_so_far[target]
+                shortest_path = reconstruct_path_csr(came_from, start, target)
+                best_start = start
+                best_target = target
+
+    return best_start, best_target, shortest_path
+
+
+def _multi_search_csr(
+    graph: CSR_graph,
+    start_ids: np.ndarray,
+    target_ids: np.ndarray,
+    stats: dict | None = None,
+    landmarks: Landmarks | None = None,
+    buffers: SearchBuffers | None = None,
+) -> tuple[int | None, int | None, np.ndarray | None]:
+    """
+    a single multi-source / multi-target A* over all corners
+    """
+    came_from, _, best_start, best_target = multi_a_star_search_csr(
+        graph, start_ids, target_ids, stats, landmarks, buffers
+    )
+    if best_target < 0:
+        return None, None, None
+    return best_start, best_target, reconstruct_path_csr(came_from, best_start, best_target)
+
+
+def read_routes(
+    data_path: str | Layout, nearest_incomp: dict, nearest_outcomp: dict
+) -> list[list[str]]:
+    """
+    read the netlist and complete each route with its inlet and outlet
+    a parsed Layout can be given instead of the netlist path
+    """
+    if isinstance(data_path, Layout):
+        route_list = [list(route) for route in data_path.routes]
+    else:
+        with open(data_path, mode="r", encoding="utf-8") as f:
+            line = f.read().split("\n")
+            # print(line)
+        route_list = [lin.split("\t") for lin in line]
     # print(route_list)
 
     # process complete route path
@@ -158,21 +755,310 @@ def construct_path(
             route[-1] = route[-1].replace("*", "")
         route.append(nearest_outcomp[route[-1]])
         # print(route)
+    return route_list
+
+
+def count_segment(shortest_path) -> None:
+    """
+    count one routed segment and its path size in the active collector
+    """
+    count(
+        "search",
+        segments=1,
+        unrouted=shortest_path is None,
+        path_nodes=0 if shortest_path is None else len(shortest_path),
+    )
+
+
+@timed("construct_path")
+def construct_path(
+    data_path: str | Layout,
+    nearest_incomp: dict,
+    nearest_outcomp: dict,
+    compo_dict: dict,
+    graph: nx.Graph | CSR_graph | None = None,
+    mode: str = "pairwise",
+    landmarks: Landmarks | None = None,
+    compact: bool = False,
+):
+    """
+    route every segment of the netlist
+    compact returns a RouteArray, on a CSR graph the searched node ids are
+    packed directly without building coordinate tuples
+    """
+    if compact and isinstance(graph, CSR_graph):
+        return _construct_path_compact(
+            data_path, nearest_incomp, nearest_outcomp, compo_dict, graph, mode, landmarks
+        )
+    all_path: list[list[tuple[np.float64, np.float64]]] = []
+    for route in read_routes(data_path, nearest_incomp, nearest_outcomp):
         # store each path
         each_path_list: list[tuple[np.float64, np.float64]] = []
         for idx in range(len(route) - 1):
             start_name = route[idx]
             targe_name = route[idx + 1]
             best_start, best_target, shortest_path = find_shortest_path(
-                start_name, targe_name, compo_dict
+                start_name, targe_name, compo_dict, graph, mode, landmarks=landmarks
             )
+            count_segment(shortest_path)
             each_path_list.append(shortest_path)
         all_path.append(each_path_list)
 
+    if compact:
+        return RouteArray.from_paths(all_path)
     return all_path
 
 
-def calcu_length(path: list[list[tuple]]):
+def _construct_path_compact(
+    data_path: str | Layout,
+    nearest_incomp: dict,
+    nearest_outcomp: dict,
+    compo_dict: dict,
+    graph: CSR_graph,
+    mode: str = "pairwise",
+    landmarks: Landmarks | None = None,
+) -> RouteArray:
+    """
+    construct_path on node ids, packed into a RouteArray
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"unknown search mode {mode}, expect one of {SEARCH_MODES}")
+    stats: dict | None = counters("search")
+    buffers = SearchBuffers(graph.num_nodes)
+    segments: list[np.ndarray | None] = []
+    route_sizes: list[int] = []
+    for route in read_routes(data_path, nearest_incomp, nearest_outcomp):
+        for idx in range(len(route) - 1):
+            shortest_path = _search_ids_csr(
+                graph,
+                graph.node_ids(compo_dict[route[idx]]),
+                graph.node_ids(compo_dict[route[idx + 1]]),
+                mode,
+                stats,
+                landmarks,
+                buffers,
+            )[2]
+            count_segment(shortest_path)
+            segments.append(shortest_path)
+        route_sizes.append(len(route) - 1)
+    return RouteArray.from_node_ids(graph, segments, route_sizes)
+
+
+class Router:
+    """
+    routing engine on one SG which memoizes segment paths in a PathCache
+    pass the same cache to several routers to share it across runs
+    """
+
+    def __init__(
+        self,
+        graph: nx.Graph | CSR_graph,
+        compo_dict: dict,
+        mode: str = "pairwise",
+        cache: PathCache | None = None,
+        landmarks: Landmarks | None = None,
+    ) -> None:
+        if mode not in SEARCH_MODES:
+            raise ValueError(
+                f"unknown search mode {mode}, expect one of {SEARCH_MODES}"
+            )
+        self.graph: nx.Graph | CSR_graph = graph
+        self.compo_dict: dict = compo_dict
+        self.mode: str = mode
+        self.landmarks: Landmarks | None = landmarks
+        self.cache: PathCache = cache if cache is not None else PathCache()
+        self.fingerprint: str = layout_fingerprint(graph, compo_dict)
+
+    def search_options(self) -> tuple:
+        """
+        every option that changes the search result, part of the cache key
+        """
+        if self.landmarks is None:
+            return (self.mode,)
+        return (self.mode, "alt", self.landmarks.nodes.tobytes())
+
+    def find_shortest_path(self, start_name: str, targe_name: str):
+        """
+        find_shortest_path with the segment cache in front of it
+        """
+        key: tuple = (self.fingerprint, start_name, targe_name, self.search_options())
+        cached = self.cache.get(key)
+        count("path_cache", hits=cached is not None, misses=cached is None)
+        if cached is None:
+            cached = find_shortest_path(
+                start_name,
+                targe_name,
+                self.compo_dict,
+                self.graph,
+                self.mode,
+                landmarks=self.landmarks,
+            )
+            self.cache.put(key, cached)
+        best_start, best_target, shortest_path = cached
+        if shortest_path is not None:
+            shortest_path = list(shortest_path)
+        return best_start, best_target, shortest_path
+
+    def update(
+        self,
+        graph: nx.Graph | CSR_graph,
+        compo_dict: dict,
+        region: np.ndarray,
+        names: list[str] = (),
+        landmarks: Landmarks | None = None,
+    ) -> int:
+        """
+        follow an SG changed inside region (see SG_graph.update_layout)
+        cached segments that touch the region, start or end at a changed
+        component or found no path are dropped, the rest are kept under the
+        new fingerprint: they are still valid paths but may no longer be the
+        shortest ones, e.g. when a removed component opened a shortcut
+        landmarks of the old SG are not admissible any more and are replaced
+        return the number of dropped segments
+        """
+        changed: set[str] = set(names)
+        new_fingerprint: str = layout_fingerprint(graph, compo_dict)
+        dropped: int = self.cache.invalidate(
+            self.fingerprint,
+            lambda key, value: key[1] in changed
+            or key[2] in changed
+            or path_in_region(value[2], region),
+            new_fingerprint,
+        )
+        self.graph, self.compo_dict = graph, compo_dict
+        self.landmarks = landmarks
+        self.fingerprint = new_fingerprint
+        return dropped
+
+    @timed("construct_path")
+    def construct_path(
+        self, data_path: str | Layout, nearest_incomp: dict, nearest_outcomp: dict
+    ) -> list[list[list[tuple[np.float64, np.float64]]]]:
+        """
+        construct_path routing every segment through the cache
+        """
+        all_path: list = []
+        for route in read_routes(data_path, nearest_incomp, nearest_outcomp):
+            each_path_list: list = []
+            for idx in range(len(route) - 1):
+                shortest_path = self.find_shortest_path(route[idx], route[idx + 1])[2]
+                count_segment(shortest_path)
+                each_path_list.append(shortest_path)
+            all_path.append(each_path_list)
+        return all_path
+
+
+# 每个工作进程持有的只读状态
+_route_worker_state: dict = {}
+
+
+def _init_route_worker(spec: dict, compo_dict: dict, mode: str) -> None:
+    """
+    attach the shared search graph once per worker process
+    """
+    graph, blocks = CSR_graph.from_shared_memory(spec)
+    _route_worker_state.update(
+        graph=graph, blocks=blocks, compo_dict=compo_dict, mode=mode
+    )
+
+
+def _route_segment_worker(pair: tuple[str, str]) -> np.ndarray | None:
+    """
+    route one segment in a worker and return its node ids
+    """
+    graph: CSR_graph = _route_worker_state["graph"]
+    compo_dict: dict = _route_worker_state["compo_dict"]
+    start_ids: np.ndarray = graph.node_ids(compo_dict[pair[0]])
+    target_ids: np.ndarray = graph.node_ids(compo_dict[pair[1]])
+    if _route_worker_state["mode"] == "multi":
+        return _multi_search_csr(graph, start_ids, target_ids)[2]
+    if _route_worker_state["mode"] == "bidirectional":
+        return bidirectional_a_star_search_csr(graph, start_ids, target_ids)[2]
+    return _pairwise_search_csr(graph, start_ids, target_ids)[2]
+
+
+@timed("construct_path")
+def construct_path_parallel(
+    data_path: str | Layout,
+    nearest_incomp: dict,
+    nearest_outcomp: dict,
+    compo_dict: dict,
+    graph: nx.Graph | CSR_graph,
+    mode: str = "pairwise",
+    workers: int | None = None,
+    compact: bool = False,
+):
+    """
+    construct_path with the segments spread over a process pool
+    the CSR arrays are placed in shared memory once and every distinct
+    (start, target) segment is routed once, results keep the input order
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"unknown search mode {mode}, expect one of {SEARCH_MODES}")
+    if not isinstance(graph, CSR_graph):
+        graph = CSR_graph.from_nx(graph)
+    route_list: list[list[str]] = read_routes(data_path, nearest_incomp, nearest_outcomp)
+    # 相同的组件对只需要搜索一次
+    pairs: list[tuple[str, str]] = list(
+        dict.fromkeys(
+            (route[idx], route[idx + 1])
+            for route in route_list
+            for idx in range(len(route) - 1)
+        )
+    )
+    workers = min(workers or os.cpu_count() or 1, max(len(pairs), 1))
+
+    blocks, spec = graph.to_shared_memory()
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_route_worker,
+            initargs=(spec, compo_dict, mode),
+        ) as pool:
+            chunksize: int = max(1, len(pairs) // (workers * 4))
+            segment_ids: list = list(
+                pool.map(_route_segment_worker, pairs, chunksize=chunksize)
+            )
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    if compact:
+        pair_ids: dict = dict(zip(pairs, segment_ids))
+        segments: list = [
+            pair_ids[(route[idx], route[idx + 1])]
+            for route in route_list
+            for idx in range(len(route) - 1)
+        ]
+        for ids in segments:
+            count_segment(ids)
+        return RouteArray.from_node_ids(
+            graph, segments, [len(route) - 1 for route in route_list]
+        )
+    segment_path: dict = {
+        pair: None if ids is None else graph.to_points(ids)
+        for pair, ids in zip(pairs, segment_ids)
+    }
+    # 搜索在工作进程中完成, 这里只统计段数与路径规模
+    for route in route_list:
+        for idx in range(len(route) - 1):
+            count_segment(segment_path[(route[idx], route[idx + 1])])
+    return [
+        [
+            list(segment_path[(route[idx], route[idx + 1])])
+            if segment_path[(route[idx], route[idx + 1])] is not None
+            else None
+            for idx in range(len(route) - 1)
+        ]
+        for route in route_list
+    ]
+
+
+@timed("calcu_length")
+def calcu_length(path: list[list[tuple]] | RouteArray):
+    if isinstance(path, RouteArray):
+        return _calcu_length_array(path)
     total_length = 0
     has_count = set()
     for each_path in path:
@@ -187,36 +1073,165 @@ def calcu_length(path: list[list[tuple]]):
     return total_length
 
 
+def _calcu_length_array(path: RouteArray) -> np.float64:
+    """
+    calcu_length on a RouteArray with the same result: point pairs are
+    deduplicated by exact coordinates and summed in order of first use
+    """
+    head: np.ndarray = path.point_pairs()
+    if len(head) == 0:
+        return np.float64(0)
+    # + 0.0 统一 -0.0 与 0.0, 与元组比较相等的行为一致
+    pairs: np.ndarray = unique_rows_in_order(
+        np.hstack((path.coords[head], path.coords[head + 1])) + 0.0
+    )
+    delta: np.ndarray = pairs[:, :2] - pairs[:, 2:]
+    # cumsum 按顺序逐个累加, 与逐段累加的浮点结果一致
+    return np.cumsum(np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2))[-1]
+
+
+# path_lengths 的坐标定点化比例, 2的幂使 .5 / .25 等坐标精确表示
+LENGTH_KEY_SCALE: float = 2.0**20
+
+
+@timed("path_lengths")
+def path_lengths(
+    path: list[list[tuple]] | RouteArray, directed: bool = False
+) -> tuple[float, np.ndarray, float]:
+    """
+    array based wire length of routed paths
+    every polyline is concatenated and all segment lengths come from one pass;
+    a segment is keyed by the int ids of its rounded endpoints, A->B and B->A
+    share the key unless directed is set
+    return (total length with every segment counted once,
+            (R,) length of each route counted once within the route,
+            length of the segments used by more than one route)
+    """
+    if isinstance(path, RouteArray):
+        # 直接使用扁平坐标, 只有一个点的段不构成线段
+        keep: np.ndarray = path.segment_sizes() > 1
+        counts: np.ndarray = path.segment_sizes()[keep]
+        owner: np.ndarray = path.segment_owner()[keep]
+        points: np.ndarray = (
+            path.coords
+            if keep.all()
+            else path.coords[np.repeat(keep, path.segment_sizes())]
+        )
+    else:
+        lines: list = []
+        owner: list[int] = []
+        for route_idx, each_path in enumerate(path):
+            for seg in each_path:
+                if seg is not None and len(seg) > 1:
+                    lines.append(seg)
+                    owner.append(route_idx)
+        counts = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))
+        points = np.fromiter(
+            chain.from_iterable(chain.from_iterable(lines)),
+            dtype=np.float64,
+            count=2 * int(counts.sum()),
+        ).reshape(-1, 2)
+    route_length: np.ndarray = np.zeros(len(path))
+    if len(counts) == 0:
+        return 0.0, route_length, 0.0
+
+    # 相邻两点构成一条线段, 跨越两条折线的点对除外
+    first: np.ndarray = np.zeros(len(points), dtype=bool)
+    first[np.cumsum(counts)[:-1]] = True
+    head: np.ndarray = np.flatnonzero(~first[1:])
+    route: np.ndarray = np.repeat(np.array(owner), counts)[head]
+    length: np.ndarray = np.sqrt(((points[head + 1] - points[head]) ** 2).sum(axis=1))
+
+    # 定点化后的坐标编号, 线段键 = 小编号 * 点数 + 大编号
+    fixed: np.ndarray = np.round(points * LENGTH_KEY_SCALE).astype(np.int64)
+    fixed -= fixed.min(axis=0)
+    span: int = int(fixed[:, 1].max()) + 1
+    if (int(fixed[:, 0].max()) + 1) * span < 2**63:
+        # x, y 打包成一个整数后一维排序, 比按行排序快得多
+        _, point_id = np.unique(fixed[:, 0] * span + fixed[:, 1], return_inverse=True)
+    else:
+        _, point_id = np.unique(fixed, axis=0, return_inverse=True)
+    point_id = point_id.ravel().astype(np.int64)
+    end_a, end_b = point_id[head], point_id[head + 1]
+    if not directed:
+        end_a, end_b = np.minimum(end_a, end_b), np.maximum(end_a, end_b)
+    key: np.ndarray = end_a * (point_id.max() + 1) + end_b
+
+    _, once = np.unique(key, return_index=True)
+    total: float = float(length[once].sum())
+
+    # 按 (路径, 线段键) 去重, 同一路径内的共用线段只算一次
+    order: np.ndarray = np.lexsort((key, route))
+    keep: np.ndarray = np.ones(len(order), dtype=bool)
+    keep[1:] = (key[order][1:] != key[order][:-1]) | (route[order][1:] != route[order][:-1])
+    route_once: np.ndarray = order[keep]
+    route_length = np.bincount(
+        route[route_once], weights=length[route_once], minlength=len(path)
+    )
+
+    # 被多条路径使用的线段
+    shared_key, shared_idx, used_by = np.unique(
+        key[route_once], return_index=True, return_counts=True
+    )
+    shared: float = float(length[route_once][shared_idx][used_by > 1].sum())
+    return total, route_length, shared
+
+
 # detail routing
 # 1. 首先获取路径中除去首尾元素
 # 2. 其次获取中间线段的端点，并获得n等分点坐标
 # 3. 动态规划获取首到中间段到最终的优化后的最小长度
+# mode "greedy" 每层只取离上一个点最近的等分点 (原实现)
+# mode "dp" 在分层的等分点上求精确最短路
+# mode "funnel" 不做等分, 在三角形通道内拉直得到真正的最短路, 忽略n
 
 
-def detail_routing(sg: SG_graph, path: list[list[tuple]], n: int):
+@timed("detail_routing")
+def detail_routing(
+    sg: SG_graph | CSR_graph,
+    path: list[list[tuple]] | RouteArray,
+    n: int,
+    mode: str = "greedy",
+):
+    """
+    detail route every segment, a RouteArray input gives a RouteArray back
+    """
+    if mode not in DETAIL_MODES:
+        raise ValueError(f"unknown detail mode {mode}, expect one of {DETAIL_MODES}")
     total_lenth = 0
     final_path = []
 
+    compact: bool = isinstance(path, RouteArray)
     for each_path in path:
         path = []
         for seg in each_path:
-            real_path = one_detail_routing(sg, seg, n)
+            if compact:
+                seg = list(map(tuple, seg))
+            real_path = one_detail_routing(sg, seg, n, mode)
             path.append(real_path)
         final_path.append(path)
+    if compact:
+        return RouteArray.from_paths(final_path)
     return final_path
 
 
-def one_detail_routing(sg: SG_graph, path: list[tuple], n: int) -> tuple[list, float]:
+def one_detail_routing(
+    sg: SG_graph | CSR_graph, path: list[tuple], n: int, mode: str = "greedy"
+) -> tuple[list, float]:
     head = path[0]
     tail = path[-1]
     middle_path = path[1:-1]
+    if mode == "dp":
+        return dp_detail_routing(head, tail, divider_layers(sg, middle_path, n))
+    if mode == "funnel":
+        return funnel_detail_routing(head, tail, channel_portals(sg, path))
     # return head,tail,middle_path
     # 存储总的中间线段n等分的n个坐标位置
     global_n_points_pos = []
 
-    for mid in middle_path:
-        # print(mid)
-        global_n_points_pos.append(segment_dividers(*sg.terminal_to_mid[tuple(mid)], n))
+    # 途经的组件角点没有三角形边, 作为只有该角点一个点的层
+    for p1, p2 in crossed_edges(sg, middle_path):
+        global_n_points_pos.append(segment_dividers(tuple(p1), tuple(p2), n))
 
     real_path = [head]
     min_point = None
@@ -233,10 +1248,197 @@ def one_detail_routing(sg: SG_graph, path: list[tuple], n: int) -> tuple[list, f
     return real_path
 
 
+def crossed_edges(sg: SG_graph | CSR_graph, middle_path: list[tuple]) -> np.ndarray:
+    """
+    (L, 2, 2) endpoints of the triangle edge behind every midpoint,
+    a component corner passed on the way has no edge and gives (corner, corner)
+    """
+    middle: np.ndarray = np.asarray(middle_path, dtype=np.float64).reshape(-1, 2)
+    if len(middle) == 0:
+        return np.empty((0, 2, 2))
+    if isinstance(sg, CSR_graph):
+        ends: np.ndarray = sg.mid_ends[sg.node_ids(middle_path)]
+    else:
+        ends = np.array(
+            [sg.terminal_to_mid.get(tuple(mid), (mid, mid)) for mid in middle_path],
+            dtype=np.float64,
+        )
+    corner: np.ndarray = np.isnan(ends).any(axis=(1, 2))
+    ends[corner] = middle[corner, None, :]
+    return ends
+
+
+def divider_layers(
+    sg: SG_graph | CSR_graph, middle_path: list[tuple], n: int
+) -> np.ndarray:
+    """
+    (L, n - 1, 2) n-divider points of the triangle edge behind every midpoint,
+    the same coordinates segment_dividers returns
+    """
+    if len(middle_path) == 0:
+        return np.empty((0, max(n - 1, 0), 2))
+    ends: np.ndarray = crossed_edges(sg, middle_path)
+    # 与 segment_dividers 相同的运算顺序: x1 + (x2 - x1) * k / n
+    k: np.ndarray = np.arange(1, n, dtype=np.float64)
+    p1: np.ndarray = ends[:, 0, None, :]
+    return p1 + (ends[:, 1, None, :] - p1) * k[None, :, None] / n
+
+
+def dp_detail_routing(head: tuple, tail: tuple, layers: np.ndarray) -> list[tuple]:
+    """
+    shortest polyline from head to tail through one point of every layer
+    the (m, m) distance blocks between neighbouring layers are computed at once,
+    each layer then costs one min-plus step
+    """
+    if len(layers) == 0:
+        return [head, tail]
+    if layers.shape[1] == 0:
+        raise ValueError("dp detail routing needs n >= 2 dividers per edge")
+    head_arr: np.ndarray = np.asarray(head, dtype=np.float64)
+    tail_arr: np.ndarray = np.asarray(tail, dtype=np.float64)
+
+    # (L - 1, m, m) 相邻两层等分点之间的距离
+    blocks: np.ndarray = np.sqrt(
+        ((layers[:-1, :, None, :] - layers[1:, None, :, :]) ** 2).sum(axis=3)
+    )
+    cost: np.ndarray = np.sqrt(((layers[0] - head_arr) ** 2).sum(axis=1))
+    back: np.ndarray = np.empty((len(blocks), layers.shape[1]), dtype=np.intp)
+    column: np.ndarray = np.arange(layers.shape[1])
+    for idx, block in enumerate(blocks):
+        total: np.ndarray = cost[:, None] + block
+        back[idx] = total.argmin(axis=0)
+        cost = total[back[idx], column]
+    cost = cost + np.sqrt(((layers[-1] - tail_arr) ** 2).sum(axis=1))
+
+    # 从最后一层回溯每层选中的等分点
+    choice: np.ndarray = np.empty(len(layers), dtype=np.intp)
+    choice[-1] = cost.argmin()
+    for idx in range(len(blocks) - 1, -1, -1):
+        choice[idx] = back[idx, choice[idx + 1]]
+    points: np.ndarray = layers[np.arange(len(layers)), choice]
+    return [head, *map(tuple, points), tail]
+
+
+def channel_portals(sg: SG_graph | CSR_graph, path: list[tuple]) -> np.ndarray:
+    """
+    (P, 2, 2) left and right endpoint of every triangle edge the path crosses
+    two neighbouring path points lie in one triangle: the vertices of their
+    edges (or the corner itself) give that triangle; a step that stays in the
+    same triangle or goes straight back into the previous one crosses nothing,
+    a component corner on the way pinches the channel to one point
+    """
+    ends: list = crossed_edges(sg, path[1:-1]).tolist()
+    head, tail = path[0], path[-1]
+    head_vertex: tuple = (float(head[0]), float(head[1]))
+    tail_vertex: tuple = (float(tail[0]), float(tail[1]))
+    # 每个路径点对应的三角形边, 端口角点记为退化的边
+    edges: list[tuple] = [(head_vertex, head_vertex)]
+    edges.extend((tuple(p1), tuple(p2)) for p1, p2 in ends)
+    edges.append((tail_vertex, tail_vertex))
+
+    triangles: list[frozenset] = [frozenset(edges[0] + edges[1])]
+    portals: list[tuple] = []
+    for idx in range(1, len(edges) - 1):
+        edge: tuple = edges[idx]
+        triangle: frozenset = frozenset(edge + edges[idx + 1])
+        pinch: bool = edge[0] == edge[1]
+        if triangle == triangles[-1] and not pinch:
+            # 只是碰到边又回到同一个三角形
+            continue
+        if (
+            len(triangles) >= 2
+            and triangle == triangles[-2]
+            and portals[-1][0] != portals[-1][1]
+            and not pinch
+        ):
+            # 穿过一条边又立即折回, 两次穿越相互抵消
+            triangles.pop()
+            portals.pop()
+            continue
+        triangles.append(triangle)
+        portals.append(edge)
+    # 起点 (终点) 所在的扇形三角形都能直接到达, 含该顶点的首尾边不构成约束
+    start: int = 0
+    while start < len(portals) and head_vertex in portals[start]:
+        start += 1
+    stop: int = len(portals)
+    while stop > start and tail_vertex in portals[stop - 1]:
+        stop -= 1
+    triangles, portals = triangles[start:stop], portals[start:stop]
+    if not portals:
+        return np.empty((0, 2, 2))
+
+    # 按离开的三角形中该边所对的顶点区分左右端点
+    oriented: list = []
+    for triangle, (p1, p2) in zip(triangles, portals):
+        if p1 == p2:
+            oriented.append((p1, p2))
+            continue
+        opposite = next(iter(triangle - {p1, p2}), None)
+        if opposite is None:
+            oriented.append((p1, p2))
+            continue
+        mid_x, mid_y = (p1[0] + p2[0]) / 2, (p1[1] + p2[1]) / 2
+        cross: float = (mid_x - opposite[0]) * (p1[1] - opposite[1]) - (
+            mid_y - opposite[1]
+        ) * (p1[0] - opposite[0])
+        oriented.append((p1, p2) if cross > 0 else (p2, p1))
+    return np.array(oriented, dtype=np.float64)
+
+
+def _triarea2(a: tuple, b: tuple, c: tuple) -> float:
+    # 正值表示c在a->b的右侧
+    return (c[0] - a[0]) * (b[1] - a[1]) - (b[0] - a[0]) * (c[1] - a[1])
+
+
+def funnel_detail_routing(head: tuple, tail: tuple, portals: np.ndarray) -> list[tuple]:
+    """
+    taut shortest path from head to tail through the portals (simple stupid
+    funnel algorithm), the corners of the path are portal endpoints
+    """
+    head_point: tuple = tuple(np.float64(x) for x in head)
+    tail_point: tuple = tuple(np.float64(x) for x in tail)
+    portal_list: list[tuple[tuple, tuple]] = [(head_point, head_point)]
+    portal_list.extend((tuple(left), tuple(right)) for left, right in portals)
+    portal_list.append((tail_point, tail_point))
+
+    real_path: list[tuple] = [head]
+    apex = left = right = head_point
+    apex_idx = left_idx = right_idx = 0
+    idx: int = 1
+    while idx < len(portal_list):
+        portal_left, portal_right = portal_list[idx]
+        # 收紧右边界
+        if _triarea2(apex, right, portal_right) <= 0:
+            if apex == right or _triarea2(apex, left, portal_right) > 0:
+                right, right_idx = portal_right, idx
+            else:
+                # 右边界越过左边界, 左端点成为新的拐点
+                real_path.append(left)
+                apex, apex_idx = left, left_idx
+                right, right_idx = apex, apex_idx
+                idx = apex_idx + 1
+                continue
+        # 收紧左边界
+        if _triarea2(apex, left, portal_left) >= 0:
+            if apex == left or _triarea2(apex, right, portal_left) < 0:
+                left, left_idx = portal_left, idx
+            else:
+                real_path.append(right)
+                apex, apex_idx = right, right_idx
+                left, left_idx = apex, apex_idx
+                idx = apex_idx + 1
+                continue
+        idx += 1
+    real_path.append(tail)
+    return real_path
+
+
 if __name__ == "__main__":
     # # point1 = (np.float64(6), np.float64(1))
     # # point2 = (np.float64(6), np.float64(6))
     # # print(euclidean(point1,point2))
+    show_progress()
     sg = SG_graph("Data\data5.txt", "Data\input5.txt", 0.6)
     sg.add_midpoint_to_SG()
     sg.add_egdes_to_SG()
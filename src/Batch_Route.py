@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   Batch_Route.py
+@Time    :   2024/08/19 20:14:03
+@Author  :   chenziyang
+@description   :   route a directory of layouts in a worker pool
+"""
+
+"""
+用法:
+    python src/Batch_Route.py Data --out results
+    python src/Batch_Route.py --manifest jobs.txt --workers 16 --mode multi
+
+任务来源:
+    目录中成对的 dataN.txt / inputN.txt
+    或 manifest 文件, 每行 "布局文件<TAB>网表文件", 相对路径相对于manifest所在目录
+输出:
+    每个任务一个 <name>.json, 以及汇总的 summary.jsonl
+    manifest 任务以相对manifest目录的路径命名, 如 a/data1.txt -> a_data1,
+    仍然重名的任务依次加后缀 -2, -3
+    包含全局路径长度, 细化布线长度, 路径坐标和各阶段耗时
+"""
+
+import argparse
+import importlib
+import json
+import os
+import re
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from CDT_Graph import SG_graph
+from Instrument import collect
+from Layout import Layout
+from Layout_Cache import LayoutCache
+
+# A-star.py 的文件名不是合法标识符, 通过importlib导入
+astar = importlib.import_module("A-star")
+
+_LAYOUT_NAME = re.compile(r"^data(\w+)\.txt$")
+
+
+def find_jobs(data_dir: str) -> list[tuple[str, str, str]]:
+    """
+    pair every dataN.txt with inputN.txt in the directory
+    return (job name, layout path, netlist path) sorted by name
+    """
+    jobs: list[tuple[str, str, str]] = []
+    for file_name in sorted(os.listdir(data_dir)):
+        matched = _LAYOUT_NAME.match(file_name)
+        if matched is None:
+            continue
+        input_path = os.path.join(data_dir, f"input{matched.group(1)}.txt")
+        if os.path.exists(input_path):
+            jobs.append(
+                (f"data{matched.group(1)}", os.path.join(data_dir, file_name), input_path)
+            )
+    return jobs
+
+
+def _manifest_name(layout_path: str, base_dir: str) -> str:
+    """
+    job name from the layout path relative to the manifest directory
+    """
+    relative: str = os.path.splitext(os.path.relpath(layout_path, base_dir))[0]
+    return "_".join(
+        part for part in re.split(r"[\\/]", relative) if part not in ("", ".", "..")
+    )
+
+
+def unique_names(jobs: list[tuple[str, str, str]]) -> list[tuple[str, str, str]]:
+    """
+    suffix repeated job names with -2, -3, ... so no result file is overwritten
+    """
+    taken: set[str] = {name for name, _, _ in jobs}
+    seen: set[str] = set()
+    renamed: list[tuple[str, str, str]] = []
+    for name, layout_path, input_path in jobs:
+        unique, count = name, 1
+        # 后缀也不能与其他任务的原名冲突
+        while unique in seen or (unique != name and unique in taken):
+            count += 1
+            unique = f"{name}-{count}"
+        seen.add(unique)
+        renamed.append((unique, layout_path, input_path))
+    return renamed
+
+
+def read_manifest(manifest_path: str) -> list[tuple[str, str, str]]:
+    """
+    read "layout<TAB>netlist" lines, blank lines and # comments are skipped,
+    jobs are named by the layout path relative to the manifest directory
+    """
+    base_dir: str = os.path.dirname(os.path.abspath(manifest_path))
+    jobs: list[tuple[str, str, str]] = []
+    with open(manifest_path, mode="r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            layout_path, input_path = line.split("\t")[:2]
+            layout_path = os.path.join(base_dir, layout_path)
+            input_path = os.path.join(base_dir, input_path)
+            jobs.append((_manifest_name(layout_path, base_dir), layout_path, input_path))
+    return unique_names(jobs)
+
+
+def _points(path) -> list[list[float]]:
+    return [[float(x), float(y)] for x, y in path] if path is not None else None
+
+
+def _run_pipeline(
+    layout_path: str,
+    input_path: str,
+    ratio: float,
+    n: int,
+    mode: str,
+    cache_dir: str | None,
+    timing: dict[str, float],
+    detail: str = "greedy",
+) -> dict:
+    """
+    parse, build the SG, route and measure one layout
+    """
+    tick = time.perf_counter()
+    layout = Layout.load(layout_path, input_path, ratio)
+    timing["parse"] = time.perf_counter() - tick
+
+    tick = time.perf_counter()
+    cache = LayoutCache(cache_dir) if cache_dir else None
+    sg = SG_graph(layout_path, input_path, ratio, cache, layout)
+    graph = sg.build_csr()
+    timing["build_sg"] = time.perf_counter() - tick
+
+    tick = time.perf_counter()
+    path_list = astar.construct_path(
+        layout, sg.nearest_incomp, sg.nearest_outcomp, sg.compo_dict, graph, mode
+    )
+    timing["global_route"] = time.perf_counter() - tick
+
+    tick = time.perf_counter()
+    route = astar.detail_routing(graph, path_list, n, detail)
+    timing["detail_route"] = time.perf_counter() - tick
+
+    tick = time.perf_counter()
+    global_length = float(astar.calcu_length(path_list))
+    detail_length = float(astar.calcu_length(route))
+    _, route_length, shared_length = astar.path_lengths(route)
+    timing["length"] = time.perf_counter() - tick
+
+    return {
+        "status": "ok",
+        "global_length": global_length,
+        "detail_length": detail_length,
+        "route_lengths": route_length.tolist(),
+        "shared_length": shared_length,
+        "sg_nodes": graph.num_nodes,
+        "sg_edges": graph.num_edges,
+        "global_paths": [[_points(seg) for seg in each] for each in path_list],
+        "detail_paths": [[_points(seg) for seg in each] for each in route],
+    }
+
+
+def route_job(
+    job: tuple[str, str, str],
+    ratio: float,
+    n: int,
+    mode: str,
+    cache_dir: str | None,
+    detail: str = "greedy",
+) -> dict:
+    """
+    run the whole pipeline for one layout and return a JSON-ready result,
+    the instrumentation records of the run are kept under "profile"
+    """
+    name, layout_path, input_path = job
+    result: dict = {"name": name, "layout": layout_path, "netlist": input_path}
+    timing: dict[str, float] = {}
+    start = time.perf_counter()
+    with collect() as profile:
+        try:
+            result.update(
+                _run_pipeline(
+                    layout_path, input_path, ratio, n, mode, cache_dir, timing, detail
+                )
+            )
+        except Exception as e:
+            result.update(
+                status="error",
+                error=f"{type(e).__name__}: {e}",
+                trace=traceback.format_exc(),
+            )
+    timing["total"] = time.perf_counter() - start
+    result["timing"] = timing
+    result["profile"] = profile.as_dict()
+    return result
+
+
+def run_batch(
+    jobs: list[tuple[str, str, str]],
+    out_dir: str,
+    ratio: float = 0.6,
+    n: int = 7,
+    mode: str = "pairwise",
+    workers: int | None = None,
+    cache_dir: str | None = None,
+    detail: str = "greedy",
+) -> list[dict]:
+    """
+    route every job in a process pool and write the results,
+    summary.jsonl keeps the job order, repeated names get a suffix
+    """
+    jobs = unique_names(jobs)
+    os.makedirs(out_dir, exist_ok=True)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    results: list[dict] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(route_job, job, ratio, n, mode, cache_dir, detail)
+            for job in jobs
+        ]
+        with open(os.path.join(out_dir, "summary.jsonl"), "w", encoding="utf-8") as summary:
+            for future in futures:
+                result = future.result()
+                results.append(result)
+                with open(
+                    os.path.join(out_dir, result["name"] + ".json"), "w", encoding="utf-8"
+                ) as f:
+                    json.dump(result, f)
+                brief = {
+                    key: value
+                    for key, value in result.items()
+                    if key not in ("global_paths", "detail_paths", "trace", "profile")
+                }
+                summary.write(json.dumps(brief) + "\n")
+                print(
+                    f"[*] {result['name']}: {result['status']} "
+                    f"in {result['timing']['total']:.3f}s"
+                )
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="route a batch of chip layouts")
+    parser.add_argument("data_dir", nargs="?", help="directory of dataN.txt / inputN.txt")
+    parser.add_argument("--manifest", help="file of layout<TAB>netlist lines")
+    parser.add_argument("--out", default="results", help="output directory")
+    parser.add_argument("--ratio", type=float, default=0.6)
+    parser.add_argument("-n", type=int, default=7, help="dividers for detail routing")
+    parser.add_argument("--mode", default="pairwise", choices=astar.SEARCH_MODES)
+    parser.add_argument("--detail", default="greedy", choices=astar.DETAIL_MODES)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache", default=None, help="layout cache directory")
+    args = parser.parse_args(argv)
+
+    if (args.data_dir is None) == (args.manifest is None):
+        parser.error("give either a data directory or --manifest")
+    jobs = read_manifest(args.manifest) if args.manifest else find_jobs(args.data_dir)
+    results = run_batch(
+        jobs,
+        args.out,
+        args.ratio,
+        args.n,
+        args.mode,
+        args.workers,
+        args.cache,
+        args.detail,
+    )
+    return 0 if all(result["status"] == "ok" for result in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
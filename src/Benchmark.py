@@ -0,0 +1,434 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   Benchmark.py
+@Time    :   2024/08/20 17:26:09
+@Author  :   chenziyang
+@description   :   time every pipeline stage on synthetic layouts of growing size
+"""
+
+"""
+用法:
+    python src/Benchmark.py --sizes 100 500 1000 2000
+    python src/Benchmark.py --compare Data/bench/<旧提交>.json Data/bench/<新提交>.json
+
+每个规模生成一份固定种子的布局, 依次计时:
+    parse           Layout 读取 + Dataset 最近端口计算
+    cdt             chipCDT 三角剖分
+    sg_init         SG_graph 初始化 (内部会再做一次三角剖分)
+    sg_build        add_midpoint / add_egdes / add_startarget + CSR
+    construct_path  全局布线
+    detail_routing  细化布线
+    calcu_length    长度统计
+重复 repeat 次取最小值, 结果按提交号保存为 JSON, 便于不同提交之间比较
+
+--detail-n 给出等分数 n 时, 另外比较 greedy / dp / funnel 三种细化布线:
+    每个 n 下的耗时, 去重后的总长度 (calcu_length) 与逐段线长之和
+    dp 逐段最优, 但不同段之间共用的线段变少, 去重后的总长度可能反而更长
+    funnel 不依赖 n, 各行结果相同, 便于与不同 n 下的 dp 对照
+
+--search 比较各搜索模式 (pairwise / multi / bidirectional):
+    网表中的每个组件对, 以及 long_pairs 个随机组件对 (跨芯片的长路径)
+    分别统计耗时, 扩展节点数, 入队次数与路径总长度
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+from CDT import chipCDT
+from CDT_Graph import SG_graph
+from Chip_Generator import REPO_ROOT, SYNTHETIC_DIR, generate
+from Dataset import Dataset
+from Instrument import collect
+from Layout import Layout
+
+# A-star.py 的文件名不是合法标识符, 通过importlib导入
+astar = importlib.import_module("A-star")
+
+BENCH_DIR = os.path.join(REPO_ROOT, "Data", "bench", "")
+SIZES = (10, 100, 500, 1000, 2000)
+DETAIL_N = (2, 3, 5, 7, 10, 15, 20)
+STAGES = (
+    "parse",
+    "cdt",
+    "sg_init",
+    "sg_build",
+    "construct_path",
+    "detail_routing",
+    "calcu_length",
+)
+
+
+def git_revision() -> str:
+    """
+    short hash of HEAD, "local" outside a git checkout
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "local"
+
+
+def bench_layout(
+    data_path: str,
+    input_path: str,
+    ratio: float = 0.6,
+    n: int = 7,
+    mode: str = "pairwise",
+    fixed_scale: int | None = None,
+) -> dict:
+    """
+    run the pipeline once and return the wall time of each stage and the sizes
+    """
+    timing: dict[str, float] = {}
+
+    tick = time.perf_counter()
+    layout = Layout.load(data_path, input_path, ratio, fixed_scale)
+    data = Dataset(data_path, input_path, ratio, layout, fixed_scale)
+    data.process_input_data(data.get_point_dict()[0])
+    timing["parse"] = time.perf_counter() - tick
+
+    tick = time.perf_counter()
+    cdt = chipCDT(data_path, input_path, ratio, layout=layout, fixed_scale=fixed_scale)
+    triangles: int = len(cdt.get_all_triangles())
+    timing["cdt"] = time.perf_counter() - tick
+
+    tick = time.perf_counter()
+    sg = SG_graph(data_path, input_path, ratio, layout=layout, fixed_scale=fixed_scale)
+    timing["sg_init"] = time.perf_counter() - tick
+
+    tick = time.perf_counter()
+    graph = sg.build_csr()
+    timing["sg_build"] = time.perf_counter() - tick
+
+    tick = time.perf_counter()
+    path_list = astar.construct_path(
+        layout, sg.nearest_incomp, sg.nearest_outcomp, sg.compo_dict, graph, mode
+    )
+    timing["construct_path"] = time.perf_counter() - tick
+
+    tick = time.perf_counter()
+    route = astar.detail_routing(graph, path_list, n)
+    timing["detail_routing"] = time.perf_counter() - tick
+
+    tick = time.perf_counter()
+    global_length = float(astar.calcu_length(path_list))
+    detail_length = float(astar.calcu_length(route))
+    timing["calcu_length"] = time.perf_counter() - tick
+
+    return {
+        "timing": timing,
+        "components": len(layout),
+        "routes": len(layout.routes),
+        "triangles": triangles,
+        "sg_nodes": graph.num_nodes,
+        "sg_edges": graph.num_edges,
+        "global_length": global_length,
+        "detail_length": detail_length,
+    }
+
+
+def run_suite(
+    sizes: tuple[int, ...] = SIZES,
+    seed: int = 0,
+    repeat: int = 1,
+    mode: str = "pairwise",
+    label: str | None = None,
+    out_dir: str = BENCH_DIR,
+    fixed_scale: int | None = None,
+) -> str:
+    """
+    benchmark every size and save the results, return the result file path
+    """
+    label = label or git_revision()
+    results: list[dict] = []
+    for size in sizes:
+        data_path, input_path = generate(size, seed, SYNTHETIC_DIR)
+        runs: list[dict] = []
+        for _ in range(repeat):
+            with collect() as profile:
+                run: dict = bench_layout(
+                    data_path, input_path, mode=mode, fixed_scale=fixed_scale
+                )
+            run["counters"] = profile.as_dict()["counters"]
+            runs.append(run)
+        # 每个阶段取多次运行中的最小值
+        result: dict = runs[0]
+        result["timing"] = {
+            stage: min(run["timing"][stage] for run in runs) for stage in STAGES
+        }
+        result["size"] = size
+        results.append(result)
+        print(
+            f"[*] size {size}: "
+            + ", ".join(f"{stage} {result['timing'][stage]:.3f}s" for stage in STAGES)
+        )
+
+    os.makedirs(out_dir, exist_ok=True)
+    out_path: str = os.path.join(out_dir, f"{label}.json")
+    with open(out_path, mode="w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "label": label,
+                "seed": seed,
+                "repeat": repeat,
+                "mode": mode,
+                "fixed_scale": fixed_scale,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print("[*] benchmark saved to", out_path)
+    return out_path
+
+
+def wirelength(route: list) -> float:
+    """
+    sum of every segment's polyline length, shared pieces counted per segment
+    """
+    total: float = 0.0
+    for each_path in route:
+        for seg in each_path:
+            points = np.asarray(seg, dtype=np.float64)
+            total += float(np.sqrt((np.diff(points, axis=0) ** 2).sum(axis=1)).sum())
+    return total
+
+
+def bench_detail(
+    data_path: str,
+    input_path: str,
+    n_values: tuple[int, ...] = DETAIL_N,
+    ratio: float = 0.6,
+    repeat: int = 1,
+    mode: str = "pairwise",
+) -> list[dict]:
+    """
+    time and measure every detail routing mode over n on one global route
+    """
+    layout = Layout.load(data_path, input_path, ratio)
+    sg = SG_graph(data_path, input_path, ratio, layout=layout)
+    graph = sg.build_csr()
+    path_list = astar.construct_path(
+        layout, sg.nearest_incomp, sg.nearest_outcomp, sg.compo_dict, graph, mode
+    )
+    rows: list[dict] = []
+    for n in n_values:
+        for detail in astar.DETAIL_MODES:
+            best: float = float("inf")
+            for _ in range(repeat):
+                tick = time.perf_counter()
+                route = astar.detail_routing(graph, path_list, n, detail)
+                best = min(best, time.perf_counter() - tick)
+            rows.append(
+                {
+                    "n": n,
+                    "detail": detail,
+                    "time": best,
+                    "length": float(astar.calcu_length(route)),
+                    "wirelength": wirelength(route),
+                }
+            )
+    return rows
+
+
+def run_detail_suite(
+    sizes: tuple[int, ...] = SIZES,
+    n_values: tuple[int, ...] = DETAIL_N,
+    seed: int = 0,
+    repeat: int = 1,
+    mode: str = "pairwise",
+    label: str | None = None,
+    out_dir: str = BENCH_DIR,
+) -> str:
+    """
+    greedy against dp detail routing for every size, saved as <label>-detail.json
+    """
+    label = label or git_revision()
+    results: list[dict] = []
+    for size in sizes:
+        data_path, input_path = generate(size, seed, SYNTHETIC_DIR)
+        rows: list[dict] = bench_detail(
+            data_path, input_path, n_values, repeat=repeat, mode=mode
+        )
+        for row in rows:
+            row["size"] = size
+            print(
+                f"[*] size {size} n {row['n']:>2} {row['detail']:>6}: "
+                f"{row['time']:.4f}s length {row['length']:.2f} "
+                f"wirelength {row['wirelength']:.2f}"
+            )
+        results.extend(rows)
+
+    os.makedirs(out_dir, exist_ok=True)
+    out_path: str = os.path.join(out_dir, f"{label}-detail.json")
+    with open(out_path, mode="w", encoding="utf-8") as f:
+        json.dump(
+            {"label": label, "seed": seed, "repeat": repeat, "results": results},
+            f,
+            indent=2,
+        )
+    print("[*] benchmark saved to", out_path)
+    return out_path
+
+
+def bench_search(
+    data_path: str,
+    input_path: str,
+    ratio: float = 0.6,
+    long_pairs: int = 50,
+    seed: int = 0,
+) -> list[dict]:
+    """
+    time and count the expansions of every search mode on the same segments
+    """
+    layout = Layout.load(data_path, input_path, ratio)
+    sg = SG_graph(data_path, input_path, ratio, layout=layout)
+    graph = sg.build_csr()
+    route_list = astar.read_routes(layout, sg.nearest_incomp, sg.nearest_outcomp)
+    names: list[str] = list(sg.compo_dict.keys())
+    rng = np.random.default_rng(seed)
+    segments: dict[str, list[tuple[str, str]]] = {
+        "netlist": list(
+            dict.fromkeys(
+                (route[idx], route[idx + 1])
+                for route in route_list
+                for idx in range(len(route) - 1)
+            )
+        ),
+        "random": [
+            (names[a], names[b])
+            for a, b in rng.integers(len(names), size=(long_pairs, 2)).tolist()
+            if a != b
+        ],
+    }
+    rows: list[dict] = []
+    for kind, pairs in segments.items():
+        for mode in astar.SEARCH_MODES:
+            stats: dict = {}
+            tick = time.perf_counter()
+            length: float = 0.0
+            for start_name, targe_name in pairs:
+                path = astar.find_shortest_path(
+                    start_name, targe_name, sg.compo_dict, graph, mode, stats
+                )[2]
+                if path is not None:
+                    length += wirelength([[path]])
+            rows.append(
+                {
+                    "segments": kind,
+                    "mode": mode,
+                    "pairs": len(pairs),
+                    "time": time.perf_counter() - tick,
+                    "length": length,
+                    **stats,
+                }
+            )
+    return rows
+
+
+def run_search_suite(
+    sizes: tuple[int, ...] = SIZES,
+    seed: int = 0,
+    label: str | None = None,
+    out_dir: str = BENCH_DIR,
+) -> str:
+    """
+    compare the search modes for every size, saved as <label>-search.json
+    """
+    label = label or git_revision()
+    results: list[dict] = []
+    for size in sizes:
+        data_path, input_path = generate(size, seed, SYNTHETIC_DIR)
+        for row in bench_search(data_path, input_path, seed=seed):
+            row["size"] = size
+            print(
+                f"[*] size {size} {row['segments']:>7} {row['mode']:>13}: "
+                f"{row['time']:.4f}s expanded {row.get('expanded', 0)} "
+                f"pushed {row.get('pushed', 0)} length {row['length']:.2f}"
+            )
+            results.append(row)
+
+    os.makedirs(out_dir, exist_ok=True)
+    out_path: str = os.path.join(out_dir, f"{label}-search.json")
+    with open(out_path, mode="w", encoding="utf-8") as f:
+        json.dump({"label": label, "seed": seed, "results": results}, f, indent=2)
+    print("[*] benchmark saved to", out_path)
+    return out_path
+
+
+def compare(old_path: str, new_path: str) -> None:
+    """
+    print the speedup of every stage for the sizes both result files contain
+    """
+    with open(old_path, encoding="utf-8") as f:
+        old = {result["size"]: result for result in json.load(f)["results"]}
+    with open(new_path, encoding="utf-8") as f:
+        new = {result["size"]: result for result in json.load(f)["results"]}
+    print(f"{'size':>6} {'stage':>15} {'old':>10} {'new':>10} {'speedup':>8}")
+    for size in sorted(old.keys() & new.keys()):
+        for stage in STAGES:
+            before = old[size]["timing"].get(stage)
+            after = new[size]["timing"].get(stage)
+            if before is None or after is None:
+                continue
+            speedup = before / after if after > 0 else float("inf")
+            print(f"{size:>6} {stage:>15} {before:>10.4f} {after:>10.4f} {speedup:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="benchmark the routing pipeline")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--mode", default="pairwise", choices=astar.SEARCH_MODES)
+    parser.add_argument("--label", default=None, help="result name, git hash by default")
+    parser.add_argument("--out", default=BENCH_DIR)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    parser.add_argument(
+        "--detail-n", type=int, nargs="+", help="compare detail routing modes over n"
+    )
+    parser.add_argument("--search", action="store_true", help="compare search modes")
+    parser.add_argument(
+        "--fixed-scale", type=int, default=None, help="fixed-point coordinate grid"
+    )
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    elif args.search:
+        run_search_suite(tuple(args.sizes), args.seed, args.label, args.out)
+    elif args.detail_n:
+        run_detail_suite(
+            tuple(args.sizes),
+            tuple(args.detail_n),
+            args.seed,
+            args.repeat,
+            args.mode,
+            args.label,
+            args.out,
+        )
+    else:
+        run_suite(
+            tuple(args.sizes),
+            args.seed,
+            args.repeat,
+            args.mode,
+            args.label,
+            args.out,
+            args.fixed_scale,
+        )
@@ -9,7 +9,6 @@
 
 import warnings
 
-import matplotlib.pyplot as plt
 import numpy as np
 from matplotlib.path import Path
 from scipy.spatial import Delaunay
@@ -17,7 +16,10 @@ from shapely.geometry import Point, Polygon
 
 import PythonCDT as cdt
 from Dataset import Dataset
-from util import read_input_file
+from Instrument import progress, show_progress, timed
+from Layout import Layout
+from Layout_Cache import LayoutCache, layout_key
+from util import legalize_triangulation
 
 
 class chipCDT:
@@ -25,58 +27,143 @@ class chipCDT:
     construct the CDT
     """
 
-    def __init__(self, file_path: str, input_path: str, ratio: float) -> None:
+    @timed("cdt")
+    def __init__(
+        self,
+        file_path: str,
+        input_path: str,
+        ratio: float,
+        cache: LayoutCache | None = None,
+        layout: Layout | None = None,
+        fixed_scale: int | None = None,
+        canonical: bool = False,
+    ) -> None:
         """
         init the CDT graph
+        with a layout cache an unchanged layout skips the triangulation,
+        pass the parsed layout to avoid reading the files again,
+        fixed_scale snaps the constraint vertices to the fixed-point grid,
+        by default the one the layout was read with,
+        canonical resolves cocircular ties independent of the insertion order
         """
-        data = Dataset(file_path, input_path, ratio)
-        process_data_path, _, _ = data.write_fixed_data()
+        if fixed_scale is None and layout is not None:
+            fixed_scale = layout.fixed_scale
+        self.canonical: bool = canonical
+        cache_key: str | None = None
+        if cache is not None:
+            options: dict = {"ratio": float(ratio)}
+            if fixed_scale is not None:
+                options["fixed_scale"] = fixed_scale
+            if canonical:
+                options["canonical"] = True
+            cache_key = layout_key(file_path, "cdt", layout, **options)
+            entry = cache.load(cache_key)
+            if entry is not None:
+                self.CDT = None
+                self.all_vec_arr: np.ndarray = entry["points"]
+                self.all_edge_arr: np.ndarray = entry["edges"]
+                self.final_arr: np.ndarray = entry["triangles"]
+                progress("load the CDT from cache successfully!")
+                return
+
+        # 约束几何直接在内存中传给CDT, 不再写入并读回 _processed 文件
+        data = Dataset(file_path, input_path, ratio, layout, fixed_scale)
+        self.all_vec_arr, self.all_edge_arr = data.constraint_geometry()
 
-        self.vv, self.ee = read_input_file(process_data_path)
         self.CDT = cdt.Triangulation(
             cdt.VertexInsertionOrder.AS_PROVIDED,
             cdt.IntersectingConstraintEdges.TRY_RESOLVE,
             0.0,
         )
-        self.CDT.insert_vertices(self.vv)
-        self.CDT.insert_edges(self.ee)
+        chipCDT._insert_constraint(self.CDT, self.all_vec_arr, self.all_edge_arr)
         self.CDT.erase_outer_triangles_and_holes()
+        self.final_arr = None
+
+        if cache is not None:
+            cache.save(
+                cache_key,
+                points=self.get_all_points(),
+                edges=self.all_edge_arr,
+                triangles=self.get_all_triangles(),
+            )
+
+    @staticmethod
+    def _insert_constraint(
+        triangulation: cdt.Triangulation, vertices: np.ndarray, edges: np.ndarray
+    ) -> None:
+        """
+        insert vertices and constraint edges in bulk from ndarrays
+        bindings without buffer support get V2d / Edge lists instead
+        """
+        try:
+            triangulation.insert_vertices(np.ascontiguousarray(vertices, dtype=np.float64))
+        except TypeError:
+            triangulation.insert_vertices([cdt.V2d(x, y) for x, y in vertices.tolist()])
+        try:
+            triangulation.insert_edges(np.ascontiguousarray(edges, dtype=np.uint32))
+        except TypeError:
+            triangulation.insert_edges([cdt.Edge(a, b) for a, b in edges.tolist()])
+
+    @staticmethod
+    def triangulate(vertices: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        """
+        constrained triangulation of a standalone region, (T, 3) vertex indices
+        regions outside the outer ring and inside holes are erased
+        """
+        triangulation = cdt.Triangulation(
+            cdt.VertexInsertionOrder.AS_PROVIDED,
+            cdt.IntersectingConstraintEdges.TRY_RESOLVE,
+            0.0,
+        )
+        chipCDT._insert_constraint(triangulation, vertices, edges)
+        triangulation.erase_outer_triangles_and_holes()
+        if len(triangulation.vertices) != len(vertices):
+            # 约束边相交时会新增顶点, 下标不再与输入对应
+            raise RuntimeError("constraint edges intersect, vertices were added")
+        if hasattr(triangulation, "triangles_array"):
+            return triangulation.triangles_array()["vertices"].astype(np.int64)
+        return np.array([tri.vertices for tri in triangulation.triangles]).reshape(-1, 3)
 
     def get_all_points(self) -> np.ndarray:
         """
         get an ndarray of all points
         """
-        all_vec_list = []
-        for vec in self.vv:
-            all_vec_list.append([vec.x, vec.y])
-        self.all_vec_arr = np.array(all_vec_list)
-
         return self.all_vec_arr
 
     def get_all_triangles(self) -> np.ndarray:
         """
         get an ndarray of all index of triangles
+        the library resolves cocircular ties by the vertex insertion order;
+        with canonical they are resolved canonically (see
+        legalize_triangulation), so the result depends on the coordinates only
+        and an incremental update reproduces it exactly
         """
-        final_list = []
-        for tri in self.CDT.triangles:
-            final_list.append(tri.vertices)
-
-        self.final_arr = np.array(final_list)
+        if self.final_arr is None:
+            if hasattr(self.CDT, "triangles_array"):
+                self.final_arr = self.CDT.triangles_array()["vertices"].astype(np.int64)
+            else:
+                self.final_arr = np.array([tri.vertices for tri in self.CDT.triangles])
+            if self.canonical:
+                self.final_arr, _ = legalize_triangulation(self.all_vec_arr, self.final_arr)
         return self.final_arr
 
     def dispaly_cdt(self) -> None:
         """
         display the CDT graph
         """
+        # 绘图时才导入pyplot, 布线流程本身不依赖它
+        import matplotlib.pyplot as plt
+
         all_vec_arr = self.get_all_points()
         final_arr = self.get_all_triangles()
         plt.triplot(all_vec_arr[:, 0], all_vec_arr[:, 1], final_arr, label="CDT line")
         plt.scatter(all_vec_arr[:, 0], all_vec_arr[:, 1], color="green", label="Points")
         plt.legend(loc="upper center")
-        print("[*] draw the CDT and search SG graph successfully!")
+        progress("draw the CDT and search SG graph successfully!")
         plt.show()
 
 
 if __name__ == "__main__":
+    show_progress()
     t = chipCDT("Data\data5.txt", "Data\input5.txt", 0.6)
     t.dispaly_cdt()
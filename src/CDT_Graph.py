@@ -29,13 +29,43 @@ SG = 空集
 """
 
 
-import matplotlib.pyplot as plt
 import networkx as nx
 import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, dijkstra
 
 from CDT import chipCDT
+from CSR_Graph import CSR_graph
 from Dataset import Dataset
-from util import calculate_midpoint_with2points, segment_dividers
+from Instrument import progress, show_progress, size, timed
+from Layout import Layout
+from Layout_Cache import LayoutCache, layout_key
+from util import (
+    as_point_records,
+    build_vertex_triangle_index,
+    calculate_polygon_edge_midpoints,
+    calculate_polygon_edge_midpoints_fixed,
+    calculate_tri_edge_midpoints,
+    calculate_tri_edge_midpoints_fixed,
+    from_fixed,
+    isin_rows,
+    legalize_triangulation,
+    pack_fixed,
+    point_keys,
+    point_on_rectangle,
+    search_sorted_keys,
+    search_sorted_points,
+    segment_dividers,
+    snap_to_fixed,
+    to_fixed,
+    triangle_neighbors,
+    unique_rows_in_order,
+    unpack_fixed,
+)
+
+
+# 增量更新时受影响区域向外扩展的距离
+UPDATE_MARGIN = 1.0
 
 
 class SG_graph:
@@ -48,9 +78,34 @@ class SG_graph:
         data_path: str,
         input_path: str,
         ratio: float,
+        cache: LayoutCache | None = None,
+        layout: Layout | None = None,
+        fixed_scale: int | None = None,
+        canonical: bool = False,
     ) -> None:
-        data = Dataset(data_path, input_path, ratio)
-        self.cdt = chipCDT(data_path, input_path, ratio)
+        """
+        with fixed_scale the coordinates are snapped to the 1 / fixed_scale grid
+        and vertices, midpoints and ports are matched by packed int64 keys
+        instead of float equality, see util.to_fixed;
+        a layout read with a fixed_scale brings its own
+        canonical makes the CDT and the SG depend on the layout only, not on
+        the vertex insertion order or the history of update_layout calls,
+        for placement loops that compare moved layouts (see chipCDT)
+        """
+        if layout is None:
+            layout = Layout.load(data_path, input_path, ratio, fixed_scale)
+        elif fixed_scale is None:
+            fixed_scale = layout.fixed_scale
+        self.layout = layout
+        data = Dataset(data_path, input_path, ratio, layout, fixed_scale)
+        self.cdt = chipCDT(
+            data_path, input_path, ratio, cache, layout, fixed_scale, canonical
+        )
+        self.data_path = data_path
+        self.ratio = ratio
+        self.cache = cache
+        self.fixed_scale: int | None = fixed_scale
+        self.canonical: bool = canonical
         self.graph = nx.Graph()
         self.point = self.cdt.get_all_points()
         self.tri = self.cdt.get_all_triangles()
@@ -62,51 +117,124 @@ class SG_graph:
         )
         self.terminal_to_mid = {}
         self.has_count_lenth = set()
+        self._build_vertex_tri_index()
+        size("cdt_vertices", len(self.point))
+        size("triangles", len(self.tri))
 
-    def add_midpoint_to_SG(self) -> list[tuple[np.float64, np.float64]]:
+    def _build_vertex_tri_index(self) -> None:
         """
-        add valid triangles' midpoint into searching SG graph
+        build the vertex -> incident triangle corners index once
+        vertices with the same coordinate share one entry
         """
-        mid_point_list: list[tuple[np.float64, np.float64]] = (
-            self.calculate_tri_midpoint(self.point, self.tri)
+        if self.fixed_scale is None:
+            point_records: np.ndarray = as_point_records(self.point)
+            self.vertex_records, vertex_class = np.unique(
+                point_records, return_inverse=True
+            )
+        else:
+            # 键的大小顺序与坐标字典序一致, vertex_records 与 vertex_keys 一一对应
+            self.vertex_keys, vertex_class = np.unique(
+                point_keys(self.point, self.fixed_scale), return_inverse=True
+            )
+            self.vertex_records = as_point_records(
+                from_fixed(unpack_fixed(self.vertex_keys), self.fixed_scale)
+            )
+        self.vertex_class: np.ndarray = vertex_class.ravel()
+        self.vertex_tri_indptr, self.vertex_tri_slots = build_vertex_triangle_index(
+            self.vertex_class[self.tri], len(self.vertex_records)
         )
-        self.graph.add_nodes_from(mid_point_list)
-        # print(len(self.graph.nodes()))
 
-        # 去除芯片边缘中点与障碍边缘中点
-        # 计算边缘点的中点
-        bound_mid_list: list[tuple[np.float64, np.float64]] = (
-            SG_graph.calcuulate_boundary_midpoint(self.constraint)
+    @timed("sg.midpoint")
+    def add_midpoint_to_SG(self) -> list[tuple[np.float64, np.float64]]:
+        """
+        add valid triangles' midpoint into searching SG graph
+        """
+        self.tri_mid, self.tri_mid_valid, mid_nodes = self._tri_midpoints(
+            self.point, self.tri
         )
-        # 只保留存在的点
-        existing_nodes_to_remove = [
-            node for node in bound_mid_list if node in self.graph.nodes
-        ]
-        self.graph.remove_nodes_from(existing_nodes_to_remove)
-        # print(len(self.graph.nodes()))
+        self.graph.add_nodes_from(map(tuple, mid_nodes))
 
-        print("[*] add the midpoint to SG successfully!")
+        progress("add the midpoint to SG successfully!")
         return self.graph.nodes()
 
+    def _tri_midpoints(
+        self, point: np.ndarray, tri: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        midpoints (T, 3, 2) of the triangle edges, whether each one is an SG
+        node (not on the chip or an obstacle boundary) and the distinct SG
+        nodes in first-seen order; terminal_to_mid is filled on the way
+        """
+        if self.fixed_scale is None:
+            # 一次性计算所有三角形边的中点 (T, 3, 2)
+            tri_mid, tri_terminal = calculate_tri_edge_midpoints(point, tri)
+            flat_mid: np.ndarray = tri_mid.reshape(-1, 2)
+            # 去除芯片边缘中点与障碍边缘中点
+            bound_mid: np.ndarray = calculate_polygon_edge_midpoints(self.constraint)
+            flat_valid: np.ndarray = ~isin_rows(flat_mid, bound_mid)
+            mid_nodes: np.ndarray = unique_rows_in_order(flat_mid[flat_valid])
+        else:
+            # 定点坐标下中点是精确的整数, 用打包键比较与去重
+            fixed: np.ndarray = to_fixed(point, self.fixed_scale)
+            mid_fixed: np.ndarray = calculate_tri_edge_midpoints_fixed(fixed, tri)
+            mid_keys: np.ndarray = pack_fixed(mid_fixed).ravel()
+            bound_keys: np.ndarray = pack_fixed(
+                calculate_polygon_edge_midpoints_fixed(
+                    to_fixed(self.constraint, self.fixed_scale)
+                )
+            )
+            flat_valid = ~np.isin(mid_keys, bound_keys)
+            valid_keys: np.ndarray = mid_keys[flat_valid]
+            _, first = np.unique(valid_keys, return_index=True)
+            # 浮点坐标由整数换算得到, 同一个键总是得到同一个元组
+            tri_mid = from_fixed(mid_fixed, self.fixed_scale)
+            tri_terminal = from_fixed(
+                np.stack((fixed[tri], np.roll(fixed[tri], -1, axis=1)), axis=2),
+                self.fixed_scale,
+            )
+            flat_mid = tri_mid.reshape(-1, 2)
+            mid_nodes = from_fixed(
+                unpack_fixed(valid_keys[np.sort(first)]), self.fixed_scale
+            )
+        terminal: np.ndarray = tri_terminal.reshape(-1, 2, 2)
+        if self.canonical:
+            # 端点按坐标字典序排列, 与三角形的顶点顺序无关
+            swap: np.ndarray = (terminal[:, 0, 0] > terminal[:, 1, 0]) | (
+                (terminal[:, 0, 0] == terminal[:, 1, 0])
+                & (terminal[:, 0, 1] > terminal[:, 1, 1])
+            )
+            terminal[swap] = terminal[swap][:, ::-1]
+        self.terminal_to_mid.update(
+            zip(
+                map(tuple, flat_mid),
+                ((tuple(p1), tuple(p2)) for p1, p2 in terminal),
+            )
+        )
+        return tri_mid, flat_valid.reshape(-1, 3), mid_nodes
+
+    @timed("sg.edges")
     def add_egdes_to_SG(
         self,
     ) -> list[tuple[tuple[np.float64, np.float64], tuple[np.float64, np.float64]]]:
         """
         add valid triangles' neutrality into searching SG graph
         """
-        mid_point_list: list[list[tuple[np.float64, np.float64]]] = (
-            SG_graph.calculate_tri_neutrality_edge(self.point, self.tri)
-        )
-
-        neutrality_edge_list: list[tuple[tuple[np.float64, np.float64]]] = (
-            self.filter_valid_neutrality_edge(mid_point_list)
+        if not hasattr(self, "tri_mid"):
+            self.add_midpoint_to_SG()
+        # 中位线连接同一三角形第k条边与第k+1条边的中点
+        # 两个端点都在SG中才有效
+        edge_valid: np.ndarray = self.tri_mid_valid & np.roll(
+            self.tri_mid_valid, -1, axis=1
         )
+        edge_head: np.ndarray = self.tri_mid[edge_valid]
+        edge_tail: np.ndarray = np.roll(self.tri_mid, -1, axis=1)[edge_valid]
 
         # 将边加入SG图
-        self.graph.add_edges_from(neutrality_edge_list)
-        print("[*] add the neutrality edge to SG successfully!")
+        self.graph.add_edges_from(zip(map(tuple, edge_head), map(tuple, edge_tail)))
+        progress("add the neutrality edge to SG successfully!")
         return self.graph.edges()
 
+    @timed("sg.ports")
     def add_startarget_to_SG(
         self,
     ) -> tuple[
@@ -131,54 +259,547 @@ class SG_graph:
         # print(target_edges)
         self.graph.add_edges_from(edges)
         # self.graph.add_edges_from(target_edges)
-        print("[*] add the midpoint and startarget edge to SG successfully!")
+        progress("add the midpoint and startarget edge to SG successfully!")
         return edges
 
     def _add_midpoint_ver_to_SG(self, compo_dict):
+        """
+        connect every component corner with the opposite edge midpoint
+        of each triangle that contains the corner
+        """
+        if not hasattr(self, "tri_mid") or not compo_dict:
+            return []
+
+        corners: np.ndarray = np.concatenate(
+            [np.asarray(pos, dtype=np.float64) for pos in compo_dict.values()]
+        )
+        if self.fixed_scale is None:
+            vertex: np.ndarray = search_sorted_points(self.vertex_records, corners)
+        else:
+            vertex = search_sorted_keys(
+                self.vertex_keys, point_keys(corners, self.fixed_scale)
+            )
+        corners, vertex = corners[vertex >= 0], vertex[vertex >= 0]
+
+        # 通过索引直接取出包含该顶点的所有三角形角
+        lo: np.ndarray = self.vertex_tri_indptr[vertex]
+        count: np.ndarray = self.vertex_tri_indptr[vertex + 1] - lo
+        offset: np.ndarray = np.arange(count.sum()) - np.repeat(
+            np.cumsum(count) - count, count
+        )
+        slots: np.ndarray = self.vertex_tri_slots[np.repeat(lo, count) + offset]
+
+        # 顶点k的对边即为第(k+1)%3条边
+        tri_idx, opposite = slots // 3, (slots % 3 + 1) % 3
+        # 判断该点是否有在SG图中
+        in_SG: np.ndarray = self.tri_mid_valid[tri_idx, opposite]
+        ports: np.ndarray = np.repeat(corners, count, axis=0)[in_SG]
+        midpoints: np.ndarray = self.tri_mid[tri_idx, opposite][in_SG]
+
         startarget_edges: list[
             tuple[tuple[np.float64, np.float64], tuple[np.float64, np.float64]]
-        ] = []
-        # startarget_dict: dict[str, np.ndarray] = {}
-        # for key in compo_dict.keys():
-        # input_compo_key = nearest_comp[key]
-        # print(input_compo_key,compo_dict[input_compo_key])
-        # startarget_dict[input_compo_key] = compo_dict[input_compo_key]
-        # print(start_dict)
-
-        tri_list = []
-        # 预先提取所有的三角形顶点坐标位置
-        for t in self.tri:
-            tri_list.append(self.point[t])
-        # print(tri_list)
-
-        for start in compo_dict.keys():
-            start_four_pos: np.ndarray = compo_dict[start]
-            # print(start_four_pos)
-            for each_ver in start_four_pos:
-                for triangles in tri_list:
-                    # 判断该顶点被哪个三角形所包括
-                    if np.any(np.all(each_ver == triangles, axis=1)):
-                        # print(each_ver,triangles)
-                        # 提取出非该顶点的其他顶点计算该边中点
-                        mask = ~np.all(each_ver == triangles, axis=1)
-                        # 三角形其他顶点
-                        other_ver = triangles[mask]
-                        # print(other_ver)
-                        midpoint: tuple[np.float64, np.float64] = (
-                            calculate_midpoint_with2points(other_ver)
-                        )
-                        # print(midpoint)
-                        # 判断该点是否有在SG图中
-                        if self.graph.has_node(midpoint):
-                            float64_elements = tuple(np.float64(x) for x in each_ver)
-                            startarget_edges.append((float64_elements, midpoint))
-        # print(start_edges)
+        ] = list(zip(map(tuple, ports), map(tuple, midpoints)))
         return startarget_edges
 
+    @staticmethod
+    def _triangle_sg_edges(
+        points: np.ndarray,
+        tri: np.ndarray,
+        tri_mid: np.ndarray,
+        tri_mid_valid: np.ndarray,
+        corner_records: np.ndarray,
+    ) -> list[tuple[tuple[np.float64, np.float64], tuple[np.float64, np.float64]]]:
+        """
+        neutrality edges and corner-to-opposite-midpoint edges of some triangles,
+        the same edges add_egdes_to_SG and add_startarget_to_SG put into SG
+        """
+        edge_valid: np.ndarray = tri_mid_valid & np.roll(tri_mid_valid, -1, axis=1)
+        heads: list[np.ndarray] = [tri_mid[edge_valid]]
+        tails: list[np.ndarray] = [np.roll(tri_mid, -1, axis=1)[edge_valid]]
+        vertex_pos: np.ndarray = points[tri]
+        for k in range(3):
+            # 顶点k的对边即为第(k+1)%3条边
+            is_corner: np.ndarray = (
+                search_sorted_points(corner_records, vertex_pos[:, k]) >= 0
+            ) & tri_mid_valid[:, (k + 1) % 3]
+            heads.append(vertex_pos[is_corner, k])
+            tails.append(tri_mid[is_corner, (k + 1) % 3])
+        return list(
+            zip(map(tuple, np.concatenate(heads)), map(tuple, np.concatenate(tails)))
+        )
+
+    def move_component(self, name: str, center: tuple[int, int]) -> np.ndarray:
+        """
+        move a component and patch the CDT and SG around it
+        """
+        return self.update_layout(self.layout.replace_component(name, center), [name])
+
+    def add_component(
+        self, name: str, center: tuple[int, int], size: tuple[int, int]
+    ) -> np.ndarray:
+        """
+        add a component and patch the CDT and SG around it
+        """
+        return self.update_layout(self.layout.add_component(name, center, size), [name])
+
+    def remove_component(self, name: str) -> np.ndarray:
+        """
+        remove a component and patch the CDT and SG around it
+        """
+        return self.update_layout(self.layout.remove_component(name), [name])
+
+    @timed("sg.update")
+    def update_layout(self, layout: Layout, names: list[str]) -> np.ndarray:
+        """
+        switch to a layout that differs in the named components only
+        the triangles touching each old and new footprint form the cavities,
+        which are triangulated again on their own; edge flips then restore the
+        Delaunay property across the cavity borders; the SG edges of every
+        removed triangle are replaced and everything else is kept, so the SG
+        equals one built from the patched triangles
+        with canonical the triangles are the ones a full rebuild gives,
+        otherwise they may differ at cocircular ties, which the library
+        resolves by the insertion order
+        return the changed regions (K, 2, 2), one box
+        [[xmin, ymin], [xmax, ymax]] per connected group of changed triangles
+        """
+        old_layout: Layout = self.layout
+        self._check_placement(layout, names)
+        old_footprints: list[np.ndarray] = [
+            old_layout.corners[old_layout.name_index[name]]
+            for name in names
+            if name in old_layout.name_index
+        ]
+        new_footprints: list[np.ndarray] = [
+            layout.corners[layout.name_index[name]]
+            for name in names
+            if name in layout.name_index
+        ]
+        if self.fixed_scale is not None:
+            old_footprints = [
+                snap_to_fixed(corner, self.fixed_scale) for corner in old_footprints
+            ]
+            new_footprints = [
+                snap_to_fixed(corner, self.fixed_scale) for corner in new_footprints
+            ]
+        if (
+            not old_footprints + new_footprints
+            or layout.boundary != old_layout.boundary
+        ):
+            return self._rebuild(layout)
+
+        # 空腔: 与每个新旧位置 (向外扩展 UPDATE_MARGIN) 相交的三角形,
+        # 每个位置单独取, 远距离移动时不会把两处之间的三角形都重新剖分
+        tri_pos: np.ndarray = self.point[self.tri]
+        tri_low, tri_high = tri_pos.min(axis=1), tri_pos.max(axis=1)
+        cavity: np.ndarray = np.zeros(len(self.tri), dtype=bool)
+        for corner in old_footprints + new_footprints:
+            low: np.ndarray = corner.min(axis=0) - UPDATE_MARGIN
+            high: np.ndarray = corner.max(axis=0) + UPDATE_MARGIN
+            cavity |= ((tri_low <= high) & (tri_high >= low)).all(axis=1)
+
+        # 空腔边界 = 只属于一个空腔三角形的边, 去掉组件旧位置的边
+        # 多个互不相连的空腔一起剖分, 空腔之外的部分按外部区域删除
+        cavity_cls: np.ndarray = self.vertex_class[self.tri[cavity]]
+        slot_edge: np.ndarray = np.sort(
+            np.stack((cavity_cls, np.roll(cavity_cls, -1, axis=1)), axis=2), axis=2
+        ).reshape(-1, 2)
+        edge_cls, edge_count = np.unique(slot_edge, axis=0, return_counts=True)
+        vertex_pos: np.ndarray = self.vertex_records.view(np.float64).reshape(-1, 2)
+        boundary: np.ndarray = edge_cls[edge_count == 1]
+        for old_corner in old_footprints:
+            on_side: np.ndarray = point_on_rectangle(
+                vertex_pos[boundary[:, 0]], old_corner
+            ) & point_on_rectangle(vertex_pos[boundary[:, 1]], old_corner)
+            boundary = boundary[~on_side]
+
+        # 边界顶点与新组件的四个角点一起重新剖分
+        keep_cls, boundary_local = np.unique(boundary, return_inverse=True)
+        sub_vertices: list[np.ndarray] = [vertex_pos[keep_cls]]
+        sub_edges: list[np.ndarray] = [boundary_local.reshape(-1, 2)]
+        offset: int = len(keep_cls)
+        for new_corner in new_footprints:
+            sub_vertices.append(new_corner)
+            sub_edges.append(np.array([[0, 1], [1, 2], [2, 3], [3, 0]]) + offset)
+            offset += len(new_corner)
+        try:
+            sub_tri: np.ndarray = chipCDT.triangulate(
+                np.concatenate(sub_vertices).astype(np.float64),
+                np.concatenate(sub_edges).astype(np.int32),
+            )
+        except RuntimeError:
+            return self._rebuild(layout)
+        sub_points: np.ndarray = np.concatenate(sub_vertices).astype(np.float64)
+
+        # 拼接: 保留空腔外的三角形, 新顶点追加在末尾, 再去掉不再使用的顶点
+        first_point: np.ndarray = np.empty(len(self.vertex_records), dtype=np.int64)
+        first_point[self.vertex_class[::-1]] = np.arange(len(self.point))[::-1]
+        point: np.ndarray = np.concatenate((self.point, sub_points[len(keep_cls) :]))
+        sub_global: np.ndarray = np.concatenate(
+            (
+                first_point[keep_cls],
+                len(self.point) + np.arange(len(sub_points) - len(keep_cls)),
+            )
+        )
+        tri: np.ndarray = np.concatenate((self.tri[~cavity], sub_global[sub_tri]))
+        used, tri = np.unique(tri, return_inverse=True)
+        tri = tri.reshape(-1, 3)
+        point = point[used]
+
+        # 从新三角形出发翻转非法边, 翻转可能延伸到空腔之外
+        kept: int = int((~cavity).sum())
+        tri, flipped = legalize_triangulation(point, tri, np.arange(len(tri)) >= kept)
+        added: np.ndarray = flipped.copy()
+        added[kept:] = True
+        removed: np.ndarray = cavity.copy()
+        removed[np.flatnonzero(~cavity)[flipped[:kept]]] = True
+        region: np.ndarray = SG_graph._changed_region(point, tri, added)
+
+        old_corner_records: np.ndarray = np.sort(
+            as_point_records(np.concatenate(list(self.compo_dict.values())))
+        )
+        data = Dataset(self.data_path, self.input_path, self.ratio, layout, self.fixed_scale)
+        self.layout = layout
+        self.constraint = data.process_data2array()
+        self.compo_center_dict, self.compo_dict = data.get_point_dict()
+        self.nearest_incomp, self.nearest_outcomp = data.process_input_data(
+            self.compo_center_dict
+        )
+
+        if hasattr(self, "tri_mid"):
+            self._patch_SG(removed, old_corner_records, old_footprints, point, tri, added)
+        self.point, self.tri = point, tri
+        self._build_vertex_tri_index()
+        # chipCDT 只保留结果数组, 约束边改用新顶点的下标
+        geometry_vertices, geometry_edges = data.constraint_geometry()
+        first_point = np.empty(len(self.vertex_records), dtype=np.int64)
+        first_point[self.vertex_class[::-1]] = np.arange(len(point))[::-1]
+        self.cdt.CDT = None
+        self.cdt.all_vec_arr = point
+        self.cdt.all_edge_arr = first_point[
+            search_sorted_points(self.vertex_records, geometry_vertices)
+        ][geometry_edges]
+        self.cdt.final_arr = tri
+        # 布局已与文件不同, 不再使用磁盘缓存; 组件距离表也已过期
+        self.cache = None
+        for name in (
+            "compo_names",
+            "compo_distance",
+            "_distance_csr",
+            "_distance_predecessors",
+        ):
+            self.__dict__.pop(name, None)
+        size("cdt_vertices", len(self.point))
+        size("triangles", len(self.tri))
+        progress("update the CDT and SG locally successfully!")
+        return region
+
+    @staticmethod
+    def _changed_region(
+        point: np.ndarray, tri: np.ndarray, changed: np.ndarray
+    ) -> np.ndarray:
+        """
+        (K, 2, 2) bounding box of every edge-connected group of changed triangles
+        """
+        idx: np.ndarray = np.flatnonzero(changed)
+        nbr: np.ndarray = triangle_neighbors(tri)[idx]
+        # 只保留两侧都发生变化的相邻关系
+        local: np.ndarray = np.full(len(tri), -1, dtype=np.int64)
+        local[idx] = np.arange(len(idx))
+        row: np.ndarray = np.repeat(np.arange(len(idx)), 3)
+        col: np.ndarray = np.where(nbr.ravel() >= 0, local[nbr.ravel()], -1)
+        link: np.ndarray = col >= 0
+        _, label = connected_components(
+            coo_matrix(
+                (np.ones(int(link.sum())), (row[link], col[link])),
+                shape=(len(idx), len(idx)),
+            ),
+            directed=False,
+        )
+        tri_pos: np.ndarray = point[tri[idx]]
+        low: np.ndarray = np.full((label.max() + 1, 2), np.inf)
+        high: np.ndarray = np.full((label.max() + 1, 2), -np.inf)
+        np.minimum.at(low, label, tri_pos.min(axis=1))
+        np.maximum.at(high, label, tri_pos.max(axis=1))
+        return np.stack((low, high), axis=1)
+
+    def _patch_SG(
+        self,
+        removed: np.ndarray,
+        old_corner_records: np.ndarray,
+        footprints: list[np.ndarray],
+        point: np.ndarray,
+        tri: np.ndarray,
+        added: np.ndarray,
+    ) -> None:
+        """
+        replace the SG nodes and edges contributed by the removed triangles
+        with those of the added ones, the other triangles are unchanged
+        """
+        old_mid: np.ndarray = self.tri_mid[removed]
+        old_valid: np.ndarray = self.tri_mid_valid[removed]
+        self.graph.remove_edges_from(
+            SG_graph._triangle_sg_edges(
+                self.point, self.tri[removed], old_mid, old_valid, old_corner_records
+            )
+        )
+        new_mid, new_valid, mid_nodes = self._tri_midpoints(point, tri[added])
+        if not self.canonical:
+            self._terminal_order_as_built(point, tri, added, new_mid)
+        # 中点与三角形边一一对应, 不再出现的中点即已删除的边
+        flat_old: np.ndarray = old_mid.reshape(-1, 2)
+        present: np.ndarray = np.concatenate(
+            (self.tri_mid[~removed].reshape(-1, 2), new_mid.reshape(-1, 2))
+        )
+        gone: list = list(
+            map(tuple, unique_rows_in_order(flat_old[~isin_rows(flat_old, present)]))
+        )
+        self.graph.remove_nodes_from(gone)
+        for mid in gone:
+            self.terminal_to_mid.pop(mid, None)
+        # 组件旧位置的角点
+        for corners in footprints:
+            for corner in map(tuple, corners.astype(np.float64)):
+                if self.graph.has_node(corner) and self.graph.degree(corner) == 0:
+                    self.graph.remove_node(corner)
+
+        self.graph.add_nodes_from(map(tuple, mid_nodes))
+        corner_records: np.ndarray = np.sort(
+            as_point_records(np.concatenate(list(self.compo_dict.values())))
+        )
+        self.graph.add_edges_from(
+            SG_graph._triangle_sg_edges(
+                point, tri[added], new_mid, new_valid, corner_records
+            )
+        )
+        tri_mid: np.ndarray = np.empty((len(tri), 3, 2))
+        tri_mid_valid: np.ndarray = np.empty((len(tri), 3), dtype=bool)
+        tri_mid[~added], tri_mid_valid[~added] = (
+            self.tri_mid[~removed],
+            self.tri_mid_valid[~removed],
+        )
+        tri_mid[added], tri_mid_valid[added] = new_mid, new_valid
+        self.tri_mid, self.tri_mid_valid = tri_mid, tri_mid_valid
+
+    def _terminal_order_as_built(
+        self, point: np.ndarray, tri: np.ndarray, added: np.ndarray, new_mid: np.ndarray
+    ) -> None:
+        """
+        a full build keeps the endpoint order of the later of the two triangles
+        sharing an edge, give the edges of the added triangles that order too
+        """
+        idx: np.ndarray = np.flatnonzero(added)
+        head: np.ndarray = tri[idx]
+        tail: np.ndarray = np.roll(head, -1, axis=1)
+        later: np.ndarray = np.maximum(idx[:, None], triangle_neighbors(tri)[idx])
+        # 在较后的三角形中 head 之后是 tail 则保持顺序, 否则交换
+        later_tri: np.ndarray = tri[later]
+        pos: np.ndarray = np.argmax(later_tri == head[..., None], axis=2)
+        forward: np.ndarray = (
+            np.take_along_axis(later_tri, ((pos + 1) % 3)[..., None], axis=2)[..., 0]
+            == tail
+        )
+        first: np.ndarray = np.where(forward, head, tail).ravel()
+        second: np.ndarray = np.where(forward, tail, head).ravel()
+        pos_xy: np.ndarray = (
+            point if self.fixed_scale is None else snap_to_fixed(point, self.fixed_scale)
+        )
+        self.terminal_to_mid.update(
+            zip(
+                map(tuple, new_mid.reshape(-1, 2)),
+                zip(map(tuple, pos_xy[first]), map(tuple, pos_xy[second])),
+            )
+        )
+
+    def _check_placement(self, layout: Layout, names: list[str]) -> None:
+        """
+        the changed components must not overlap or touch any other component
+        """
+        for name in names:
+            if name not in layout.name_index:
+                continue
+            idx: int = layout.name_index[name]
+            low: np.ndarray = layout.corners[idx].min(axis=0)
+            high: np.ndarray = layout.corners[idx].max(axis=0)
+            other_low: np.ndarray = layout.corners.min(axis=1)
+            other_high: np.ndarray = layout.corners.max(axis=1)
+            touch: np.ndarray = ((other_low <= high) & (other_high >= low)).all(axis=1)
+            touch[idx] = False
+            if touch.any():
+                raise ValueError(
+                    f"component {name} overlaps {layout.names[int(np.argmax(touch))]}"
+                )
+            if (low <= 0).any():
+                raise ValueError(f"component {name} is outside the chip")
+
+    def _rebuild(self, layout: Layout) -> np.ndarray:
+        """
+        full rebuild for changes the local update cannot handle,
+        e.g. a component that grows or shrinks the die
+        """
+        built: bool = hasattr(self, "tri_mid")
+        SG_graph.__init__(
+            self,
+            self.data_path,
+            self.input_path,
+            self.ratio,
+            None,
+            layout,
+            self.fixed_scale,
+            self.canonical,
+        )
+        if built:
+            self.add_midpoint_to_SG()
+            self.add_egdes_to_SG()
+            self.add_startarget_to_SG()
+        return np.array([[[0.0, 0.0], layout.boundary[3]]], dtype=np.float64)
+
+    @timed("sg.csr")
+    def to_csr(self) -> CSR_graph:
+        """
+        export the SG graph as a compact CSR_graph
+        """
+        csr: CSR_graph = CSR_graph.from_nx(self.graph, self.terminal_to_mid)
+        size("sg_nodes", csr.num_nodes)
+        size("sg_edges", csr.num_edges)
+        return csr
+
+    def build_csr(self) -> CSR_graph:
+        """
+        the complete SG as a CSR_graph
+        with a layout cache the arrays are loaded when the layout is unchanged,
+        otherwise the add_* passes run (if not run yet) and the result is stored
+        """
+        cache_key: str | None = None
+        if self.cache is not None:
+            options: dict = {"ratio": float(self.ratio)}
+            if self.fixed_scale is not None:
+                options["fixed_scale"] = self.fixed_scale
+            if self.canonical:
+                options["canonical"] = True
+            cache_key = layout_key(self.data_path, "sg", self.layout, **options)
+            entry = self.cache.load(cache_key)
+            if entry is not None:
+                progress("load the SG from cache successfully!")
+                csr = CSR_graph(**entry)
+                size("sg_nodes", csr.num_nodes)
+                size("sg_edges", csr.num_edges)
+                return csr
+
+        if self.graph.number_of_nodes() == 0:
+            self.add_midpoint_to_SG()
+            self.add_egdes_to_SG()
+            self.add_startarget_to_SG()
+        csr: CSR_graph = self.to_csr()
+        if self.cache is not None:
+            self.cache.save(cache_key, **csr.arrays())
+        return csr
+
+    @timed("sg.component_distance")
+    def build_component_distance(
+        self,
+        csr: CSR_graph | None = None,
+        keep_predecessors: bool = True,
+        chunk: int = 256,
+    ) -> tuple[list[str], np.ndarray]:
+        """
+        shortest distance between every pair of components in one batch
+        Dijkstra runs from all component corners together on the CSR graph,
+        a pair's distance is the cheapest of its 4 x 4 corner pairs
+        return the component names and the dense (C, C) distance matrix
+        """
+        if csr is None:
+            csr = self.to_csr()
+        names: list[str] = list(self.compo_dict.keys())
+        corner_ids: np.ndarray = csr.node_ids(
+            np.concatenate([self.compo_dict[name] for name in names])
+        )
+        n_corner: int = corner_ids.reshape(len(names), -1).shape[1]
+        valid: np.ndarray = corner_ids >= 0
+        sources: np.ndarray = corner_ids[valid]
+        adjacency = csr.to_scipy()
+
+        # 分块计算, 不保留前驱时只占用chunk行的内存
+        corner_dist: np.ndarray = np.full((len(corner_ids), len(corner_ids)), np.inf)
+        predecessors: list[np.ndarray] = []
+        source_rows: np.ndarray = np.flatnonzero(valid)
+        for lo in range(0, len(sources), chunk):
+            result = dijkstra(
+                adjacency,
+                directed=True,
+                indices=sources[lo : lo + chunk],
+                return_predecessors=keep_predecessors,
+            )
+            dist = result[0] if keep_predecessors else result
+            if keep_predecessors:
+                predecessors.append(result[1].astype(np.int32))
+            corner_dist[source_rows[lo : lo + chunk][:, None], np.flatnonzero(valid)] = (
+                dist[:, sources]
+            )
+
+        # (C*4, C*4) -> (C, C, 16), 取最小的角点对, 与逐对搜索的循环顺序一致
+        pair_dist: np.ndarray = (
+            corner_dist.reshape(len(names), n_corner, len(names), n_corner)
+            .transpose(0, 2, 1, 3)
+            .reshape(len(names), len(names), n_corner * n_corner)
+        )
+        best_pair: np.ndarray = pair_dist.argmin(axis=2)
+        distance: np.ndarray = np.take_along_axis(
+            pair_dist, best_pair[..., None], axis=2
+        )[..., 0]
+
+        self.compo_names: list[str] = names
+        self.compo_distance: np.ndarray = distance
+        self._distance_csr: CSR_graph = csr
+        self._distance_corner_ids: np.ndarray = corner_ids
+        self._distance_best_pair: np.ndarray = best_pair
+        self._distance_source_row: np.ndarray = np.cumsum(valid) - 1
+        self._distance_predecessors: np.ndarray | None = (
+            np.concatenate(predecessors) if keep_predecessors and predecessors else None
+        )
+        progress("build the component distance table successfully!")
+        return names, distance
+
+    def component_path(self, start_name: str, targe_name: str):
+        """
+        rebuild the shortest path between two components from the table
+        return best_start, best_target and the path like find_shortest_path;
+        the path is a shortest one (the same length as the exact search modes),
+        but when several corner pairs or paths tie the corners and nodes it
+        picks can differ from find_shortest_path
+        """
+        if getattr(self, "_distance_predecessors", None) is None:
+            raise RuntimeError(
+                "call build_component_distance(keep_predecessors=True) first"
+            )
+        i: int = self.compo_names.index(start_name)
+        j: int = self.compo_names.index(targe_name)
+        if not np.isfinite(self.compo_distance[i, j]):
+            return None, None, None
+        n_corner: int = len(self._distance_corner_ids) // len(self.compo_names)
+        start_corner, target_corner = divmod(int(self._distance_best_pair[i, j]), n_corner)
+        start_row: int = i * n_corner + start_corner
+        start: int = int(self._distance_corner_ids[start_row])
+        target: int = int(self._distance_corner_ids[j * n_corner + target_corner])
+
+        pred: np.ndarray = self._distance_predecessors[
+            self._distance_source_row[start_row]
+        ]
+        path: list[int] = [target]
+        while path[-1] != start:
+            path.append(int(pred[path[-1]]))
+        path.reverse()
+        csr: CSR_graph = self._distance_csr
+        best_start, best_target = csr.to_points([start, target])
+        return best_start, best_target, csr.to_points(path)
+
     def draw_midpoint_and_neutrality(self) -> None:
         """
         draw the CDT graph and midpoint and neutrality line
         """
+        # 绘图时才导入pyplot, 布线流程本身不依赖它
+        import matplotlib.pyplot as plt
+
         points = self.graph.nodes()
         points_float = [(float(x), float(y)) for x, y in points]
         plt.scatter(
@@ -216,19 +837,9 @@ class SG_graph:
         """
         calculating the triangles' neutrality edge
         """
-        mid_point_list: list[tuple[np.float64, np.float64]] = []
-        for t in tri:
-            each_tri = points[t]
-            each_tri_list: list = []
-            for idx in range(len(each_tri)):
-                point1: np.ndarray = each_tri[idx]
-                point2: np.ndarray = each_tri[(idx + 1) % (len(each_tri))]
-                mid_point: np.ndarray = (point1 + point2) / 2
-                each_tri_list.append(tuple(mid_point))
-            # print(mid_point_list)
-            mid_point_list.append(each_tri_list)
+        tri_mid, _ = calculate_tri_edge_midpoints(points, tri)
         # [[(np.float64(31.25), np.float64(33.75)), (np.float64(23.75), np.float64(33.75)), (np.float64(35.0), np.float64(27.5))]
-        return mid_point_list
+        return [list(map(tuple, each_tri)) for each_tri in tri_mid]
 
     @staticmethod
     def calcuulate_boundary_midpoint(
@@ -237,14 +848,7 @@ class SG_graph:
         """
         calculating the triangles' boundary edge midpoint
         """
-        bound_mid_list: list[tuple[np.float64, np.float64]] = []
-        for area in constraint:
-            for idx in range(len(area)):
-                bound_point1: np.ndarray = area[idx]
-                bound_point2: np.ndarray = area[(idx + 1) % (len(area))]
-                bound_mid_point: np.ndarray = (bound_point1 + bound_point2) / 2
-                bound_mid_list.append(tuple(bound_mid_point))
-        return bound_mid_list
+        return list(map(tuple, calculate_polygon_edge_midpoints(constraint)))
 
     def calculate_tri_midpoint(
         self, points: np.ndarray, tri: np.ndarray
@@ -252,21 +856,21 @@ class SG_graph:
         """
         calculating the triangles' midpoint
         """
-        mid_point_list: list[tuple[np.float64, np.float64]] = []
-        for t in tri:
-            each_tri = points[t]
-            # print(each_tri)
-            for idx in range(len(each_tri)):
-                point1: np.ndarray = each_tri[idx]
-                point2: np.ndarray = each_tri[(idx + 1) % (len(each_tri))]
-                mid_point: np.ndarray = (point1 + point2) / 2
-                mid_point_list.append(tuple(mid_point))
-                self.terminal_to_mid[tuple(mid_point)] = (tuple(point1), tuple(point2))
-        # print(mid_point_list)
+        tri_mid, tri_terminal = calculate_tri_edge_midpoints(points, tri)
+        mid_point_list: list[tuple[np.float64, np.float64]] = list(
+            map(tuple, tri_mid.reshape(-1, 2))
+        )
+        self.terminal_to_mid.update(
+            zip(
+                mid_point_list,
+                ((tuple(p1), tuple(p2)) for p1, p2 in tri_terminal.reshape(-1, 2, 2)),
+            )
+        )
         return mid_point_list
 
 
 if __name__ == "__main__":
+    show_progress()
     # cdt = chipCDT("Data\data1.txt", "Data\input1.txt", 0.6)
     # print(points.shape)
     # print(triangles.shape)
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   CSR_Graph.py
+@Time    :   2024/08/06 10:12:45
+@Author  :   chenziyang
+@description   :   compact integer-indexed SG graph stored in CSR arrays
+"""
+
+"""
+存储结构:
+    coords  (N, 2) float64 : 节点坐标, 按(x, y)字典序排列, 节点编号即行号
+    indptr  (N + 1,) int32 : 节点i的邻居为 indices[indptr[i]:indptr[i + 1]]
+    indices (2E,) int32    : 邻居节点编号
+    weights (2E,) float64  : 对应边的欧氏长度, 建图时一次性计算
+    mid_ends (N, 2, 2)     : 中点节点所在三角形边的两个端点, 端口节点为nan
+
+节点按坐标字典序编号, 所以比较节点编号与比较坐标元组的结果一致,
+A*在优先级相同时的出队顺序与networkx版本完全相同
+"""
+
+from multiprocessing import shared_memory
+
+import networkx as nx
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from util import POINT_DTYPE, search_sorted_points
+
+# 完整描述一个图的数组, 用于进程间共享与磁盘缓存
+_GRAPH_FIELDS: tuple[str, ...] = ("coords", "indptr", "indices", "weights", "mid_ends")
+
+
+class CSR_graph:
+    """
+    the searching graph with int32 node ids and CSR adjacency
+    """
+
+    def __init__(
+        self,
+        coords: np.ndarray,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        weights: np.ndarray | None = None,
+        mid_ends: np.ndarray | None = None,
+    ) -> None:
+        self.coords: np.ndarray = np.ascontiguousarray(coords, dtype=np.float64)
+        self.indptr: np.ndarray = np.ascontiguousarray(indptr, dtype=np.int32)
+        self.indices: np.ndarray = np.ascontiguousarray(indices, dtype=np.int32)
+        if weights is None:
+            weights = CSR_graph.edge_lengths(self.coords, self.indptr, self.indices)
+        self.weights: np.ndarray = np.ascontiguousarray(weights, dtype=np.float64)
+        if mid_ends is None:
+            mid_ends = np.full((len(self.coords), 2, 2), np.nan)
+        self.mid_ends: np.ndarray = mid_ends
+        # 直接在coords上取视图, 共享内存中的图不会被复制
+        self._sorted_points: np.ndarray = self.coords.view(POINT_DTYPE).ravel()
+
+    @classmethod
+    def from_nx(
+        cls,
+        graph: nx.Graph,
+        terminal_to_mid: dict | None = None,
+    ) -> "CSR_graph":
+        """
+        convert the networkx SG graph keyed by coordinate tuples
+        """
+        nodes: list = list(graph.nodes)
+        coords: np.ndarray = np.array(nodes, dtype=np.float64).reshape(-1, 2)
+        # 按坐标字典序重新编号
+        order: np.ndarray = np.lexsort((coords[:, 1], coords[:, 0]))
+        new_id: np.ndarray = np.empty(len(nodes), dtype=np.int32)
+        new_id[order] = np.arange(len(nodes), dtype=np.int32)
+        old_id: dict = {node: idx for idx, node in enumerate(nodes)}
+
+        degree: np.ndarray = np.zeros(len(nodes) + 1, dtype=np.int32)
+        neighbor_list: list[list[int]] = [[] for _ in range(len(nodes))]
+        for node, nbrs in graph.adjacency():
+            u: int = new_id[old_id[node]]
+            # 保留networkx中邻居的插入顺序
+            neighbor_list[u] = [new_id[old_id[v]] for v in nbrs]
+            degree[u + 1] = len(neighbor_list[u])
+        indptr: np.ndarray = np.cumsum(degree, dtype=np.int32)
+        indices: np.ndarray = np.fromiter(
+            (v for nbrs in neighbor_list for v in nbrs),
+            dtype=np.int32,
+            count=int(indptr[-1]),
+        )
+
+        coords = coords[order] + 0.0
+        mid_ends: np.ndarray = np.full((len(nodes), 2, 2), np.nan)
+        if terminal_to_mid:
+            for idx, node in enumerate(map(tuple, coords)):
+                if node in terminal_to_mid:
+                    mid_ends[idx] = terminal_to_mid[node]
+        return cls(coords, indptr, indices, mid_ends=mid_ends)
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        """
+        the arrays that fully describe the graph, CSR_graph(**arrays) rebuilds it
+        """
+        return {field: getattr(self, field) for field in _GRAPH_FIELDS}
+
+    def to_shared_memory(
+        self,
+    ) -> tuple[list[shared_memory.SharedMemory], dict[str, tuple]]:
+        """
+        copy the arrays into shared memory blocks
+        return the blocks (the caller closes and unlinks them) and a small
+        picklable spec for from_shared_memory
+        """
+        blocks: list[shared_memory.SharedMemory] = []
+        spec: dict[str, tuple] = {}
+        for field, arr in self.arrays().items():
+            block = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)[...] = arr
+            blocks.append(block)
+            spec[field] = (block.name, arr.shape, arr.dtype.str)
+        return blocks, spec
+
+    @classmethod
+    def from_shared_memory(
+        cls, spec: dict[str, tuple]
+    ) -> tuple["CSR_graph", list[shared_memory.SharedMemory]]:
+        """
+        attach to blocks made by to_shared_memory without copying
+        keep the returned blocks alive as long as the graph is used
+        """
+        blocks: list[shared_memory.SharedMemory] = []
+        arrays: dict[str, np.ndarray] = {}
+        for field, (name, shape, dtype) in spec.items():
+            block = shared_memory.SharedMemory(name=name)
+            blocks.append(block)
+            arrays[field] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        return cls(**arrays), blocks
+
+    @staticmethod
+    def edge_lengths(
+        coords: np.ndarray, indptr: np.ndarray, indices: np.ndarray
+    ) -> np.ndarray:
+        """
+        Euclidean length of every stored edge
+        """
+        source: np.ndarray = np.repeat(
+            np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr)
+        )
+        delta: np.ndarray = coords[source] - coords[indices]
+        return np.sqrt((delta**2).sum(axis=1))
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.coords)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices) // 2
+
+    def neighbors(self, node: int) -> np.ndarray:
+        """
+        neighbor ids of the node
+        """
+        return self.indices[self.indptr[node] : self.indptr[node + 1]]
+
+    def node_id(self, point: tuple[np.float64, np.float64]) -> int:
+        """
+        look up the id of a coordinate, -1 if it is not in the graph
+        """
+        return int(self.node_ids([point])[0])
+
+    def node_ids(self, points) -> np.ndarray:
+        """
+        look up the ids of many coordinates, -1 for missing ones
+        """
+        return search_sorted_points(self._sorted_points, points)
+
+    def to_points(self, ids) -> list[tuple[np.float64, np.float64]]:
+        """
+        convert node ids back to coordinate tuples
+        """
+        return list(map(tuple, self.coords[np.asarray(ids, dtype=np.int32)]))
+
+    def to_scipy(self) -> csr_matrix:
+        """
+        the weighted adjacency as a scipy.sparse csr_matrix
+        """
+        return csr_matrix(
+            (self.weights, self.indices, self.indptr),
+            shape=(self.num_nodes, self.num_nodes),
+        )
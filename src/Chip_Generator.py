@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   Chip_Generator.py
+@Time    :   2024/08/20 15:02:44
+@Author  :   chenziyang
+@description   :   seeded synthetic layouts and netlists for scaling tests
+"""
+
+"""
+生成方式:
+    芯片划分为 CELL x CELL 的网格, 随机选取网格放置组件, 每个网格至多一个组件
+    组件与网格边缘至少保留 GAP/2 的间距, 因此任意两个组件互不重叠也不相邻
+    d 组件尺寸随机, f/w 端口与原始数据一致为 5 x 5
+    网表中每条路径从一个d组件出发, 后续组件取自前一个组件的近邻,
+    保证路径局部, 与真实芯片的连接关系相近
+输出格式与 Data/dataN.txt, Data/inputN.txt 相同 (制表符分隔)
+"""
+
+import math
+import os
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from Layout import Layout
+
+# 相对仓库根目录而不是工作目录, 从 src 下运行也写到被忽略的 /Data/synthetic/
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SYNTHETIC_DIR = os.path.join(REPO_ROOT, "Data", "synthetic", "")
+# 网格边长, 需大于最大组件尺寸加上间距
+CELL = 20
+GAP = 2
+D_SIZE = (6, 15)
+PORT_SIZE = 5
+
+
+def _place(rng: np.random.Generator, cells: np.ndarray, size: np.ndarray) -> np.ndarray:
+    """
+    integer centers of components with (height, length) size inside their cells
+    """
+    # x 方向对应 length, y 方向对应 height
+    half: np.ndarray = np.ceil(size[:, ::-1] / 2 + GAP / 2).astype(np.int64)
+    low: np.ndarray = cells * CELL + half
+    high: np.ndarray = (cells + 1) * CELL - half
+    return low + np.floor(rng.random(low.shape) * (high - low + 1)).astype(np.int64)
+
+
+def generate_layout(
+    n_components: int,
+    seed: int = 0,
+    d_ratio: float = 0.6,
+    n_routes: int | None = None,
+    max_route_len: int = 3,
+    fill: float = 0.7,
+) -> tuple[list[tuple[str, ...]], list[tuple[str, ...]]]:
+    """
+    return the layout rows (name, x, y, height, length) and the netlist routes
+    about d_ratio of the components are d, the rest is split between f and w
+    """
+    if n_components < 3:
+        raise ValueError("a layout needs at least one d, one f and one w component")
+    rng = np.random.default_rng(seed)
+
+    n_port: int = max(2, round(n_components * (1 - d_ratio)))
+    n_d: int = max(1, n_components - n_port)
+    n_f: int = n_port // 2
+    n_w: int = n_components - n_d - n_f
+
+    # 随机选取网格, 行优先编号
+    side: int = math.ceil(math.sqrt(n_components / fill))
+    cell_id: np.ndarray = rng.choice(side * side, size=n_components, replace=False)
+    cells: np.ndarray = np.stack((cell_id % side, cell_id // side), axis=1)
+
+    size: np.ndarray = np.full((n_components, 2), PORT_SIZE, dtype=np.int64)
+    size[:n_d] = rng.integers(D_SIZE[0], D_SIZE[1] + 1, size=(n_d, 2))
+    center: np.ndarray = _place(rng, cells, size)
+
+    names: list[str] = (
+        [f"d{i + 1}" for i in range(n_d)]
+        + [f"f{i + 1}" for i in range(n_f)]
+        + [f"w{i + 1}" for i in range(n_w)]
+    )
+    rows: list[tuple[str, ...]] = [
+        (name, str(x), str(y), str(h), str(l))
+        for name, (x, y), (h, l) in zip(names, center.tolist(), size.tolist())
+    ]
+
+    # 路径在d组件的近邻中延伸
+    if n_routes is None:
+        n_routes = max(1, n_d // 2)
+    tree = cKDTree(center[:n_d])
+    k: int = min(n_d, max_route_len + 3)
+    routes: list[tuple[str, ...]] = []
+    for _ in range(n_routes):
+        route: list[int] = [int(rng.integers(n_d))]
+        for _ in range(int(rng.integers(1, max_route_len + 1)) - 1):
+            _, near = tree.query(center[route[-1]], k=k)
+            near = [int(idx) for idx in np.atleast_1d(near) if idx not in route]
+            if not near:
+                break
+            route.append(near[int(rng.integers(len(near)))])
+        routes.append(tuple(names[idx] for idx in route))
+    return rows, routes
+
+
+def write_layout(
+    rows: list[tuple[str, ...]],
+    routes: list[tuple[str, ...]],
+    data_path: str,
+    input_path: str,
+) -> tuple[str, str]:
+    """
+    write the layout and the netlist, without trailing newline like Data/
+    """
+    for path, lines in ((data_path, rows), (input_path, routes)):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, mode="w", encoding="utf-8") as f:
+            f.write("\n".join("\t".join(line) for line in lines))
+    return data_path, input_path
+
+
+def generate(
+    n_components: int, seed: int = 0, out_dir: str = SYNTHETIC_DIR, **kwargs
+) -> tuple[str, str]:
+    """
+    generate a layout into out_dir as data<n>s<seed>.txt / input<n>s<seed>.txt
+    """
+    rows, routes = generate_layout(n_components, seed, **kwargs)
+    tag: str = f"{n_components}s{seed}"
+    return write_layout(
+        rows,
+        routes,
+        os.path.join(out_dir, f"data{tag}.txt"),
+        os.path.join(out_dir, f"input{tag}.txt"),
+    )
+
+
+def generate_in_memory(
+    n_components: int, seed: int = 0, ratio: float = 0.6, **kwargs
+) -> Layout:
+    """
+    generate a layout straight into a Layout without touching the disk
+    """
+    rows, routes = generate_layout(n_components, seed, **kwargs)
+    return Layout(tuple(rows), tuple(routes), ratio)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="generate synthetic chip layouts")
+    parser.add_argument("sizes", type=int, nargs="+", help="number of components")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=SYNTHETIC_DIR)
+    args = parser.parse_args()
+    for n in args.sizes:
+        print("[*] generate", *generate(n, args.seed, args.out))
@@ -11,16 +11,48 @@ import os
 
 import numpy as np
 from matplotlib.path import Path
-from scipy.spatial.distance import euclidean
+from scipy.spatial import cKDTree
 
-from util import (
-    cal_four_verticles,
-    cal_four_verticles_v2,
-    cal_only_one_verticles,
-    get_compo_center,
-)
+from Instrument import progress, show_progress, timed
+from Layout import Layout
+from util import snap_to_fixed
 
 DATA_DIR = "./Data/"
+# 只考虑距离小于该值的流入流出端口
+MAX_PORT_DISTANCE = 200
+
+
+class PortIndex:
+    """
+    KD-tree over the centers of one kind of port, "f" inlets or "w" outlets
+    """
+
+    def __init__(self, compo_center_dict: dict[str, np.ndarray], tag: str) -> None:
+        self.names: list[str] = [key for key in compo_center_dict if tag in key]
+        self.centers: np.ndarray = np.array(
+            [compo_center_dict[key] for key in self.names], dtype=np.float64
+        ).reshape(-1, 2)
+        self.tree: cKDTree | None = cKDTree(self.centers) if self.names else None
+
+    def nearest(self, point: np.ndarray, max_distance: float) -> str | None:
+        """
+        the port strictly closer than max_distance with the smallest distance,
+        ties go to the port that comes first in the layout file
+        """
+        if self.tree is None:
+            return None
+        point = np.asarray(point, dtype=np.float64)
+        distance, _ = self.tree.query(point)
+        if not distance < max_distance:
+            return None
+        # 取出所有等距候选, 按文件顺序取第一个
+        candidate: np.ndarray = np.sort(
+            self.tree.query_ball_point(point, distance * (1 + 1e-9) + 1e-9)
+        )
+        exact: np.ndarray = np.sqrt(((self.centers[candidate] - point) ** 2).sum(axis=1))
+        if not exact.min() < max_distance:
+            return None
+        return self.names[int(candidate[np.argmin(exact)])]
 
 
 class Dataset:
@@ -28,39 +60,56 @@ class Dataset:
     process the input data
     """
 
-    def __init__(self, path: str, input_path: str, ratio: float | np.float64) -> None:
+    def __init__(
+        self,
+        path: str,
+        input_path: str,
+        ratio: float | np.float64,
+        layout: Layout | None = None,
+        fixed_scale: int | None = None,
+    ) -> None:
+        """
+        with fixed_scale every coordinate handed out is snapped to the
+        1 / fixed_scale grid, see util.to_fixed, by default the one the
+        layout was read with
+        """
         self.path: str = path
         self.input_path: str = input_path
         self.f_list: list = []
         self.d_list: list = []
         self.w_list: list = []
         self.ratio: float | np.float64 = ratio
+        # 布局与网表文件只读取一次, 可由调用方传入共享的Layout
+        self.layout: Layout = (
+            layout
+            if layout is not None
+            else Layout.load(path, input_path, ratio, fixed_scale)
+        )
+        self.fixed_scale: int | None = (
+            self.layout.fixed_scale if fixed_scale is None else fixed_scale
+        )
+
+    def _snap(self, points: np.ndarray) -> np.ndarray:
+        if self.fixed_scale is None:
+            return points
+        return snap_to_fixed(points, self.fixed_scale)
 
     def get_point_dict(self) -> tuple[dict[str, np.ndarray], dict[str, np.ndarray]]:
         """
         return center of the components and four verticles of the components
         """
-        compo_dict: dict[str, np.ndarray] = {}
-        compo_center_dict: dict[str, np.ndarray] = {}
-        with open(self.path, mode="r", encoding="utf-8") as f:
-            content = f.read()
-            line: list = content.split("\n")
-            # print(line)
-            module: list[list[str]] = [mod.split("\t") for mod in line]
-            # print(module)
-            for lin in module:
-                comp_name: str = lin[0]
-                if comp_name not in compo_dict:
-                    compo_dict[comp_name] = cal_only_one_verticles(lin[1:])
-                    compo_center_dict[comp_name] = get_compo_center((lin[1:]))
-            # print(compo_dict)
-            # self.compo_dict = compo_dict
-        return compo_center_dict, compo_dict
+        if self.fixed_scale is None:
+            return self.layout.compo_center_dict(), self.layout.compo_dict()
+        return (
+            {name: self._snap(pos) for name, pos in self.layout.compo_center_dict().items()},
+            {name: self._snap(pos) for name, pos in self.layout.compo_dict().items()},
+        )
 
     @staticmethod
     def calculate_nearest_IO() -> None:
         pass
 
+    @timed("nearest_port")
     def process_input_data(
         self, compo_center_dict: dict[str, np.ndarray]
     ) -> tuple[dict[str, str], dict[str, str]]:
@@ -72,256 +121,75 @@ class Dataset:
         nearest_incomp: dict = {}
         # 存放每个组件相离最近的流出端口组件编号
         nearest_outcomp: dict = {}
-        # 存放已经选择过的流入流出组件编号
-        chosen_comp: set = set()
-        with open(self.input_path, mode="r", encoding="utf-8") as f:
-            line = f.read().split("\n")
-            # print(line)
-            route_list: list[list[str]] = [rt.split("\t") for rt in line]
-            # print(route_list)
-            for route in route_list:
-                route_len = len(route)
-                if route_len == 1:
-                    # 需要定义在loop外
-                    head_min_distance: np.ndarray = 200
-                    tail_min_distance: np.ndarray = 200
-                    for key in compo_center_dict.keys():
-                        # 计算流入模块距离
-                        if "f" in key:
-                            head_comp: str = route[0]
-                            head_real_distance = euclidean(
-                                compo_center_dict[key], compo_center_dict[head_comp]
-                            )
-                            if head_real_distance < head_min_distance:
-                                # 需要尽可能减少流入端口的使用，使用阈值进行可操作性设定
-                                # 这里采用小于chip的len*ratio时,进行复用
-                                if len(chosen_comp) != 0 and key not in chosen_comp:
-                                    for chosen_key in chosen_comp:
-                                        if "f" in chosen_key:
-                                            chosen_distance = euclidean(
-                                                compo_center_dict[chosen_key],
-                                                compo_center_dict[head_comp],
-                                            )
-                                            # print(
-                                            #     "component:"
-                                            #     + str(head_comp)
-                                            #     + "\tchosen_key:"
-                                            #     + chosen_key
-                                            #     + "\t"
-                                            #     + str(
-                                            #         chosen_distance <= 70 * self.ratio
-                                            #     )
-                                            # )
-                                            if chosen_distance <= 70 * self.ratio:
-                                                nearest_incomp[head_comp] = chosen_key
-                                                break
-                                nearest_incomp[head_comp] = key
-                                head_min_distance = head_real_distance
-                                chosen_comp.add(key)
-                                # print(
-                                #     "key:"
-                                #     + str(key)
-                                #     + "\tcomp:"
-                                #     + str(head_comp)
-                                #     + "\tdistance:"
-                                #     + str(head_min_distance)
-                                # )
-                        # 计算流出模块距离
-                        if "w" in key:
-                            tail_comp: str = route[0]
-                            # 这边要单独判断一下d*
-                            if "*" in tail_comp:
-                                # 先忽略处理
-                                tail_comp = tail_comp.replace("*", "")
-                                # print(tail_comp)
-                            tail_real_distance = euclidean(
-                                compo_center_dict[key], compo_center_dict[tail_comp]
-                            )
-                            if tail_real_distance < tail_min_distance:
-                                # 需要尽可能减少流入端口的使用，使用阈值进行可操作性设定
-                                # 这里采用小于chip的len*ratio时,进行复用
-                                if len(chosen_comp) != 0 and key not in chosen_comp:
-                                    for chosen_key in chosen_comp:
-                                        if "w" in chosen_key:
-                                            chosen_distance = euclidean(
-                                                compo_center_dict[chosen_key],
-                                                compo_center_dict[tail_comp],
-                                            )
-                                            # print(
-                                            #     "component:"
-                                            #     + str(tail_comp)
-                                            #     + "\tchosen_key:"
-                                            #     + chosen_key
-                                            #     + "\t"
-                                            #     + str(
-                                            #         chosen_distance <= 70 * self.ratio
-                                            #     )
-                                            # )
-                                            if chosen_distance <= 70 * self.ratio:
-                                                nearest_outcomp[tail_comp] = chosen_key
-                                                break
-                                nearest_outcomp[tail_comp] = key
-                                tail_min_distance = tail_real_distance
-                                chosen_comp.add(key)
-                                # print(
-                                #     "key:"
-                                #     + str(key)
-                                #     + "\tcomp:"
-                                #     + str(tail_comp)
-                                #     + "\tdistance:"
-                                #     + str(tail_min_distance)
-                                # )
-                else:
-                    # 需要定义在loop外
-                    head_min_distance: np.ndarray = 200
-                    tail_min_distance: np.ndarray = 200
-                    for key in compo_center_dict.keys():
-                        # 计算流入模块距离
-                        if "f" in key:
-                            head_comp: str = route[0]
-                            head_real_distance = euclidean(
-                                compo_center_dict[key], compo_center_dict[head_comp]
-                            )
-                            if head_real_distance < head_min_distance:
-                                # 需要尽可能减少流入端口的使用，使用阈值进行可操作性设定
-                                # 这里采用小于chip的len*ratio时,进行复用
-                                if len(chosen_comp) != 0 and key not in chosen_comp:
-                                    for chosen_key in chosen_comp:
-                                        if "f" in chosen_key:
-                                            chosen_distance = euclidean(
-                                                compo_center_dict[chosen_key],
-                                                compo_center_dict[head_comp],
-                                            )
-                                            # print(
-                                            #     "component:"
-                                            #     + str(head_comp)
-                                            #     + "\tchosen_key:"
-                                            #     + chosen_key
-                                            #     + "\t"
-                                            #     + str(
-                                            #         chosen_distance <= 70 * self.ratio
-                                            #     )
-                                            # )
-                                            if chosen_distance <= 70 * self.ratio:
-                                                nearest_incomp[head_comp] = chosen_key
-                                                break
-                                nearest_incomp[head_comp] = key
-                                head_min_distance = head_real_distance
-                                chosen_comp.add(key)
-                                # print(
-                                #     "key:"
-                                #     + str(key)
-                                #     + "\tcomp:"
-                                #     + str(head_comp)
-                                #     + "\tdistance:"
-                                #     + str(head_min_distance)
-                                # )
-                        # 计算流出模块距离
-                        if "w" in key:
-                            tail_comp: str = route[-1]
-                            # 这边要单独判断一下d*
-                            if "*" in tail_comp:
-                                # 先忽略处理
-                                tail_comp = tail_comp.replace("*", "")
-                                # print(tail_comp)
-                            tail_real_distance = euclidean(
-                                compo_center_dict[key], compo_center_dict[tail_comp]
-                            )
-                            if tail_real_distance < tail_min_distance:
-                                # 需要尽可能减少流入端口的使用，使用阈值进行可操作性设定
-                                # 这里采用小于chip的len*ratio时,进行复用
-                                if len(chosen_comp) != 0 and key not in chosen_comp:
-                                    for chosen_key in chosen_comp:
-                                        if "w" in chosen_key:
-                                            chosen_distance = euclidean(
-                                                compo_center_dict[chosen_key],
-                                                compo_center_dict[tail_comp],
-                                            )
-                                            # print(
-                                            #     "component:"
-                                            #     + str(tail_comp)
-                                            #     + "\tchosen_key:"
-                                            #     + chosen_key
-                                            #     + "\t"
-                                            #     + str(
-                                            #         chosen_distance <= 70 * self.ratio
-                                            #     )
-                                            # )
-                                            if chosen_distance <= 70 * self.ratio:
-                                                nearest_outcomp[tail_comp] = chosen_key
-                                                break
-                                nearest_outcomp[tail_comp] = key
-                                tail_min_distance = tail_real_distance
-                                chosen_comp.add(key)
-                                # print(
-                                #     "key:"
-                                #     + str(key)
-                                #     + "\tcomp:"
-                                #     + str(tail_comp)
-                                #     + "\tdistance:"
-                                #     + str(tail_min_distance)
-                                # )
+        # 旧实现中"复用70*ratio内已选端口"的赋值会立即被最近端口覆盖,
+        # 实际结果就是最近端口, 这里保持该结果不变
+        inlet_index = PortIndex(compo_center_dict, "f")
+        outlet_index = PortIndex(compo_center_dict, "w")
+        for route in self.layout.routes:
+            head_comp: str = route[0]
+            # 单组件路径的首尾是同一个组件; 这边要单独判断一下d*, 先忽略处理
+            tail_comp: str = route[-1].replace("*", "")
+            inlet: str | None = inlet_index.nearest(
+                compo_center_dict[head_comp], MAX_PORT_DISTANCE
+            )
+            if inlet is not None:
+                nearest_incomp[head_comp] = inlet
+            outlet: str | None = outlet_index.nearest(
+                compo_center_dict[tail_comp], MAX_PORT_DISTANCE
+            )
+            if outlet is not None:
+                nearest_outcomp[tail_comp] = outlet
         # print(nearest_incomp)
         # print(nearest_outcomp)
-        print("[*] nearest input and output construct successfully!")
+        progress("nearest input and output construct successfully!")
         return nearest_incomp, nearest_outcomp
 
     def get_data(self) -> tuple[list, list, list]:
         """
         record the position of components and return the information of d,f,w
         """
-        with open(self.path, mode="r", encoding="utf-8") as f:
-            content = f.read()
-            # print(content)
-            """
-            ['d1\t20\t20\t15\t15',]
-            """
-            line: list = content.split("\n")
-            # print(line)
-            """
-            [['d1', '20', '20', '15', '15'],...]
-            """
-            module: list[list[str]] = [mod.split("\t") for mod in line]
-            # print(module)
-
-            # determine the components successively
-            for lin in module:
-                ch: str = lin[0][0]
-                pos_len: int = len(lin)
-                # the first module
-                if ch == "d":
-                    self.d_list.append(lin[1:pos_len])
-                elif ch == "f":
-                    self.f_list.append(lin[1:pos_len])
-                elif ch == "w":
-                    self.w_list.append(lin[1:pos_len])
+        self.d_list, self.f_list, self.w_list = [], [], []
+        # determine the components successively
+        for lin in self.layout.rows:
+            ch: str = lin[0][0]
+            # the first module
+            if ch == "d":
+                self.d_list.append(list(lin[1:]))
+            elif ch == "f":
+                self.f_list.append(list(lin[1:]))
+            elif ch == "w":
+                self.w_list.append(list(lin[1:]))
         return self.d_list, self.f_list, self.w_list
 
     def process_data2path(self) -> list[Path]:
         """
         return constrained edges which consist of obstacle in Path
         """
-        verticle_list = []
-        _d_list, _f_list, _w_list = self.get_data()
-        verticle_list += cal_four_verticles(_d_list)
-        verticle_list += cal_four_verticles(_f_list)
-        verticle_list += cal_four_verticles(_w_list)
-        return verticle_list
+        corners: np.ndarray = self.layout.corners[self.layout.kind_order()]
+        return [Path(verticle) for verticle in corners]
 
     def process_data2list(self) -> list[list[list[int]]]:
         """
         return constrained edges which consist of obstacle in list
         """
-        verticle_list: list[list[list[int]]] = []
-        _d_list, _f_list, _w_list = self.get_data()
-        verticle_list += cal_four_verticles_v2(_d_list)
-        verticle_list += cal_four_verticles_v2(_f_list)
-        verticle_list += cal_four_verticles_v2(_w_list)
-        verticle_list.append([[0, 70], [0, 0], [70, 0], [70, 70]])
-        return verticle_list
+        return self.layout.constraint_polygons()
 
     def process_data2array(self) -> np.ndarray:
-        return np.array(self.process_data2list())
+        return self._snap(np.array(self.process_data2list()))
+
+    def constraint_geometry(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        return the constraint vertices (V, 2) and edges (E, 2) in memory,
+        the same content write_fixed_data writes to the processed file
+        """
+        verticle_arr: np.ndarray = self._snap(
+            np.asarray(self.process_data2list(), dtype=np.float64)
+        )
+        # 每个多边形4条边: 0-1, 1-2, 2-3, 0-3, 再加上多边形的偏移量
+        index_pair: np.ndarray = np.array([[0, 1], [1, 2], [2, 3], [0, 3]])
+        offset: np.ndarray = np.arange(len(verticle_arr))[:, None, None] * 4
+        edges: np.ndarray = (index_pair[None, :, :] + offset).reshape(-1, 2)
+        return verticle_arr.reshape(-1, 2), edges.astype(np.int32)
 
     def write_fixed_data(self) -> tuple[str, np.ndarray, np.ndarray]:
         """
@@ -355,24 +223,31 @@ class Dataset:
         total_coordinates = sum(len(sublist) for sublist in verticle_list)
         final_index_len = len(final_index)
 
+        lines: list[str] = [f"{total_coordinates} {final_index_len}\n"]
+        for sublist in verticle_list:
+            for coord in sublist:
+                lines.append(f"{coord[0]} {coord[1]}\n")
+        for pair in final_index:
+            # 写入每对索引，格式为 "索引1 索引2"
+            lines.append(f"{pair[0]-1} {pair[1]-1}\n")
+        content: str = "".join(lines)
+
+        # 源文件修改过时处理结果也会不同, 内容一致才复用
         if os.path.exists(file_place):
-            print("[*] file has been processed!")
-            return file_place, verticle_list, final_index
+            with open(file_place, "r") as file:
+                if file.read().split() == content.split():
+                    progress("file has been processed!")
+                    return file_place, verticle_list, final_index
+            progress("layout changed, rewrite the processed file!")
 
-        else:
-            with open(file_place, "w") as file:
-                file.write(f"{total_coordinates} {final_index_len}\n")
-                for sublist in verticle_list:
-                    for coord in sublist:
-                        file.write(f"{coord[0]} {coord[1]}\n")
-                for pair in final_index:
-                    # 写入每对索引，格式为 "索引1 索引2"
-                    file.write(f"{pair[0]-1} {pair[1]-1}\n")
+        with open(file_place, "w") as file:
+            file.write(content)
 
-            return file_place, verticle_list, final_index
+        return file_place, verticle_list, final_index
 
 
 if __name__ == "__main__":
+    show_progress()
     data = Dataset(".\Data\data6.txt", ".\Data\input6.txt", 0.6)
     # print(data.get_data())
     print(data.write_fixed_data())
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   Instrument.py
+@Time    :   2024/08/21 10:48:36
+@Author  :   chenziyang
+@description   :   per-stage wall time, allocation and search counters
+"""
+
+"""
+用法:
+    with collect() as profile:
+        sg = SG_graph(...)
+        path_list = construct_path(...)
+    profile.to_json("profile.json")
+
+没有活动的收集器时:
+    stage() 返回同一个空上下文, timed() 包装的函数只多一次判断
+    count() / size() 直接返回, 不做任何记录
+进度信息通过 logging 的 "chip" 记录器输出, 默认不显示,
+命令行入口调用 show_progress() 恢复原来的 "[*] ..." 输出
+"""
+
+import contextlib
+import functools
+import json
+import logging
+import sys
+import time
+import tracemalloc
+from typing import Callable, Iterator
+
+logger = logging.getLogger("chip")
+
+_active: "Collector | None" = None
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class Collector:
+    """
+    records of one profiled run
+        stages   : name -> calls, wall time, net allocated blocks (and bytes)
+        counters : group -> counter name -> value
+        sizes    : name -> latest value
+        events   : (seconds since start, progress message)
+    memory=True also traces allocated and peak bytes with tracemalloc
+    """
+
+    def __init__(self, memory: bool = False) -> None:
+        self.memory: bool = memory
+        self.stages: dict[str, dict[str, float]] = {}
+        self.counters: dict[str, dict[str, float]] = {}
+        self.sizes: dict[str, int | float] = {}
+        self.events: list[tuple[float, str]] = []
+        self.start: float = time.perf_counter()
+        # 嵌套阶段的峰值内存需要传递给外层
+        self._peaks: list[int] = []
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        time one stage, repeated stages of the same name accumulate
+        """
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+        blocks: int = sys.getallocatedblocks()
+        tick: float = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall: float = time.perf_counter() - tick
+            record = self.stages.setdefault(
+                name, {"calls": 0, "wall": 0.0, "allocated_blocks": 0}
+            )
+            record["calls"] += 1
+            record["wall"] += wall
+            record["allocated_blocks"] += sys.getallocatedblocks() - blocks
+            if self.memory:
+                end, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, self._peaks.pop())
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                record["allocated_bytes"] = record.get("allocated_bytes", 0) + end - current
+                record["peak_bytes"] = max(record.get("peak_bytes", 0), peak - current)
+
+    def count(self, group: str, **values: float) -> None:
+        counter: dict[str, float] = self.counters.setdefault(group, {})
+        for name, value in values.items():
+            counter[name] = counter.get(name, 0) + value
+
+    def size(self, name: str, value: int | float) -> None:
+        self.sizes[name] = value
+
+    def event(self, message: str) -> None:
+        self.events.append((time.perf_counter() - self.start, message))
+
+    def as_dict(self) -> dict:
+        """
+        plain dict of all records, searches per segment is derived here
+        """
+        counters: dict = {group: dict(values) for group, values in self.counters.items()}
+        search: dict = counters.get("search", {})
+        if search.get("segments"):
+            search["searches_per_segment"] = search.get("searches", 0) / search["segments"]
+        return {
+            "wall": time.perf_counter() - self.start,
+            "stages": {name: dict(record) for name, record in self.stages.items()},
+            "counters": counters,
+            "sizes": dict(self.sizes),
+            "events": [list(event) for event in self.events],
+        }
+
+    def to_json(self, path: str | None = None) -> str:
+        """
+        return the records as JSON, also written to path when given
+        """
+        text: str = json.dumps(self.as_dict(), indent=2)
+        if path is not None:
+            with open(path, mode="w", encoding="utf-8") as f:
+                f.write(text)
+        return text
+
+
+@contextlib.contextmanager
+def collect(memory: bool = False) -> Iterator[Collector]:
+    """
+    make a new Collector active for the duration of the block
+    """
+    global _active
+    previous: Collector | None = _active
+    collector = Collector(memory)
+    started: bool = memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    _active = collector
+    try:
+        yield collector
+    finally:
+        _active = previous
+        if started:
+            tracemalloc.stop()
+
+
+def active() -> Collector | None:
+    return _active
+
+
+def stage(name: str) -> contextlib.AbstractContextManager:
+    """
+    time a block as one stage of the active collector
+    """
+    if _active is None:
+        return _NULL_STAGE
+    return _active.stage(name)
+
+
+def timed(name: str) -> Callable:
+    """
+    decorator form of stage()
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return func(*args, **kwargs)
+            with _active.stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(group: str, **values: float) -> None:
+    if _active is not None:
+        _active.count(group, **values)
+
+
+def counters(group: str) -> dict[str, float] | None:
+    """
+    the live counter dict of a group, None when nothing is collected
+    pass it as the stats argument of the search functions
+    """
+    if _active is None:
+        return None
+    return _active.counters.setdefault(group, {})
+
+
+def size(name: str, value: int | float) -> None:
+    if _active is not None:
+        _active.size(name, value)
+
+
+def progress(message: str) -> None:
+    """
+    report pipeline progress, replaces the old print("[*] ...") calls
+    """
+    if _active is not None:
+        _active.event(message)
+    logger.info(message)
+
+
+def show_progress(stream=None) -> None:
+    """
+    print progress messages as "[*] message" like the command line tools did
+    """
+    if any(getattr(handler, "_chip_progress", False) for handler in logger.handlers):
+        return
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(logging.Formatter("[*] %(message)s"))
+    handler._chip_progress = True
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   Landmark.py
+@Time    :   2024/08/12 09:40:18
+@Author  :   chenziyang
+@description   :   landmark (ALT) lower bounds for A* on a fixed SG
+"""
+
+"""
+ALT启发式:
+    预处理:
+        选K个地标L, 用Dijkstra求出每个地标到所有节点的距离 d(L, .)
+    查询:
+        由三角不等式 d(n, g) >= |d(L, g) - d(L, n)|
+        h(n) = max(欧氏距离, max_L |d(L, g) - d(L, n)|)
+    两项都不会高估, 所以h可采纳; SG不变时预处理只需做一次
+"""
+
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+from CSR_Graph import CSR_graph
+
+
+class Landmarks:
+    """
+    distance arrays of K landmarks on one CSR_graph
+    """
+
+    def __init__(self, graph: CSR_graph, nodes: np.ndarray, distance: np.ndarray) -> None:
+        self.graph: CSR_graph = graph
+        self.nodes: np.ndarray = np.asarray(nodes, dtype=np.int32)
+        # (K, N) 地标到每个节点的最短距离
+        self.distance: np.ndarray = distance
+
+    @classmethod
+    def build(cls, graph: CSR_graph, k: int = 8, seed: int = 0) -> "Landmarks":
+        """
+        pick k landmarks by farthest-point selection and store their distances
+        the first landmark is the node farthest from a random seed node
+        """
+        if graph.num_nodes == 0:
+            return cls(graph, np.empty(0, dtype=np.int32), np.empty((0, 0)))
+        k = min(k, graph.num_nodes)
+        adjacency = graph.to_scipy()
+        rng = np.random.default_rng(seed)
+
+        def farthest(dist: np.ndarray) -> int:
+            # 不连通的节点距离为inf, 不作为地标
+            return int(np.argmax(np.where(np.isfinite(dist), dist, -1.0)))
+
+        seed_dist: np.ndarray = dijkstra(
+            adjacency, directed=True, indices=int(rng.integers(graph.num_nodes))
+        )
+        nodes: list[int] = [farthest(seed_dist)]
+        rows: list[np.ndarray] = [dijkstra(adjacency, directed=True, indices=nodes[0])]
+        nearest: np.ndarray = rows[0].copy()
+        while len(nodes) < k:
+            node: int = farthest(nearest)
+            if node in nodes:
+                break
+            nodes.append(node)
+            rows.append(dijkstra(adjacency, directed=True, indices=node))
+            nearest = np.minimum(nearest, rows[-1])
+        return cls(graph, np.array(nodes), np.vstack(rows))
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def lower_bound(self, nodes: np.ndarray, goals: np.ndarray) -> np.ndarray:
+        """
+        admissible estimate of the distance from each node to its nearest goal
+        """
+        nodes = np.asarray(nodes, dtype=np.int32)
+        goals = np.asarray(goals, dtype=np.int32)
+        coords: np.ndarray = self.graph.coords
+        delta: np.ndarray = coords[nodes][:, None, :] - coords[goals][None, :, :]
+        bound: np.ndarray = np.sqrt((delta**2).sum(axis=2))
+        if len(self.nodes):
+            # (K, n, 1) 与 (K, 1, g)
+            with np.errstate(invalid="ignore"):
+                gap: np.ndarray = np.abs(
+                    self.distance[:, nodes][:, :, None]
+                    - self.distance[:, goals][:, None, :]
+                )
+            # 两点都与某地标不连通时差值为nan, 该地标不提供信息
+            alt: np.ndarray = np.fmax.reduce(gap, axis=0)
+            bound = np.fmax(bound, alt)
+        return bound.min(axis=1)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   Layout.py
+@Time    :   2024/08/16 11:32:50
+@Author  :   chenziyang
+@description   :   immutable parsed layout and netlist, read once per run
+"""
+
+import math
+
+import numpy as np
+
+from Instrument import timed
+from util import snap_to_fixed
+
+# 芯片边界 [[0,70],[0,0],[70,0],[70,70]]
+CHIP_SIZE: int = 70
+CHIP_BOUNDARY: list[list[int]] = [
+    [0, CHIP_SIZE],
+    [0, 0],
+    [CHIP_SIZE, 0],
+    [CHIP_SIZE, CHIP_SIZE],
+]
+# 组件超出70×70时芯片随之扩大, 边界与最外侧组件保持该间距
+DIE_MARGIN: float = 2.5
+
+
+def _read_rows(path: str) -> tuple[tuple[str, ...], ...]:
+    """
+    read a tab separated file once, skipping empty lines
+    """
+    with open(path, mode="r", encoding="utf-8") as f:
+        lines: list[str] = f.read().split("\n")
+    return tuple(tuple(line.split("\t")) for line in lines if line.strip())
+
+
+def _coordinate_array(
+    values: np.ndarray, what: str, fixed_scale: int | None = None
+) -> np.ndarray:
+    """
+    (C, 2) copy of centers or sizes: int64 without fixed_scale, where
+    non-integer floats are refused instead of being truncated, otherwise
+    float64 snapped to the 1 / fixed_scale grid, see util.to_fixed
+    """
+    arr: np.ndarray = np.asarray(values)
+    if fixed_scale is not None:
+        return snap_to_fixed(arr, fixed_scale).reshape(-1, 2)
+    if arr.dtype.kind == "f" and not np.array_equal(arr, np.rint(arr)):
+        raise ValueError(
+            f"component {what} must be integers, round them first or give a fixed_scale"
+        )
+    return arr.astype(np.int64).reshape(-1, 2)
+
+
+class Layout:
+    """
+    the components of a layout file and the routes of a netlist file
+    every row of the layout becomes one entry of the typed arrays
+        names  : component name, the row index is the component id
+        kind   : "d" / "f" / "w"
+        center : (C, 2) int64 center x, y
+        size   : (C, 2) int64 height, length
+    with fixed_scale the layout may hold any real coordinates, center and size
+    are then float64 snapped to the 1 / fixed_scale grid
+    the arrays are read-only, derived data is computed once on demand
+    """
+
+    def __init__(
+        self,
+        rows: tuple[tuple[str, ...], ...],
+        routes: tuple[tuple[str, ...], ...],
+        ratio: float | np.float64,
+        path: str = "",
+        input_path: str = "",
+        fixed_scale: int | None = None,
+    ) -> None:
+        self.path: str = path
+        self.input_path: str = input_path
+        self.ratio: float | np.float64 = ratio
+        self.fixed_scale: int | None = fixed_scale
+        self._rows: tuple[tuple[str, ...], ...] | None = rows
+        self.routes: tuple[tuple[str, ...], ...] = routes
+
+        self.names: tuple[str, ...] = tuple(row[0] for row in rows)
+        self.kind: np.ndarray = np.array([name[0] for name in self.names], dtype="<U1")
+        # 没有 fixed_scale 时坐标必须是整数
+        parse = int if fixed_scale is None else float
+        try:
+            values: np.ndarray = np.array(
+                [[parse(x) for x in row[1:5]] for row in rows]
+            ).reshape(-1, 4)
+        except ValueError as err:
+            if fixed_scale is None:
+                raise ValueError(f"{err}, non-integer layouts need a fixed_scale") from None
+            raise
+        self.center: np.ndarray = _coordinate_array(values[:, :2], "centers", fixed_scale)
+        self.size: np.ndarray = _coordinate_array(values[:, 2:], "sizes", fixed_scale)
+        self._freeze()
+
+        # 同名组件以第一次出现的为准, 与 get_point_dict 一致
+        self.name_index: dict[str, int] = {}
+        for idx, name in enumerate(self.names):
+            self.name_index.setdefault(name, idx)
+        self._corners: np.ndarray | None = None
+
+    def _freeze(self) -> None:
+        for arr in (self.kind, self.center, self.size):
+            arr.flags.writeable = False
+
+    @classmethod
+    def from_arrays(
+        cls,
+        names: tuple[str, ...],
+        center: np.ndarray,
+        size: np.ndarray,
+        routes: tuple[tuple[str, ...], ...],
+        ratio: float | np.float64,
+        template: "Layout | None" = None,
+        fixed_scale: int | None = None,
+    ) -> "Layout":
+        """
+        build a layout from (C, 2) center and (height, length) arrays
+        without formatting and parsing text rows, float arrays must hold
+        integer values unless fixed_scale is given,
+        names, kinds and the name index are shared with template when given
+        """
+        layout: Layout = cls.__new__(cls)
+        layout.path = layout.input_path = ""
+        layout.ratio = ratio
+        layout.fixed_scale = fixed_scale
+        layout._rows = None
+        layout.routes = routes
+        if template is not None and template.names == names:
+            layout.names = template.names
+            layout.kind = template.kind
+            layout.name_index = template.name_index
+        else:
+            layout.names = tuple(names)
+            layout.kind = np.array([name[0] for name in layout.names], dtype="<U1")
+            layout.name_index = {}
+            for idx, name in enumerate(layout.names):
+                layout.name_index.setdefault(name, idx)
+        layout.center = _coordinate_array(center, "centers", fixed_scale)
+        layout.size = _coordinate_array(size, "sizes", fixed_scale)
+        if len(layout.center) != len(layout.names) or len(layout.size) != len(layout.names):
+            raise ValueError("center and size need one row per component")
+        layout._freeze()
+        layout._corners = None
+        return layout
+
+    @classmethod
+    @timed("parse")
+    def load(
+        cls,
+        path: str,
+        input_path: str,
+        ratio: float | np.float64,
+        fixed_scale: int | None = None,
+    ) -> "Layout":
+        """
+        read the layout file and the netlist file once
+        """
+        return cls(
+            _read_rows(path), _read_rows(input_path), ratio, path, input_path, fixed_scale
+        )
+
+    @property
+    def rows(self) -> tuple[tuple[str, ...], ...]:
+        """
+        the layout file rows (name, x, y, height, length)
+        """
+        if self._rows is None:
+            self._rows = tuple(
+                (name, *map(str, values))
+                for name, values in zip(
+                    self.names, np.hstack((self.center, self.size)).tolist()
+                )
+            )
+        return self._rows
+
+    def _with_rows(
+        self, rows: tuple[tuple[str, ...], ...], routes: tuple[tuple[str, ...], ...]
+    ) -> "Layout":
+        return Layout(
+            rows, routes, self.ratio, self.path, self.input_path, self.fixed_scale
+        )
+
+    def _format(self, values: tuple) -> tuple[str, ...]:
+        """
+        text fields of new coordinates, checked and snapped like from_arrays
+        """
+        arr: np.ndarray = _coordinate_array(
+            np.asarray(values).reshape(-1, 2), "coordinates", self.fixed_scale
+        )
+        return tuple(map(str, arr.ravel().tolist()))
+
+    def replace_component(
+        self, name: str, center: tuple[int, int], size: tuple[int, int] | None = None
+    ) -> "Layout":
+        """
+        a new Layout with the component moved to center (and resized)
+        """
+        idx: int = self.name_index[name]
+        height, length = self.size[idx] if size is None else size
+        row: tuple[str, ...] = (name, *self._format((*center, height, length)))
+        rows = self.rows[:idx] + (row,) + self.rows[idx + 1 :]
+        return self._with_rows(rows, self.routes)
+
+    def add_component(
+        self, name: str, center: tuple[int, int], size: tuple[int, int]
+    ) -> "Layout":
+        """
+        a new Layout with one more component, the kind is the first letter of name
+        """
+        if name in self.name_index:
+            raise ValueError(f"component {name} already exists")
+        if name[:1] not in ("d", "f", "w"):
+            raise ValueError(f"component name {name} must start with d, f or w")
+        row: tuple[str, ...] = (name, *self._format((*center, *size)))
+        return self._with_rows(self.rows + (row,), self.routes)
+
+    def remove_component(self, name: str) -> "Layout":
+        """
+        a new Layout without the component, routes through it are dropped
+        """
+        idx: int = self.name_index[name]
+        routes = tuple(
+            route
+            for route in self.routes
+            if name not in (comp.replace("*", "") for comp in route)
+        )
+        return self._with_rows(self.rows[:idx] + self.rows[idx + 1 :], routes)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def corners(self) -> np.ndarray:
+        """
+        (C, 4, 2) left top, left down, right down, right top verticles
+        """
+        if self._corners is None:
+            half_h: np.ndarray = self.size[:, 0] / 2
+            half_l: np.ndarray = self.size[:, 1] / 2
+            x, y = self.center[:, 0], self.center[:, 1]
+            corners: np.ndarray = np.stack(
+                (
+                    np.stack((x - half_l, y + half_h), axis=1),
+                    np.stack((x - half_l, y - half_h), axis=1),
+                    np.stack((x + half_l, y - half_h), axis=1),
+                    np.stack((x + half_l, y + half_h), axis=1),
+                ),
+                axis=1,
+            )
+            corners.flags.writeable = False
+            self._corners = corners
+        return self._corners
+
+    @property
+    def boundary(self) -> list[list[int]]:
+        """
+        chip boundary verticles, the fixed 70 x 70 die unless
+        the components reach beyond it
+        """
+        size: int = CHIP_SIZE
+        if len(self):
+            size = max(size, math.ceil(float(self.corners.max()) + DIE_MARGIN))
+        return [[0, size], [0, 0], [size, 0], [size, size]]
+
+    def compo_center_dict(self) -> dict[str, np.ndarray]:
+        """
+        component name -> center, same as Dataset.get_point_dict
+        """
+        return {name: self.center[idx].copy() for name, idx in self.name_index.items()}
+
+    def compo_dict(self) -> dict[str, np.ndarray]:
+        """
+        component name -> four verticles, same as Dataset.get_point_dict
+        """
+        return {name: self.corners[idx].copy() for name, idx in self.name_index.items()}
+
+    def kind_order(self) -> np.ndarray:
+        """
+        row indices of d, then f, then w components, each in file order
+        """
+        return np.concatenate([np.flatnonzero(self.kind == ch) for ch in "dfw"])
+
+    def constraint_polygons(self) -> list[list[list[float]]]:
+        """
+        obstacle verticles of d, f, w components and the chip boundary,
+        same as Dataset.process_data2list
+        """
+        polygons: list = self.corners[self.kind_order()].tolist()
+        polygons.append(self.boundary)
+        return polygons
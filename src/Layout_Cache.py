@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   Layout_Cache.py
+@Time    :   2024/08/14 16:05:37
+@Author  :   chenziyang
+@description   :   content-addressed .npz cache of triangulations and SG arrays
+"""
+
+"""
+缓存键 = sha1(格式版本, 阶段名, 布局文件内容, 参数)
+    布局文件被修改后键随之改变, 旧条目自然失效, 不会读到过期几何
+    传入内存中的 Layout 时改为对其数组 (名称, 中心, 尺寸, 网表) 求哈希,
+    生成器, 评估器与增量更新得到的布局与文件不同, 不能按文件内容取缓存
+    每个条目是一个 .npz 文件, 先写临时文件再原子替换, 并发运行互不干扰
+"""
+
+import hashlib
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from Dataset import DATA_DIR
+from Layout import Layout
+
+CACHE_DIR = DATA_DIR + "cache/"
+# 缓存内容的格式变化时递增, 使旧条目全部失效
+CACHE_VERSION = "4"
+
+
+def layout_key(
+    layout_path: str, stage: str, layout: Layout | None = None, **params
+) -> str:
+    """
+    hash the layout file content, the stage name and the parameters,
+    a given Layout is hashed by its arrays instead of the file
+    """
+    digest = hashlib.sha1()
+    digest.update(f"v{CACHE_VERSION}:{stage}".encode("utf-8"))
+    if layout is None:
+        with open(layout_path, mode="rb") as f:
+            digest.update(f.read())
+    else:
+        digest.update("\n".join(layout.names).encode("utf-8"))
+        for arr in (layout.center, layout.size):
+            digest.update(arr.dtype.str.encode("utf-8"))
+            digest.update(np.ascontiguousarray(arr).tobytes())
+        digest.update(
+            "\n".join("\t".join(route) for route in layout.routes).encode("utf-8")
+        )
+    for name in sorted(params):
+        digest.update(f"|{name}={params[name]!r}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LayoutCache:
+    """
+    store and load named ndarrays under a content hash
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR) -> None:
+        self.cache_dir: str = cache_dir
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".npz")
+
+    def load(self, key: str) -> dict[str, np.ndarray] | None:
+        """
+        return the arrays stored under key, None if there is no valid entry
+        """
+        try:
+            with np.load(self.entry_path(key), allow_pickle=False) as entry:
+                arrays: dict[str, np.ndarray] = {name: entry[name] for name in entry.files}
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return arrays
+
+    def save(self, key: str, **arrays: np.ndarray) -> str:
+        """
+        write the arrays under key atomically and return the entry path
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".npz.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self.entry_path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return self.entry_path(key)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   Negotiated_Route.py
+@Time    :   2024/08/26 10:05:17
+@Author  :   chenziyang
+@description   :   PathFinder negotiated congestion routing on the CSR SG
+"""
+
+"""
+PathFinder 协商布线:
+    每条网表路径 (net) 由若干段组成, 一条SG边被几条net使用即为其占用量
+    边代价 c(e) = (b(e) + h(e)) * p(e)
+        b(e) 边长, h(e) 历史拥塞代价, 每轮对仍超容的边累加
+        p(e) = 1 + pres_fac * max(0, 占用 + 1 - 容量), pres_fac 每轮增大
+    同一net已经使用的边不再计入拥塞, 只按 b(e) + h(e) 计费
+    第一轮按边长布线全部net, 之后每轮只拆除并重布经过超容边的net,
+    没有超容边时收敛
+组件角点出发的端口边不限容量: 多条net共用同一端口组件时无法避免
+
+增量搜索:
+    重布某一段时, 上一轮的路径在当前代价下仍然可行, 其代价作为上界,
+    f 值不小于上界的节点不再入队; 找不到更便宜的路径时保留原路径
+    代价与访问数组在所有搜索之间复用, 不为每次搜索重新分配
+"""
+
+import heapq
+import importlib
+import time
+
+import numpy as np
+
+from CSR_Graph import CSR_graph
+from Instrument import count, progress, timed
+from Layout import Layout
+
+# A-star.py 的文件名不是合法标识符, 通过importlib导入
+astar = importlib.import_module("A-star")
+
+
+class NegotiatedRouter:
+    """
+    negotiated congestion routing of a whole netlist on one CSR_graph
+    usage, history and capacity are kept per undirected SG edge
+    """
+
+    def __init__(
+        self,
+        graph: CSR_graph,
+        compo_dict: dict,
+        capacity: int | np.ndarray = 1,
+        pres_fac: float = 0.5,
+        pres_growth: float = 1.5,
+        hist_fac: float = 0.2,
+        max_iterations: int = 30,
+    ) -> None:
+        self.graph: CSR_graph = graph
+        self.compo_dict: dict = compo_dict
+        self.pres_fac: float = pres_fac
+        self.pres_growth: float = pres_growth
+        self.hist_fac: float = hist_fac
+        self.max_iterations: int = max_iterations
+
+        # CSR中的每个存储项对应一条无向边, u-v 与 v-u 共用编号
+        source: np.ndarray = np.repeat(
+            np.arange(graph.num_nodes, dtype=np.int64), np.diff(graph.indptr)
+        )
+        target: np.ndarray = graph.indices.astype(np.int64)
+        key: np.ndarray = np.minimum(source, target) * graph.num_nodes + np.maximum(
+            source, target
+        )
+        _, first, edge_id = np.unique(key, return_index=True, return_inverse=True)
+        self.edge_id: np.ndarray = edge_id.astype(np.int32).ravel()
+        self.base: np.ndarray = graph.weights[first]
+        n_edges: int = len(first)
+
+        self.capacity: np.ndarray = np.broadcast_to(
+            np.asarray(capacity, dtype=np.float64), (n_edges,)
+        ).copy()
+        corners: np.ndarray = graph.node_ids(
+            np.concatenate([np.asarray(pos, dtype=np.float64) for pos in compo_dict.values()])
+        )
+        is_corner: np.ndarray = np.zeros(graph.num_nodes, dtype=bool)
+        is_corner[corners[corners >= 0]] = True
+        pin: np.ndarray = is_corner[source] | is_corner[target]
+        self.capacity[self.edge_id[pin]] = np.inf
+
+        self.usage: np.ndarray = np.zeros(n_edges, dtype=np.int32)
+        self.history: np.ndarray = np.zeros(n_edges, dtype=np.float64)
+        self.cost: np.ndarray = self.base.copy()
+        # 当前正在布线的net已经使用的边, 以net编号标记
+        self._owner: np.ndarray = np.full(n_edges, -1, dtype=np.int32)
+
+        # 搜索数组, 所有搜索复用
+        self._g: np.ndarray = np.full(graph.num_nodes, np.inf)
+        self._came: np.ndarray = np.full(graph.num_nodes, -1, dtype=np.int32)
+        self._came_edge: np.ndarray = np.full(graph.num_nodes, -1, dtype=np.int32)
+        self._closed: np.ndarray = np.zeros(graph.num_nodes, dtype=bool)
+
+    def _update_cost(self, edges: np.ndarray | None = None) -> None:
+        """
+        refresh c(e) of some edges (all edges when None)
+        """
+        if edges is None:
+            edges = slice(None)
+        overflow: np.ndarray = np.maximum(
+            0.0, self.usage[edges] + 1 - self.capacity[edges]
+        )
+        self.cost[edges] = (self.base[edges] + self.history[edges]) * (
+            1 + self.pres_fac * overflow
+        )
+
+    def _edge_cost(self, edges: np.ndarray, net: int) -> np.ndarray:
+        """
+        cost of edges for one net, its own edges pay no congestion
+        """
+        return np.where(
+            self._owner[edges] == net,
+            self.base[edges] + self.history[edges],
+            self.cost[edges],
+        )
+
+    def _search(
+        self,
+        start_ids: np.ndarray,
+        target_ids: np.ndarray,
+        net: int,
+        bound: float = np.inf,
+    ) -> tuple[np.ndarray | None, np.ndarray | None, int]:
+        """
+        multi-source / multi-target A* under the negotiated costs
+        nodes whose f value reaches bound are pruned
+        return the node ids and edge ids of the path (None if nothing
+        cheaper than bound) and the number of expanded nodes
+        """
+        graph: CSR_graph = self.graph
+        start_ids = start_ids[start_ids >= 0]
+        target_ids = target_ids[target_ids >= 0]
+        if len(start_ids) == 0 or len(target_ids) == 0:
+            return None, None, 0
+        g, came, came_edge, closed = self._g, self._came, self._came_edge, self._closed
+        is_target: set = set(target_ids.tolist())
+        target_pos: np.ndarray = graph.coords[target_ids]
+
+        def heuristic(nodes: np.ndarray) -> np.ndarray:
+            # 代价不小于边长, 到最近目标的欧氏距离可采纳且一致
+            delta: np.ndarray = graph.coords[nodes][:, None] - target_pos[None]
+            return np.sqrt((delta**2).sum(axis=2)).min(axis=1)
+
+        touched: list[np.ndarray] = [start_ids]
+        g[start_ids] = 0.0
+        came[start_ids] = start_ids
+        came_edge[start_ids] = -1
+        frontier: list = [
+            (h, node) for h, node in zip(heuristic(start_ids).tolist(), start_ids.tolist())
+        ]
+        heapq.heapify(frontier)
+        expanded: int = 0
+        goal: int = -1
+        while frontier:
+            f, current = heapq.heappop(frontier)
+            if closed[current]:
+                continue
+            if f >= bound:
+                break
+            if current in is_target:
+                goal = current
+                break
+            closed[current] = True
+            expanded += 1
+            lo, hi = graph.indptr[current], graph.indptr[current + 1]
+            nbrs: np.ndarray = graph.indices[lo:hi]
+            edges: np.ndarray = self.edge_id[lo:hi]
+            new_g: np.ndarray = g[current] + self._edge_cost(edges, net)
+            better: np.ndarray = (new_g < g[nbrs]) & ~closed[nbrs]
+            if not better.any():
+                continue
+            nbrs, edges, new_g = nbrs[better], edges[better], new_g[better]
+            priority: np.ndarray = new_g + heuristic(nbrs)
+            keep: np.ndarray = priority < bound
+            nbrs, edges, new_g, priority = nbrs[keep], edges[keep], new_g[keep], priority[keep]
+            g[nbrs] = new_g
+            came[nbrs] = current
+            came_edge[nbrs] = edges
+            touched.append(nbrs)
+            for next, next_priority in zip(nbrs.tolist(), priority.tolist()):
+                heapq.heappush(frontier, (next_priority, next))
+
+        path: np.ndarray | None = None
+        path_edges: np.ndarray | None = None
+        if goal >= 0:
+            nodes: list[int] = [goal]
+            edge_list: list[int] = []
+            while came[nodes[-1]] != nodes[-1]:
+                edge_list.append(int(came_edge[nodes[-1]]))
+                nodes.append(int(came[nodes[-1]]))
+            path = np.array(nodes[::-1], dtype=np.int32)
+            path_edges = np.array(edge_list[::-1], dtype=np.int32)
+
+        # 只重置本次搜索访问过的节点
+        visited: np.ndarray = np.concatenate(touched)
+        g[visited] = np.inf
+        came[visited] = -1
+        came_edge[visited] = -1
+        closed[visited] = False
+        return path, path_edges, expanded
+
+    def _net_edges(self, segment_edges: list) -> np.ndarray:
+        edges: list[np.ndarray] = [seg for seg in segment_edges if seg is not None]
+        if not edges:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate(edges))
+
+    def _route_net(
+        self,
+        net: int,
+        route: list[str],
+        previous: list | None,
+        stats: dict,
+    ) -> list:
+        """
+        route every segment of one net, previous paths serve as upper bounds
+        return [(node ids, edge ids)] per segment
+        """
+        result: list = []
+        for idx in range(len(route) - 1):
+            start_ids: np.ndarray = self.graph.node_ids(self.compo_dict[route[idx]])
+            target_ids: np.ndarray = self.graph.node_ids(self.compo_dict[route[idx + 1]])
+            bound: float = np.inf
+            old_nodes, old_edges = (None, None) if previous is None else previous[idx]
+            if old_edges is not None:
+                # 旧路径在当前代价下的代价, 略放大避免浮点误差剪掉等价路径
+                bound = float(self._edge_cost(old_edges, net).sum()) * (1 + 1e-12)
+            nodes, edges, expanded = self._search(start_ids, target_ids, net, bound)
+            stats["searches"] += 1
+            stats["expanded"] += expanded
+            if nodes is None and old_edges is not None:
+                nodes, edges = old_nodes, old_edges
+                stats["kept"] += 1
+            if edges is not None:
+                new_edges: np.ndarray = edges[self._owner[edges] != net]
+                new_edges = np.unique(new_edges)
+                self._owner[new_edges] = net
+                self.usage[new_edges] += 1
+                self._update_cost(new_edges)
+            result.append((nodes, edges))
+        return result
+
+    def _rip_up(self, net: int, segments: list) -> None:
+        edges: np.ndarray = self._net_edges([seg[1] for seg in segments])
+        self.usage[edges] -= 1
+        self._owner[edges] = -1
+        self._update_cost(edges)
+
+    @timed("negotiated_route")
+    def route(self, route_list: list[list[str]]) -> tuple[list, list[dict]]:
+        """
+        negotiate the routes (component name lists as read_routes gives)
+        return the paths in the construct_path format and one stats dict
+        per iteration
+        """
+        nets: list = [None] * len(route_list)
+        history: list[dict] = []
+        ripped: list[int] = list(range(len(route_list)))
+        for iteration in range(1, self.max_iterations + 1):
+            tick: float = time.perf_counter()
+            stats: dict = {"searches": 0, "expanded": 0, "kept": 0}
+            for net in ripped:
+                if nets[net] is not None:
+                    self._rip_up(net, nets[net])
+                nets[net] = self._route_net(net, route_list[net], nets[net], stats)
+                # 布完后解除标记, 后续net按拥塞计费
+                self._owner[self._net_edges([seg[1] for seg in nets[net]])] = -1
+
+            overused: np.ndarray = self.usage > self.capacity
+            stats.update(
+                iteration=iteration,
+                rerouted=len(ripped),
+                overused_edges=int(overused.sum()),
+                overflow=float((self.usage - self.capacity)[overused].sum()),
+                wirelength=float(
+                    sum(
+                        self.base[self._net_edges([seg[1] for seg in segments])].sum()
+                        for segments in nets
+                    )
+                ),
+                wall=time.perf_counter() - tick,
+            )
+            history.append(stats)
+            count(
+                "negotiated",
+                iterations=1,
+                searches=stats["searches"],
+                expanded=stats["expanded"],
+                kept=stats["kept"],
+            )
+            progress(
+                f"negotiation iteration {iteration}: {stats['rerouted']} nets rerouted, "
+                f"{stats['overused_edges']} edges overused"
+            )
+            if not overused.any():
+                break
+
+            # 历史代价累加, 拥塞惩罚加大, 只重布经过超容边的net
+            self.history[overused] += self.hist_fac * (
+                self.usage[overused] - self.capacity[overused]
+            )
+            self.pres_fac *= self.pres_growth
+            self._update_cost()
+            ripped = [
+                net
+                for net, segments in enumerate(nets)
+                if overused[self._net_edges([seg[1] for seg in segments])].any()
+            ]
+
+        path_list: list = [
+            [None if nodes is None else self.graph.to_points(nodes) for nodes, _ in segments]
+            for segments in nets
+        ]
+        return path_list, history
+
+
+def negotiated_construct_path(
+    data_path: str | Layout,
+    nearest_incomp: dict,
+    nearest_outcomp: dict,
+    compo_dict: dict,
+    graph: CSR_graph,
+    capacity: int | np.ndarray = 1,
+    max_iterations: int = 30,
+) -> tuple[list, list[dict]]:
+    """
+    construct_path with negotiated congestion, also returns the per-iteration
+    convergence stats (overused edges, overflow, rerouted nets, searches)
+    """
+    router = NegotiatedRouter(
+        graph, compo_dict, capacity=capacity, max_iterations=max_iterations
+    )
+    route_list: list[list[str]] = astar.read_routes(
+        data_path, nearest_incomp, nearest_outcomp
+    )
+    return router.route(route_list)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from CDT_Graph import SG_graph
+    from Instrument import show_progress
+
+    parser = argparse.ArgumentParser(description="negotiated congestion routing")
+    parser.add_argument("data_path")
+    parser.add_argument("input_path")
+    parser.add_argument("--ratio", type=float, default=0.6)
+    parser.add_argument("--capacity", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    show_progress()
+    layout = Layout.load(args.data_path, args.input_path, args.ratio)
+    sg = SG_graph(args.data_path, args.input_path, args.ratio, layout=layout)
+    path_list, history = negotiated_construct_path(
+        layout,
+        sg.nearest_incomp,
+        sg.nearest_outcomp,
+        sg.compo_dict,
+        sg.build_csr(),
+        args.capacity,
+        args.iterations,
+    )
+    for stats in history:
+        print(stats)
+    print(astar.calcu_length(path_list))
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   Path_Cache.py
+@Time    :   2024/08/08 15:21:09
+@Author  :   chenziyang
+@description   :   bounded LRU cache of routed segment paths
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Callable
+
+import networkx as nx
+import numpy as np
+
+from CSR_Graph import CSR_graph
+
+
+def layout_fingerprint(graph: nx.Graph | CSR_graph, compo_dict: dict) -> str:
+    """
+    hash the searching graph and component corners into a short hex key
+    the same layout built the same way always gets the same key
+    """
+    digest = hashlib.sha1()
+    if isinstance(graph, CSR_graph):
+        for arr in (graph.coords, graph.indptr, graph.indices):
+            digest.update(np.ascontiguousarray(arr).tobytes())
+    else:
+        digest.update(np.array(list(graph.nodes), dtype=np.float64).tobytes())
+        digest.update(np.array(list(graph.edges), dtype=np.float64).tobytes())
+    for name, pos in compo_dict.items():
+        digest.update(name.encode("utf-8"))
+        digest.update(np.asarray(pos, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+class PathCache:
+    """
+    LRU cache mapping (layout fingerprint, start, target, search options)
+    to the routed segment, shared by any number of routers
+    """
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        if maxsize <= 0:
+            raise ValueError("maxsize of PathCache must be positive")
+        self.maxsize: int = maxsize
+        self._store: OrderedDict = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._store
+
+    def get(self, key: tuple):
+        """
+        return the cached value or None, and count the hit / miss
+        """
+        if key not in self._store:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._store.move_to_end(key)
+        return self._store[key]
+
+    def put(self, key: tuple, value) -> None:
+        """
+        store the value and evict the least recently used one when full
+        """
+        self._store[key] = value
+        self._store.move_to_end(key)
+        while len(self._store) > self.maxsize:
+            self._store.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(
+        self,
+        fingerprint: str,
+        drop: Callable[[tuple, object], bool],
+        new_fingerprint: str | None = None,
+    ) -> int:
+        """
+        drop the entries of one layout for which drop(key, value) is true,
+        the others move to new_fingerprint when given, LRU order is kept
+        return the number of dropped entries
+        """
+        dropped: int = 0
+        store: OrderedDict = OrderedDict()
+        for key, value in self._store.items():
+            if key[0] == fingerprint:
+                if drop(key, value):
+                    dropped += 1
+                    continue
+                if new_fingerprint is not None:
+                    key = (new_fingerprint, *key[1:])
+            store[key] = value
+        self._store = store
+        return dropped
+
+    def clear(self) -> None:
+        """
+        drop every entry and reset the statistics
+        """
+        self._store.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        hit / miss statistics of the cache
+        """
+        lookups: int = self.hits + self.misses
+        return {
+            "size": len(self._store),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def path_in_region(path, region: np.ndarray) -> bool:
+    """
+    whether any node of a routed segment lies in the box [[xmin, ymin], [xmax, ymax]],
+    or in any of the (K, 2, 2) boxes
+    """
+    if path is None:
+        return True
+    points: np.ndarray = np.asarray(path, dtype=np.float64).reshape(-1, 1, 2)
+    boxes: np.ndarray = np.asarray(region, dtype=np.float64).reshape(-1, 2, 2)
+    return bool(
+        ((points >= boxes[:, 0]) & (points <= boxes[:, 1])).all(axis=2).any()
+    )
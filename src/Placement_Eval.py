@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   Placement_Eval.py
+@Time    :   2024/08/23 14:37:52
+@Author  :   chenziyang
+@description   :   in-memory channel length of candidate placements for optimizers
+"""
+
+"""
+用法:
+    evaluator = PlacementEvaluator.from_layout(Layout.load(data_path, input_path, 0.6))
+    length = evaluator.evaluate(center)                     # (C, 2) 组件中心
+    length, paths = evaluator.evaluate(center, size, return_paths=True)
+    lengths = evaluate_batch(evaluator, centers, workers=16)  # (K, C, 2)
+
+组件名称与网表固定, 每个候选布局只给出中心 (以及尺寸) 数组:
+    不读写文件, 不导入 pyplot
+    名称, 类型与名称索引在所有候选之间共用, 不再格式化和解析文本行
+    同一组件对在网表中重复出现时只搜索一次, 结果与 construct_path 相同
+    组件重叠的候选直接判为无效, 批量评估中记为 inf
+进程池中每个进程只构造一次 evaluator, 之后只传递候选数组
+"""
+
+import argparse
+import importlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from CDT_Graph import SG_graph
+from CSR_Graph import CSR_graph
+from Layout import Layout
+
+# A-star.py 的文件名不是合法标识符, 通过importlib导入
+astar = importlib.import_module("A-star")
+
+
+class PlacementEvaluator:
+    """
+    total channel length of placements that share names and netlist
+    """
+
+    def __init__(
+        self,
+        names: tuple[str, ...],
+        routes: tuple[tuple[str, ...], ...],
+        size: np.ndarray | None = None,
+        ratio: float = 0.6,
+        mode: str = "pairwise",
+        n: int | None = None,
+        detail: str = "greedy",
+        fixed_scale: int | None = None,
+    ) -> None:
+        """
+        size is the default (C, 2) height, length of every candidate,
+        with n the length is measured after detail routing with n dividers,
+        with fixed_scale candidates are snapped to the 1 / fixed_scale grid
+        """
+        if mode not in astar.SEARCH_MODES:
+            raise ValueError(
+                f"unknown search mode {mode}, expect one of {astar.SEARCH_MODES}"
+            )
+        if detail not in astar.DETAIL_MODES:
+            raise ValueError(
+                f"unknown detail mode {detail}, expect one of {astar.DETAIL_MODES}"
+            )
+        self.routes: tuple[tuple[str, ...], ...] = tuple(map(tuple, routes))
+        self.ratio: float = ratio
+        self.mode: str = mode
+        self.n: int | None = n
+        self.detail: str = detail
+        self.fixed_scale: int | None = fixed_scale
+        self.size: np.ndarray | None = (
+            None if size is None else np.asarray(size).reshape(-1, 2)
+        )
+        # 名称相关的数据只建立一次, 由每个候选布局共用
+        self._template: Layout = Layout.from_arrays(
+            tuple(names),
+            np.zeros((len(names), 2), dtype=np.int64),
+            np.zeros((len(names), 2), dtype=np.int64),
+            self.routes,
+            ratio,
+        )
+        # 每次评估重复使用的组件对 -> 路径表
+        self._segment_path: dict[tuple[str, str], list | None] = {}
+        # 每次评估重复使用的搜索数组
+        self._buffers: astar.SearchBuffers = astar.SearchBuffers()
+
+    @classmethod
+    def from_layout(cls, layout: Layout, **kwargs) -> "PlacementEvaluator":
+        """
+        evaluator for the components, sizes and netlist of a parsed layout
+        """
+        kwargs.setdefault("fixed_scale", layout.fixed_scale)
+        return cls(layout.names, layout.routes, layout.size, layout.ratio, **kwargs)
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return self._template.names
+
+    def layout(self, center: np.ndarray, size: np.ndarray | None = None) -> Layout:
+        """
+        the Layout of one candidate, no text rows are formatted
+        float centers and sizes (e.g. from a continuous optimizer) are rounded
+        to the nearest integer, the grid of the layout files, or snapped to
+        the fixed-point grid with fixed_scale
+        """
+        if size is None:
+            if self.size is None:
+                raise ValueError("give the component sizes or a default size")
+            size = self.size
+        if self.fixed_scale is None:
+            center, size = np.rint(center), np.rint(size)
+        return Layout.from_arrays(
+            self.names,
+            center,
+            size,
+            self.routes,
+            self.ratio,
+            self._template,
+            self.fixed_scale,
+        )
+
+    @staticmethod
+    def check_overlap(layout: Layout) -> None:
+        """
+        components must neither overlap nor touch, and stay inside the die
+        """
+        low: np.ndarray = layout.corners.min(axis=1)
+        high: np.ndarray = layout.corners.max(axis=1)
+        if (low <= 0).any():
+            raise ValueError(
+                f"component {layout.names[int(np.argmax((low <= 0).any(axis=1)))]} "
+                "is outside the chip"
+            )
+        # 按 x 排序后只需比较 x 区间相交的组件
+        order: np.ndarray = np.argsort(low[:, 0], kind="stable")
+        low, high = low[order], high[order]
+        reach: np.ndarray = np.searchsorted(low[:, 0], high[:, 0], side="right")
+        for idx in np.flatnonzero(reach > np.arange(len(order)) + 1).tolist():
+            other = slice(idx + 1, int(reach[idx]))
+            touch: np.ndarray = (
+                (low[other] <= high[idx]) & (high[other] >= low[idx])
+            ).all(axis=1)
+            if touch.any():
+                raise ValueError(
+                    f"component {layout.names[int(order[idx])]} overlaps "
+                    f"{layout.names[int(order[idx + 1 + int(np.argmax(touch))])]}"
+                )
+
+    def route(self, layout: Layout) -> tuple[SG_graph, CSR_graph, list]:
+        """
+        build the SG of a candidate and route its netlist
+        every distinct component pair is searched once
+        """
+        sg = SG_graph("", "", self.ratio, None, layout)
+        graph: CSR_graph = sg.build_csr()
+        segment_path: dict = self._segment_path
+        segment_path.clear()
+        path_list: list = []
+        for route in astar.read_routes(layout, sg.nearest_incomp, sg.nearest_outcomp):
+            each_path_list: list = []
+            for idx in range(len(route) - 1):
+                pair: tuple[str, str] = (route[idx], route[idx + 1])
+                if pair not in segment_path:
+                    segment_path[pair] = astar.find_shortest_path(
+                        pair[0],
+                        pair[1],
+                        sg.compo_dict,
+                        graph,
+                        self.mode,
+                        buffers=self._buffers,
+                    )[2]
+                shortest_path = segment_path[pair]
+                astar.count_segment(shortest_path)
+                each_path_list.append(
+                    None if shortest_path is None else list(shortest_path)
+                )
+            path_list.append(each_path_list)
+        segment_path.clear()
+        return sg, graph, path_list
+
+    def evaluate(
+        self,
+        center: np.ndarray,
+        size: np.ndarray | None = None,
+        return_paths: bool = False,
+        check: bool = True,
+    ) -> float | tuple[float, list]:
+        """
+        total channel length of one candidate as calcu_length counts it,
+        also the routed paths when return_paths is set
+        """
+        layout: Layout = self.layout(center, size)
+        if check:
+            PlacementEvaluator.check_overlap(layout)
+        _, graph, path_list = self.route(layout)
+        if self.n is not None:
+            path_list = astar.detail_routing(graph, path_list, self.n, self.detail)
+        length: float = float(astar.calcu_length(path_list))
+        if return_paths:
+            return length, path_list
+        return length
+
+
+# 每个工作进程持有的 evaluator
+_eval_worker_state: dict = {}
+
+
+def _init_eval_worker(evaluator: PlacementEvaluator, return_paths: bool) -> None:
+    _eval_worker_state.update(evaluator=evaluator, return_paths=return_paths)
+
+
+def _evaluate_worker(candidate: tuple[np.ndarray, np.ndarray | None]):
+    """
+    evaluate one candidate in a worker, invalid placements score inf
+    """
+    evaluator: PlacementEvaluator = _eval_worker_state["evaluator"]
+    return_paths: bool = _eval_worker_state["return_paths"]
+    try:
+        return evaluator.evaluate(candidate[0], candidate[1], return_paths)
+    except (ValueError, RuntimeError):
+        return (float("inf"), None) if return_paths else float("inf")
+
+
+def evaluate_batch(
+    evaluator: PlacementEvaluator,
+    centers: np.ndarray,
+    sizes: np.ndarray | None = None,
+    workers: int | None = None,
+    return_paths: bool = False,
+) -> list:
+    """
+    evaluate (K, C, 2) candidate centers (and sizes) in a process pool,
+    results keep the candidate order, invalid placements score inf
+    """
+    candidates: list = [
+        (center, None if sizes is None else sizes[idx])
+        for idx, center in enumerate(centers)
+    ]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(candidates) or 1))
+    if workers == 1:
+        _init_eval_worker(evaluator, return_paths)
+        return [_evaluate_worker(candidate) for candidate in candidates]
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_eval_worker,
+        initargs=(evaluator, return_paths),
+    ) as pool:
+        chunksize: int = max(1, len(candidates) // (workers * 4))
+        return list(pool.map(_evaluate_worker, candidates, chunksize=chunksize))
+
+
+def jitter_candidates(
+    layout: Layout, count: int, step: int = 1, seed: int = 0
+) -> np.ndarray:
+    """
+    (count, C, 2) centers moved by up to step from the layout, for benchmarks
+    """
+    rng = np.random.default_rng(seed)
+    offset: np.ndarray = rng.integers(-step, step + 1, size=(count, *layout.center.shape))
+    return layout.center[None] + offset
+
+
+if __name__ == "__main__":
+    from Chip_Generator import generate_in_memory
+
+    parser = argparse.ArgumentParser(description="candidate placements per second")
+    parser.add_argument("--components", type=int, default=100)
+    parser.add_argument("--candidates", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--mode", default="pairwise", choices=astar.SEARCH_MODES)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    base: Layout = generate_in_memory(args.components, args.seed)
+    evaluator = PlacementEvaluator.from_layout(base, mode=args.mode)
+    centers: np.ndarray = jitter_candidates(base, args.candidates, seed=args.seed)
+    tick = time.perf_counter()
+    lengths: list = evaluate_batch(evaluator, centers, workers=args.workers)
+    wall: float = time.perf_counter() - tick
+    valid: int = int(np.isfinite(lengths).sum())
+    print(
+        f"[*] {len(lengths)} candidates ({valid} valid) in {wall:.3f}s, "
+        f"{len(lengths) / wall:.2f} candidates/s"
+    )
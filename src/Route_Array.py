@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   Route_Array.py
+@Time    :   2024/08/27 16:20:41
+@Author  :   chenziyang
+@description   :   compact route container, flat coordinates plus offset arrays
+"""
+
+"""
+存储结构:
+    coords          (P, 2) float64 : 所有路径点依次排列
+    segment_offsets (S + 1,) int64 : 第s段的点为 coords[segment_offsets[s]:segment_offsets[s + 1]]
+    route_offsets   (R + 1,) int64 : 第r条路径的段为 route_offsets[r] 到 route_offsets[r + 1]
+    node_ids        (P,) int32     : 可选, 点在CSR SG中的编号
+没有找到路径的段 (嵌套列表中的None) 存为0个点
+
+嵌套列表每个点是一个元组, 每个坐标又是一个 np.float64 对象;
+这里每个点只占16字节, 取某一段得到的是 coords 的视图, 不复制
+.npz 保存全部数组, save_npy 分别保存为 .npy, 可以用 mmap 方式零拷贝读取
+"""
+
+from itertools import chain
+
+import numpy as np
+
+from CSR_Graph import CSR_graph
+
+_ROUTE_FIELDS: tuple[str, ...] = ("coords", "segment_offsets", "route_offsets")
+
+
+class RouteArray:
+    """
+    routes of a netlist as flat arrays, iterating gives the nested structure
+    with (k, 2) coordinate views for segments and None for unrouted ones
+    """
+
+    def __init__(
+        self,
+        coords: np.ndarray,
+        segment_offsets: np.ndarray,
+        route_offsets: np.ndarray,
+        node_ids: np.ndarray | None = None,
+    ) -> None:
+        self.coords: np.ndarray = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        self.segment_offsets: np.ndarray = np.asarray(segment_offsets, dtype=np.int64)
+        self.route_offsets: np.ndarray = np.asarray(route_offsets, dtype=np.int64)
+        self.node_ids: np.ndarray | None = (
+            None if node_ids is None else np.asarray(node_ids, dtype=np.int32)
+        )
+        if self.segment_offsets[-1] != len(self.coords):
+            raise ValueError("segment offsets do not end at the number of points")
+        if self.route_offsets[-1] != len(self.segment_offsets) - 1:
+            raise ValueError("route offsets do not end at the number of segments")
+
+    @classmethod
+    def from_paths(cls, path: list[list]) -> "RouteArray":
+        """
+        pack nested construct_path / detail_routing results
+        """
+        sizes: np.ndarray = np.fromiter(map(len, path), dtype=np.int64, count=len(path))
+        segments: list = list(chain.from_iterable(path))
+        counts: np.ndarray = np.fromiter(
+            (0 if seg is None else len(seg) for seg in segments),
+            dtype=np.int64,
+            count=len(segments),
+        )
+        coords: np.ndarray = np.fromiter(
+            chain.from_iterable(
+                chain.from_iterable(seg for seg in segments if seg is not None)
+            ),
+            dtype=np.float64,
+            count=2 * int(counts.sum()),
+        )
+        return cls(coords, _offsets(counts), _offsets(sizes))
+
+    @classmethod
+    def from_node_ids(
+        cls, graph: CSR_graph, segments: list[np.ndarray | None], route_sizes: list[int]
+    ) -> "RouteArray":
+        """
+        pack the node id arrays of searched segments, route r owns the next
+        route_sizes[r] segments; the coordinates are gathered in one step
+        """
+        counts: np.ndarray = np.fromiter(
+            (0 if ids is None else len(ids) for ids in segments),
+            dtype=np.int64,
+            count=len(segments),
+        )
+        routed: list[np.ndarray] = [ids for ids in segments if ids is not None]
+        node_ids: np.ndarray = (
+            np.concatenate(routed).astype(np.int32)
+            if routed
+            else np.empty(0, dtype=np.int32)
+        )
+        return cls(
+            graph.coords[node_ids],
+            _offsets(counts),
+            _offsets(np.asarray(route_sizes, dtype=np.int64)),
+            node_ids,
+        )
+
+    def __len__(self) -> int:
+        return len(self.route_offsets) - 1
+
+    @property
+    def num_segments(self) -> int:
+        return len(self.segment_offsets) - 1
+
+    @property
+    def num_points(self) -> int:
+        return len(self.coords)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.coords, self.segment_offsets, self.route_offsets, self.node_ids)
+        return sum(arr.nbytes for arr in arrays if arr is not None)
+
+    def segment_sizes(self) -> np.ndarray:
+        """
+        (S,) number of points of every segment
+        """
+        return np.diff(self.segment_offsets)
+
+    def segment_owner(self) -> np.ndarray:
+        """
+        (S,) route index of every segment
+        """
+        return np.repeat(np.arange(len(self)), np.diff(self.route_offsets))
+
+    def segment(self, idx: int) -> np.ndarray | None:
+        """
+        (k, 2) view of one segment by its flat index, None if unrouted
+        """
+        lo, hi = self.segment_offsets[idx], self.segment_offsets[idx + 1]
+        return None if lo == hi else self.coords[lo:hi]
+
+    def route(self, idx: int) -> list[np.ndarray | None]:
+        """
+        the segments of one route as views
+        """
+        return [
+            self.segment(seg)
+            for seg in range(self.route_offsets[idx], self.route_offsets[idx + 1])
+        ]
+
+    def __getitem__(self, idx: int) -> list[np.ndarray | None]:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("route index out of range")
+        return self.route(idx)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self.route(idx)
+
+    def point_pairs(self) -> np.ndarray:
+        """
+        index of the first point of every consecutive point pair, pairs that
+        would join two segments are left out
+        """
+        if len(self.coords) == 0:
+            return np.empty(0, dtype=np.int64)
+        # 每段最后一个点不与下一个点相连, 空段没有点需要跳过
+        ends: np.ndarray = self.segment_offsets[1:][self.segment_sizes() > 0] - 1
+        last: np.ndarray = np.zeros(len(self.coords), dtype=bool)
+        last[ends] = True
+        return np.flatnonzero(~last[:-1])
+
+    def to_list(self) -> list[list[list[tuple] | None]]:
+        """
+        the nested list of coordinate tuples that construct_path returns
+        """
+        return [
+            [None if seg is None else list(map(tuple, seg)) for seg in route]
+            for route in self
+        ]
+
+    def arrays(self) -> dict[str, np.ndarray]:
+        """
+        the arrays that fully describe the routes, RouteArray(**arrays) rebuilds it
+        """
+        arrays: dict[str, np.ndarray] = {field: getattr(self, field) for field in _ROUTE_FIELDS}
+        if self.node_ids is not None:
+            arrays["node_ids"] = self.node_ids
+        return arrays
+
+    def save(self, path: str) -> None:
+        """
+        write every array into one .npz file
+        """
+        np.savez(path, **self.arrays())
+
+    def save_npy(self, prefix: str) -> list[str]:
+        """
+        write every array as <prefix>.<field>.npy, return the file names
+        """
+        paths: list[str] = []
+        for field, arr in self.arrays().items():
+            paths.append(f"{prefix}.{field}.npy")
+            np.save(paths[-1], arr)
+        return paths
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = False) -> "RouteArray":
+        """
+        read a .npz written by save, or the .npy files of save_npy when path
+        is their prefix; mmap maps the .npy files instead of reading them
+        """
+        if path.endswith(".npz"):
+            with np.load(path) as data:
+                return cls(**{field: data[field] for field in data.files})
+        arrays: dict[str, np.ndarray] = {}
+        for field in (*_ROUTE_FIELDS, "node_ids"):
+            try:
+                arrays[field] = np.load(
+                    f"{path}.{field}.npy", mmap_mode="r" if mmap else None
+                )
+            except FileNotFoundError:
+                if field != "node_ids":
+                    raise
+        return cls(**arrays)
+
+    def plot(self, ax=None, **kwargs):
+        """
+        draw every segment as one LineCollection
+        """
+        # 绘图时才导入matplotlib
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import LineCollection
+
+        if ax is None:
+            ax = plt.gca()
+        lines: list[np.ndarray] = [
+            seg for seg in map(self.segment, range(self.num_segments)) if seg is not None
+        ]
+        collection = LineCollection(lines, **kwargs)
+        ax.add_collection(collection)
+        ax.autoscale_view()
+        return collection
+
+
+def _offsets(counts: np.ndarray) -> np.ndarray:
+    offsets: np.ndarray = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
@@ -48,6 +48,352 @@ def calculate_midpoint_with2points(
     return tuple(midpoint)
 
 
+def calculate_tri_edge_midpoints(
+    points: np.ndarray, tri: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    calculate the midpoints of every triangle edge in one pass
+    edge k of a triangle joins vertex k and vertex (k+1)%3
+    return midpoints (T, 3, 2) and edge terminals (T, 3, 2, 2)
+    """
+    head: np.ndarray = points[tri]
+    tail: np.ndarray = np.roll(head, -1, axis=1)
+    # + 0.0 统一 -0.0 与 0.0, 保证按字节比较时一致
+    midpoints: np.ndarray = (head + tail) / 2 + 0.0
+    terminals: np.ndarray = np.stack((head, tail), axis=2)
+    return midpoints, terminals
+
+
+def calculate_polygon_edge_midpoints(polygons: np.ndarray) -> np.ndarray:
+    """
+    calculate the midpoints of every polygon edge (P, K, 2) -> (P * K, 2)
+    """
+    polygons = np.asarray(polygons, dtype=np.float64)
+    midpoints: np.ndarray = (polygons + np.roll(polygons, -1, axis=1)) / 2 + 0.0
+    return midpoints.reshape(-1, 2)
+
+
+def _rows_as_void(arr: np.ndarray) -> np.ndarray:
+    """
+    view each row of a 2-D array as one opaque scalar so rows compare in bulk
+    """
+    arr = np.ascontiguousarray(arr)
+    return arr.view(np.dtype((np.void, arr.dtype.itemsize * arr.shape[1]))).ravel()
+
+
+def unique_rows_in_order(arr: np.ndarray) -> np.ndarray:
+    """
+    return the distinct rows of arr in order of first appearance
+    """
+    _, first_idx = np.unique(_rows_as_void(arr), return_index=True)
+    return arr[np.sort(first_idx)]
+
+
+def isin_rows(arr: np.ndarray, other: np.ndarray) -> np.ndarray:
+    """
+    return a bool mask telling which rows of arr also appear in other
+    """
+    if len(other) == 0:
+        return np.zeros(len(arr), dtype=bool)
+    return np.isin(_rows_as_void(arr), _rows_as_void(other.astype(arr.dtype)))
+
+
+POINT_DTYPE = np.dtype([("x", np.float64), ("y", np.float64)])
+
+
+def as_point_records(arr: np.ndarray) -> np.ndarray:
+    """
+    view an (N, 2) float64 array as N (x, y) records that sort lexicographically
+    """
+    arr = np.ascontiguousarray(np.asarray(arr, dtype=np.float64).reshape(-1, 2) + 0.0)
+    return arr.view(POINT_DTYPE).ravel()
+
+
+def search_sorted_points(sorted_records: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """
+    find the index of each point in lexicographically sorted records, -1 if absent
+    """
+    query: np.ndarray = as_point_records(points)
+    if len(sorted_records) == 0:
+        return np.full(len(query), -1, dtype=np.int32)
+    idx: np.ndarray = np.searchsorted(sorted_records, query)
+    idx = np.minimum(idx, len(sorted_records) - 1)
+    return np.where(sorted_records[idx] == query, idx, -1).astype(np.int32)
+
+
+# 定点坐标: 整数单位为 1 / (2 * scale), 顶点的定点值都是偶数, 所以两点的中点仍为整数
+# scale = 2 时整数中心, 整数尺寸的组件角点 (半整数) 与其中点都可以精确表示
+FIXED_SCALE: int = 2
+# 打包键: 高32位为 x, 低32位为 y + 2^31, 整数大小顺序与 (x, y) 字典序一致
+_KEY_OFFSET: int = 2**31
+
+
+def to_fixed(points: np.ndarray, scale: int = FIXED_SCALE) -> np.ndarray:
+    """
+    snap coordinates to the 1 / scale grid and return them as int64 fixed-point
+    values in units of 1 / (2 * scale)
+    """
+    return np.rint(np.asarray(points, dtype=np.float64) * scale).astype(np.int64) * 2
+
+
+def from_fixed(fixed: np.ndarray, scale: int = FIXED_SCALE) -> np.ndarray:
+    """
+    float coordinates of fixed-point values, the same value always gives the
+    same float so coordinates derived from keys compare exactly
+    """
+    return np.asarray(fixed, dtype=np.int64) / (2 * scale) + 0.0
+
+
+def pack_fixed(fixed: np.ndarray) -> np.ndarray:
+    """
+    pack (..., 2) fixed-point coordinates into one int64 key per point
+    """
+    fixed = np.asarray(fixed, dtype=np.int64)
+    if len(fixed) and (
+        fixed.min() < -_KEY_OFFSET or fixed.max() >= _KEY_OFFSET
+    ):
+        raise ValueError("fixed-point coordinates do not fit in a packed key")
+    return (fixed[..., 0] << 32) + (fixed[..., 1] + _KEY_OFFSET)
+
+
+def unpack_fixed(keys: np.ndarray) -> np.ndarray:
+    """
+    (..., 2) fixed-point coordinates of packed keys
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    y: np.ndarray = (keys & 0xFFFFFFFF) - _KEY_OFFSET
+    return np.stack(((keys - y - _KEY_OFFSET) >> 32, y), axis=-1)
+
+
+def point_keys(points: np.ndarray, scale: int = FIXED_SCALE) -> np.ndarray:
+    """
+    packed int64 keys of float coordinates
+    """
+    return pack_fixed(to_fixed(points, scale))
+
+
+def snap_to_fixed(points: np.ndarray, scale: int = FIXED_SCALE) -> np.ndarray:
+    """
+    float coordinates snapped to the 1 / scale grid
+    """
+    return from_fixed(to_fixed(points, scale), scale)
+
+
+def calculate_tri_edge_midpoints_fixed(
+    fixed: np.ndarray, tri: np.ndarray
+) -> np.ndarray:
+    """
+    exact fixed-point midpoints (T, 3, 2) of every triangle edge,
+    edge k joins vertex k and vertex (k+1)%3 like calculate_tri_edge_midpoints
+    """
+    head: np.ndarray = fixed[tri]
+    return (head + np.roll(head, -1, axis=1)) // 2
+
+
+def calculate_polygon_edge_midpoints_fixed(fixed_polygons: np.ndarray) -> np.ndarray:
+    """
+    exact fixed-point midpoints of every polygon edge (P, K, 2) -> (P * K, 2)
+    """
+    fixed_polygons = np.asarray(fixed_polygons, dtype=np.int64)
+    return ((fixed_polygons + np.roll(fixed_polygons, -1, axis=1)) // 2).reshape(-1, 2)
+
+
+def search_sorted_keys(sorted_keys: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """
+    find the index of each key in sorted unique keys, -1 if absent
+    """
+    if len(sorted_keys) == 0:
+        return np.full(len(keys), -1, dtype=np.int32)
+    idx: np.ndarray = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return np.where(sorted_keys[idx] == keys, idx, -1).astype(np.int32)
+
+
+def point_on_rectangle(points: np.ndarray, corners: np.ndarray) -> np.ndarray:
+    """
+    tell which points lie on the border of the axis-aligned rectangle of corners
+    """
+    low: np.ndarray = corners.min(axis=0)
+    high: np.ndarray = corners.max(axis=0)
+    inside: np.ndarray = ((points >= low) & (points <= high)).all(axis=1)
+    on_side: np.ndarray = ((points == low) | (points == high)).any(axis=1)
+    return inside & on_side
+
+
+def build_vertex_triangle_index(
+    tri: np.ndarray, n_vertices: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    build a CSR map from each vertex to the triangle corners it occupies
+    corners of vertex v are slots[indptr[v]:indptr[v + 1]], slot = 3 * t + k,
+    in ascending triangle order
+    """
+    flat: np.ndarray = np.asarray(tri, dtype=np.int64).ravel()
+    indptr: np.ndarray = np.zeros(n_vertices + 1, dtype=np.int64)
+    np.cumsum(np.bincount(flat, minlength=n_vertices), out=indptr[1:])
+    slots: np.ndarray = np.argsort(flat, kind="stable").astype(np.int32)
+    return indptr, slots
+
+
+def triangle_neighbors(tri: np.ndarray) -> np.ndarray:
+    """
+    (T, 3) index of the triangle across edge k (vertex k to vertex (k+1)%3),
+    -1 on the boundary of the triangulated domain
+    """
+    tri = np.asarray(tri, dtype=np.int64)
+    head: np.ndarray = tri.ravel()
+    tail: np.ndarray = np.roll(tri, -1, axis=1).ravel()
+    n_vertices: int = int(tri.max()) + 1 if len(tri) else 0
+    key: np.ndarray = np.minimum(head, tail) * n_vertices + np.maximum(head, tail)
+    order: np.ndarray = np.argsort(key, kind="stable")
+    # 同一条边的两个槽位排序后相邻
+    pair: np.ndarray = np.flatnonzero(key[order][1:] == key[order][:-1])
+    nbr: np.ndarray = np.full(len(head), -1, dtype=np.int64)
+    nbr[order[pair]] = order[pair + 1] // 3
+    nbr[order[pair + 1]] = order[pair] // 3
+    return nbr.reshape(-1, 3)
+
+
+def _exact_coords(coords: list, vertices: tuple) -> list[tuple[int, int]]:
+    """
+    the vertices as integers on a common power-of-two grid, every float is a
+    dyadic rational so the predicates below are evaluated without rounding
+    """
+    ratios: list = [
+        value.as_integer_ratio() for v in vertices for value in coords[v]
+    ]
+    scale: int = max(den for _, den in ratios)
+    values: list = [num * (scale // den) for num, den in ratios]
+    return list(zip(values[::2], values[1::2]))
+
+
+def _orient_exact(a: tuple, b: tuple, c: tuple) -> int:
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+
+def _incircle_terms(a: tuple, b: tuple, c: tuple, d: tuple) -> tuple:
+    """
+    incircle(a, b, c, d) = sum(z_p * C_p), the cofactors C_a, C_b, C_c of the
+    lifted heights z = |p - d|^2 of a, b, c; d contributes -(C_a + C_b + C_c)
+    """
+    ad, bd, cd = (
+        (a[0] - d[0], a[1] - d[1]),
+        (b[0] - d[0], b[1] - d[1]),
+        (c[0] - d[0], c[1] - d[1]),
+    )
+    cofactor: tuple = (
+        bd[0] * cd[1] - cd[0] * bd[1],
+        -(ad[0] * cd[1] - cd[0] * ad[1]),
+        ad[0] * bd[1] - bd[0] * ad[1],
+    )
+    lifted: tuple = tuple(p[0] * p[0] + p[1] * p[1] for p in (ad, bd, cd))
+    return sum(z * cof for z, cof in zip(lifted, cofactor)), cofactor
+
+
+def _should_flip(
+    coords: list, rank: list, a: int, b: int, c: int, d: int
+) -> tuple[bool, bool]:
+    """
+    exact test whether edge ab between triangles abc and bad is illegal,
+    cocircular ties are broken by symbolic perturbation of the lifted heights:
+    the vertex of smallest rank decides, so the result is unique
+    return the decision and whether abc is clockwise
+    """
+    pa, pb, pc, pd = _exact_coords(coords, (a, b, c, d))
+    clockwise: bool = _orient_exact(pa, pb, pc) < 0
+    if clockwise:
+        a, b, pa, pb = b, a, pb, pa
+    # 翻转后的两个三角形必须非退化
+    if _orient_exact(pa, pd, pc) <= 0 or _orient_exact(pd, pb, pc) <= 0:
+        return False, clockwise
+    det, cofactor = _incircle_terms(pa, pb, pc, pd)
+    if det != 0:
+        return det > 0, clockwise
+    coefficient: dict = dict(zip((a, b, c), cofactor))
+    coefficient[d] = -sum(cofactor)
+    return coefficient[min((a, b, c, d), key=rank.__getitem__)] > 0, clockwise
+
+
+def legalize_triangulation(
+    points: np.ndarray, tri: np.ndarray, seed: np.ndarray | None = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Lawson edge flips until every interior edge is locally Delaunay,
+    only edges of the seed triangles are checked at first (all when None);
+    interior edges never carry constraints here because every constraint
+    edge bounds a hole or the die, so the result is the constrained Delaunay
+    triangulation with canonical tie breaking: it depends on the vertex
+    coordinates only, not on the insertion order
+    return the triangles and a mask of the flipped ones
+    """
+    tri = np.array(tri, dtype=np.int64).reshape(-1, 3)
+    flipped: np.ndarray = np.zeros(len(tri), dtype=bool)
+    if len(tri) == 0:
+        return tri, flipped
+    nbr: np.ndarray = triangle_neighbors(tri)
+    # 按坐标字典序排名, 与插入顺序无关
+    rank: list = np.unique(as_point_records(points), return_inverse=True)[1].ravel().tolist()
+
+    # 浮点预筛: 明显合法的边不再精确判断
+    t_idx, k_idx = np.nonzero(nbr > np.arange(len(tri))[:, None])
+    if seed is not None:
+        keep: np.ndarray = seed[t_idx] | seed[nbr[t_idx, k_idx]]
+        t_idx, k_idx = t_idx[keep], k_idx[keep]
+    a: np.ndarray = tri[t_idx, k_idx]
+    b: np.ndarray = tri[t_idx, (k_idx + 1) % 3]
+    c: np.ndarray = tri[t_idx, (k_idx + 2) % 3]
+    d: np.ndarray = tri[nbr[t_idx, k_idx]].sum(axis=1) - a - b
+    pa, pb, pc, pd = (points[v] - points[d] for v in (a, b, c, d))
+    cross = lambda u, v: u[:, 0] * v[:, 1] - v[:, 0] * u[:, 1]  # noqa: E731
+    terms: np.ndarray = np.stack(
+        (
+            (pa**2).sum(axis=1) * cross(pb, pc),
+            -(pb**2).sum(axis=1) * cross(pa, pc),
+            (pc**2).sum(axis=1) * cross(pa, pb),
+        )
+    )
+    orient: np.ndarray = np.sign(cross(pb - pa, pc - pa))
+    suspect: np.ndarray = terms.sum(axis=0) * orient >= -1e-9 * np.abs(terms).sum(axis=0)
+    stack: list = list(zip(t_idx[suspect].tolist(), k_idx[suspect].tolist()))
+
+    coords: list = np.asarray(points, dtype=np.float64).tolist()
+    tri_list: list = tri.tolist()
+    nbr_list: list = nbr.tolist()
+
+    def across(t: int, u: int, v: int) -> int:
+        verts: list = tri_list[t]
+        for k in range(3):
+            if {verts[k], verts[(k + 1) % 3]} == {u, v}:
+                return nbr_list[t][k]
+        raise ValueError("edge is not in the triangle")
+
+    def repoint(t: int, old: int, new: int) -> None:
+        if t >= 0:
+            nbr_list[t][nbr_list[t].index(old)] = new
+
+    while stack:
+        t, k = stack.pop()
+        t2: int = nbr_list[t][k]
+        if t2 < 0:
+            continue
+        a, b, c = tri_list[t][k], tri_list[t][(k + 1) % 3], tri_list[t][(k + 2) % 3]
+        d = sum(tri_list[t2]) - a - b
+        flip, clockwise = _should_flip(coords, rank, a, b, c, d)
+        if not flip:
+            continue
+        if clockwise:
+            a, b = b, a
+        # abc 与 bad 为逆时针, 翻转为 adc 与 dbc
+        n_bc, n_ca = across(t, b, c), across(t, c, a)
+        n_ad, n_db = across(t2, a, d), across(t2, d, b)
+        tri_list[t], nbr_list[t] = [a, d, c], [n_ad, t2, n_ca]
+        tri_list[t2], nbr_list[t2] = [d, b, c], [n_db, n_bc, t]
+        repoint(n_ad, t2, t)
+        repoint(n_bc, t, t2)
+        flipped[t] = flipped[t2] = True
+        stack.extend(((t, 0), (t, 2), (t2, 0), (t2, 1)))
+    return np.array(tri_list, dtype=np.int64).reshape(-1, 3), flipped
+
+
 def read_input_file(input_file):
     """
     read the process input file
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   conftest.py
+@Time    :   2024/09/02 10:12:37
+@Author  :   chenziyang
+@description   :   shared fixtures, the modules in src are imported by bare name
+"""
+
+import importlib
+import os
+import sys
+
+import pytest
+
+ROOT: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+from CDT_Graph import SG_graph  # noqa: E402
+from Chip_Generator import generate_in_memory  # noqa: E402
+from Layout import Layout  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _repo_root(monkeypatch):
+    # 数据路径都是相对仓库根目录的
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.fixture(scope="session")
+def astar():
+    # A-star.py 的文件名不是合法标识符, 通过importlib导入
+    return importlib.import_module("A-star")
+
+
+def build_sg(layout: Layout, **kwargs) -> SG_graph:
+    """
+    complete SG of an in-memory layout
+    """
+    sg = SG_graph("", "", layout.ratio, None, layout, **kwargs)
+    sg.add_midpoint_to_SG()
+    sg.add_egdes_to_SG()
+    sg.add_startarget_to_SG()
+    return sg
+
+
+@pytest.fixture(scope="session")
+def data1_layout() -> Layout:
+    return Layout.load(
+        os.path.join(ROOT, "Data", "data1.txt"), os.path.join(ROOT, "Data", "input1.txt"), 0.6
+    )
+
+
+@pytest.fixture(scope="session")
+def data1_sg(data1_layout) -> SG_graph:
+    return build_sg(data1_layout)
+
+
+@pytest.fixture(scope="session")
+def synthetic_layout() -> Layout:
+    return generate_in_memory(60, seed=0)
+
+
+@pytest.fixture(scope="session")
+def synthetic_sg(synthetic_layout) -> SG_graph:
+    return build_sg(synthetic_layout)
+
+
+@pytest.fixture(scope="session")
+def synthetic_paths(astar, synthetic_layout, synthetic_sg) -> list:
+    return astar.construct_path(
+        synthetic_layout,
+        synthetic_sg.nearest_incomp,
+        synthetic_sg.nearest_outcomp,
+        synthetic_sg.compo_dict,
+        synthetic_sg.to_csr(),
+    )
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   test_batch_route.py
+@Time    :   2024/09/06 09:48:20
+@Author  :   chenziyang
+@description   :   batch jobs of layouts with the same file name
+"""
+
+import json
+import os
+
+from Batch_Route import read_manifest, run_batch, unique_names
+from Chip_Generator import generate
+
+
+def test_same_named_layouts_keep_their_results(tmp_path):
+    lines: list[str] = []
+    for sub in ("a", "b"):
+        os.makedirs(tmp_path / sub)
+        generate(10, 0, str(tmp_path / sub))
+        lines.append(f"{sub}/data10s0.txt\t{sub}/input10s0.txt")
+    # 同一布局出现两次也不互相覆盖
+    lines.append(lines[0])
+    manifest = tmp_path / "jobs.txt"
+    manifest.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    jobs = read_manifest(str(manifest))
+    names = [name for name, _, _ in jobs]
+    assert names == ["a_data10s0", "b_data10s0", "a_data10s0-2"]
+
+    out_dir = tmp_path / "out"
+    results = run_batch(jobs, str(out_dir), workers=1)
+    assert all(result["status"] == "ok" for result in results)
+    with open(out_dir / "summary.jsonl", encoding="utf-8") as f:
+        summary = [json.loads(line) for line in f]
+    assert [row["name"] for row in summary] == names
+    for name, layout_path, _ in jobs:
+        with open(out_dir / f"{name}.json", encoding="utf-8") as f:
+            assert json.load(f)["layout"] == layout_path
+
+
+def test_suffixes_skip_names_already_taken():
+    jobs = [(name, "", "") for name in ("data1", "data1", "data1-2")]
+    assert [name for name, _, _ in unique_names(jobs)] == ["data1", "data1-3", "data1-2"]
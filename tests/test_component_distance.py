@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   test_component_distance.py
+@Time    :   2024/09/02 14:05:51
+@Author  :   chenziyang
+@description   :   batched component distance table against single searches
+"""
+
+import pytest
+
+from test_search import netlist_pairs
+
+
+def test_component_path_has_shortest_length(astar, synthetic_layout, synthetic_sg):
+    csr = synthetic_sg.to_csr()
+    names, distance = synthetic_sg.build_component_distance(csr)
+    for start, target in netlist_pairs(astar, synthetic_layout, synthetic_sg):
+        table = synthetic_sg.component_path(start, target)
+        search = astar.find_shortest_path(start, target, synthetic_sg.compo_dict, csr, "multi")
+        if search[2] is None:
+            assert table[2] is None
+            continue
+        # 路径等长时选中的角点与节点可以不同, 只比较长度
+        table_length = astar.calcu_length([[table[2]]])
+        assert table_length == pytest.approx(astar.calcu_length([[search[2]]]))
+        assert table_length == pytest.approx(distance[names.index(start), names.index(target)])
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   test_detail_routing.py
+@Time    :   2024/09/03 09:48:26
+@Author  :   chenziyang
+@description   :   detail routing modes against the greedy divider choice
+"""
+
+import numpy as np
+import pytest
+
+
+def polyline_length(points: list[tuple]) -> float:
+    arr: np.ndarray = np.asarray(points, dtype=np.float64)
+    return float(np.sqrt(((arr[1:] - arr[:-1]) ** 2).sum(axis=1)).sum())
+
+
+def routed_segments(paths) -> list[list[tuple]]:
+    return [seg for route in paths for seg in route if seg is not None]
+
+
+@pytest.mark.parametrize("n", [2, 7])
+def test_dp_not_longer_than_greedy(astar, synthetic_sg, synthetic_paths, n):
+    csr = synthetic_sg.to_csr()
+    for seg in routed_segments(synthetic_paths):
+        greedy = polyline_length(astar.one_detail_routing(csr, seg, n))
+        dp_route = astar.one_detail_routing(csr, seg, n, "dp")
+        # dp 在同样的等分点中取最短, 贪心只是其中一种选择
+        assert len(dp_route) == len(seg)
+        assert polyline_length(dp_route) <= greedy + 1e-9
+
+
+def test_funnel_not_longer_than_greedy_or_dp(astar, synthetic_sg, synthetic_paths):
+    csr = synthetic_sg.to_csr()
+    for seg in routed_segments(synthetic_paths):
+        funnel = polyline_length(astar.one_detail_routing(csr, seg, 7, "funnel"))
+        # 拉直的路径可以在整条边上取点, 不受等分点限制
+        assert funnel <= polyline_length(astar.one_detail_routing(csr, seg, 7)) + 1e-9
+        assert funnel <= polyline_length(astar.one_detail_routing(csr, seg, 7, "dp")) + 1e-9
@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   test_fixed_point.py
+@Time    :   2024/09/05 10:26:14
+@Author  :   chenziyang
+@description   :   layouts off the half-integer grid in the fixed-point mode
+"""
+
+import numpy as np
+import pytest
+
+from Layout import Layout
+from Placement_Eval import PlacementEvaluator
+from conftest import build_sg
+from test_incremental import assert_same_as_rebuild
+from util import point_on_rectangle
+
+# 2 的幂, 定点坐标换算成浮点数时没有舍入
+FIXED_SCALE: int = 16
+
+
+def fractional_rows(layout: Layout) -> tuple[tuple[str, ...], ...]:
+    """
+    layout file rows with centers and sizes moved off the integer grid
+    """
+    rng = np.random.default_rng(0)
+    center = layout.center + rng.choice([-0.35, -0.1, 0.15, 0.4], layout.center.shape)
+    size = layout.size + rng.choice([0.0, 0.3, 0.45], layout.size.shape)
+    return tuple(
+        (name, *map(str, values))
+        for name, values in zip(layout.names, np.hstack((center, size)).tolist())
+    )
+
+
+def test_float_mode_refuses_fractional_layouts(synthetic_layout):
+    rows = fractional_rows(synthetic_layout)
+    with pytest.raises(ValueError, match="fixed_scale"):
+        Layout(rows, synthetic_layout.routes, synthetic_layout.ratio)
+    with pytest.raises(ValueError, match="fixed_scale"):
+        synthetic_layout.replace_component(synthetic_layout.names[0], (10.3, 20.0))
+
+
+def test_fixed_mode_routes_fractional_layouts(astar, synthetic_layout):
+    layout = Layout(
+        fractional_rows(synthetic_layout),
+        synthetic_layout.routes,
+        synthetic_layout.ratio,
+        fixed_scale=FIXED_SCALE,
+    )
+    assert not np.array_equal(layout.center, np.rint(layout.center))
+    PlacementEvaluator.check_overlap(layout)
+    sg = build_sg(layout)
+    assert sg.fixed_scale == FIXED_SCALE
+    graph = sg.to_csr()
+
+    # 每个组件角点都是SG节点, 其余节点都不在组件边上
+    footprints = list(sg.compo_dict.values())
+    corner_ids = graph.node_ids(np.concatenate(footprints))
+    assert (corner_ids >= 0).all()
+    on_border = np.zeros(graph.num_nodes, dtype=bool)
+    for corners in footprints:
+        on_border |= point_on_rectangle(graph.coords, np.asarray(corners))
+    on_border[corner_ids] = False
+    assert not on_border.any()
+
+    # 每个中点都恰好是三角形边两端点的平均
+    for mid, (p1, p2) in sg.terminal_to_mid.items():
+        assert mid == ((p1[0] + p2[0]) / 2, (p1[1] + p2[1]) / 2)
+
+    path_list = astar.construct_path(
+        layout, sg.nearest_incomp, sg.nearest_outcomp, sg.compo_dict, graph
+    )
+    assert all(path is not None for route in path_list for path in route)
+
+    # 评估器沿用布局的定点网格, 而不是把候选取整
+    evaluator = PlacementEvaluator.from_layout(layout)
+    assert evaluator.evaluate(layout.center) == astar.calcu_length(path_list)
+
+
+def test_fractional_moves_match_rebuild(astar, synthetic_layout):
+    layout = Layout(
+        fractional_rows(synthetic_layout),
+        synthetic_layout.routes,
+        synthetic_layout.ratio,
+        fixed_scale=FIXED_SCALE,
+    )
+    sg = build_sg(layout, canonical=True)
+    rng = np.random.default_rng(5)
+    moved: int = 0
+    while moved < 5:
+        name = layout.names[int(rng.integers(len(layout)))]
+        center = sg.layout.center[sg.layout.name_index[name]] + rng.uniform(-2, 2, 2)
+        try:
+            sg.move_component(name, tuple(center))
+        except ValueError:
+            continue
+        moved += 1
+        assert sg.layout.fixed_scale == FIXED_SCALE
+        assert_same_as_rebuild(astar, sg)
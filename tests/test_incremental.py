@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   test_incremental.py
+@Time    :   2024/09/03 15:21:44
+@Author  :   chenziyang
+@description   :   local CDT / SG updates against a full rebuild
+"""
+
+import numpy as np
+import pytest
+
+from CDT_Graph import SG_graph
+from Chip_Generator import generate_in_memory
+from conftest import build_sg
+
+
+def triangle_set(sg) -> set:
+    return {frozenset(map(tuple, corners)) for corners in sg.point[sg.tri].tolist()}
+
+
+def route_length(astar, sg) -> float:
+    return float(
+        astar.calcu_length(
+            astar.construct_path(
+                sg.layout, sg.nearest_incomp, sg.nearest_outcomp, sg.compo_dict, sg.to_csr()
+            )
+        )
+    )
+
+
+def assert_same_graph(astar, sg, fresh) -> None:
+    assert set(sg.graph.nodes) == set(fresh.graph.nodes)
+    assert set(map(frozenset, sg.graph.edges)) == set(map(frozenset, fresh.graph.edges))
+    assert sg.terminal_to_mid == fresh.terminal_to_mid
+    assert route_length(astar, sg) == route_length(astar, fresh)
+
+
+def assert_same_as_rebuild(astar, sg) -> None:
+    fresh = build_sg(sg.layout, canonical=sg.canonical)
+    assert triangle_set(sg) == triangle_set(fresh)
+    assert_same_graph(astar, sg, fresh)
+
+
+def assert_same_as_patched_triangles(astar, sg) -> None:
+    # 用更新后的三角剖分重新建SG
+    fresh = SG_graph("", "", sg.layout.ratio, None, sg.layout, sg.fixed_scale)
+    fresh.point, fresh.tri = sg.point, sg.tri
+    fresh._build_vertex_tri_index()
+    fresh.add_midpoint_to_SG()
+    fresh.add_egdes_to_SG()
+    fresh.add_startarget_to_SG()
+    assert_same_graph(astar, sg, fresh)
+
+
+def test_default_build_keeps_the_library_triangles(synthetic_sg):
+    cdt = synthetic_sg.cdt.CDT
+    np.testing.assert_array_equal(
+        synthetic_sg.tri, np.array([tri.vertices for tri in cdt.triangles])
+    )
+
+
+def test_insertion_order_does_not_change_the_cdt(synthetic_layout):
+    from Layout import Layout
+
+    order = np.random.default_rng(1).permutation(len(synthetic_layout))
+    shuffled = Layout.from_arrays(
+        tuple(synthetic_layout.names[idx] for idx in order),
+        synthetic_layout.center[order],
+        synthetic_layout.size[order],
+        synthetic_layout.routes,
+        synthetic_layout.ratio,
+    )
+    assert triangle_set(build_sg(shuffled, canonical=True)) == triangle_set(
+        build_sg(synthetic_layout, canonical=True)
+    )
+
+
+def test_sequential_moves_match_rebuild(astar):
+    sg = build_sg(generate_in_memory(60, seed=3), canonical=True)
+    rng = np.random.default_rng(7)
+    moved: int = 0
+    while moved < 35:
+        name = sg.layout.names[int(rng.integers(len(sg.layout)))]
+        center = sg.layout.center[sg.layout.name_index[name]] + rng.integers(-4, 5, 2)
+        try:
+            region = sg.move_component(name, tuple(int(v) for v in center))
+        except ValueError:
+            continue
+        moved += 1
+        assert region.ndim == 3 and region.shape[1:] == (2, 2)
+        assert_same_as_rebuild(astar, sg)
+
+
+def test_long_move_keeps_cavities_apart(astar):
+    sg = build_sg(generate_in_memory(60, seed=3), canonical=True)
+    layout = sg.layout
+    # 从左下角移到右上角附近的空位
+    idx = int(np.argmin(layout.center.sum(axis=1)))
+    name = layout.names[idx]
+    half = layout.size[idx][::-1] / 2
+    for target in np.argsort(-layout.center.sum(axis=1)).tolist():
+        center = layout.center[target] + np.array([0, 1]) * (
+            layout.size[target][0] / 2 + half[1] + 3
+        )
+        try:
+            region = sg.move_component(name, tuple(int(v) for v in center))
+        except ValueError:
+            continue
+        break
+    else:
+        pytest.skip("no free place to move the component to")
+    # 两处分别重新剖分, 变化区域是两个不相交的框
+    assert len(region) == 2
+    (low_a, high_a), (low_b, high_b) = region
+    assert (high_a < low_b).any() or (high_b < low_a).any()
+    assert_same_as_rebuild(astar, sg)
+
+
+def test_remove_and_add_match_rebuild(astar):
+    sg = build_sg(generate_in_memory(60, seed=3), canonical=True)
+    name = sg.layout.names[-1]
+    center, size = sg.layout.center[-1], sg.layout.size[-1]
+    sg.remove_component(name)
+    assert_same_as_rebuild(astar, sg)
+    sg.add_component(name, tuple(int(v) for v in center), tuple(int(v) for v in size))
+    assert_same_as_rebuild(astar, sg)
+
+
+def test_default_moves_match_the_patched_triangles(astar):
+    sg = build_sg(generate_in_memory(60, seed=3))
+    rng = np.random.default_rng(7)
+    moved: int = 0
+    while moved < 20:
+        name = sg.layout.names[int(rng.integers(len(sg.layout)))]
+        center = sg.layout.center[sg.layout.name_index[name]] + rng.integers(-4, 5, 2)
+        try:
+            sg.move_component(name, tuple(int(v) for v in center))
+        except ValueError:
+            continue
+        moved += 1
+        assert_same_as_patched_triangles(astar, sg)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   test_layout_cache.py
+@Time    :   2024/09/02 15:32:08
+@Author  :   chenziyang
+@description   :   cache keys of the CDT and SG stages
+"""
+
+import numpy as np
+
+from CDT_Graph import SG_graph
+from Layout_Cache import LayoutCache, layout_key
+
+
+def assert_same_csr(left, right) -> None:
+    for field, arr in left.arrays().items():
+        np.testing.assert_array_equal(arr, right.arrays()[field])
+
+
+def test_cache_hit_and_miss(tmp_path, data1_layout):
+    cache = LayoutCache(str(tmp_path))
+    first = SG_graph(data1_layout.path, data1_layout.input_path, 0.6, cache).build_csr()
+    assert cache.hits == 0
+    second = SG_graph(data1_layout.path, data1_layout.input_path, 0.6, cache).build_csr()
+    assert cache.hits == 2
+    assert_same_csr(first, second)
+
+
+def test_key_follows_in_memory_layout(tmp_path, data1_layout):
+    name = data1_layout.names[0]
+    center = data1_layout.center[0]
+    moved = data1_layout.replace_component(name, (int(center[0]), int(center[1]) + 1))
+    assert moved.path == data1_layout.path
+    for stage in ("cdt", "sg"):
+        assert layout_key(moved.path, stage, moved) != layout_key(
+            data1_layout.path, stage, data1_layout
+        )
+
+    cache = LayoutCache(str(tmp_path))
+    SG_graph(data1_layout.path, data1_layout.input_path, 0.6, cache, data1_layout).build_csr()
+    # 同一文件路径下的不同布局不会读到文件对应的缓存
+    cached = SG_graph(moved.path, moved.input_path, 0.6, cache, moved).build_csr()
+    assert cache.hits == 0
+    fresh = SG_graph(moved.path, moved.input_path, 0.6, None, moved).build_csr()
+    assert_same_csr(cached, fresh)
+
+
+def test_fixed_scale_is_part_of_the_key(tmp_path, data1_layout):
+    cache = LayoutCache(str(tmp_path))
+    path, input_path = data1_layout.path, data1_layout.input_path
+    SG_graph(path, input_path, 0.6, cache).build_csr()
+    # 切换到定点模式, CDT 与 SG 都不能读到浮点模式的缓存
+    fixed = SG_graph(path, input_path, 0.6, cache, fixed_scale=2).build_csr()
+    assert cache.hits == 0
+    assert_same_csr(fixed, SG_graph(path, input_path, 0.6, None, fixed_scale=2).build_csr())
+    SG_graph(path, input_path, 0.6, cache, fixed_scale=2).build_csr()
+    assert cache.hits == 2
+    SG_graph(path, input_path, 0.6, cache).build_csr()
+    assert cache.hits == 4
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   test_negotiated_route.py
+@Time    :   2024/09/04 14:18:53
+@Author  :   chenziyang
+@description   :   PathFinder leaves no overused SG edge once it converges
+"""
+
+from collections import Counter
+
+import numpy as np
+
+from Negotiated_Route import NegotiatedRouter
+
+
+def test_converged_routes_share_no_edge(astar, synthetic_layout, synthetic_sg):
+    sg = synthetic_sg
+    graph = sg.to_csr()
+    router = NegotiatedRouter(graph, sg.compo_dict, capacity=1)
+    path_list, history = router.route(
+        astar.read_routes(synthetic_layout, sg.nearest_incomp, sg.nearest_outcomp)
+    )
+    # 第一轮按边长布线时存在拥塞, 协商后收敛
+    assert history[0]["overused_edges"] > 0
+    assert history[-1]["overused_edges"] == 0
+    assert len(history) < router.max_iterations
+
+    # 由返回的路径重新统计每条边被几条net使用, 组件端口边不限容量
+    corners = set(
+        graph.node_ids(np.concatenate([np.asarray(pos) for pos in sg.compo_dict.values()]))
+        .tolist()
+    )
+    usage: Counter = Counter()
+    for segments in path_list:
+        net_edges: set = set()
+        for path in segments:
+            assert path is not None
+            nodes = graph.node_ids(np.asarray(path)).tolist()
+            assert min(nodes) >= 0
+            net_edges.update(
+                (min(u, v), max(u, v))
+                for u, v in zip(nodes, nodes[1:])
+                if u not in corners and v not in corners
+            )
+        usage.update(net_edges)
+    assert usage and max(usage.values()) == 1
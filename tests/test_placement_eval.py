@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   test_placement_eval.py
+@Time    :   2024/09/04 09:41:26
+@Author  :   chenziyang
+@description   :   candidate layouts and reused search buffers of the evaluator
+"""
+
+import numpy as np
+import pytest
+
+from Layout import Layout
+from Placement_Eval import PlacementEvaluator, jitter_candidates
+
+
+def test_float_centers_are_rounded_not_truncated(synthetic_layout):
+    evaluator = PlacementEvaluator.from_layout(synthetic_layout)
+    center = synthetic_layout.center.astype(np.float64)
+    center[0, 0] += 0.7
+    layout = evaluator.layout(center)
+    assert layout.center[0, 0] == synthetic_layout.center[0, 0] + 1
+    np.testing.assert_array_equal(layout.center[1:], synthetic_layout.center[1:])
+    with pytest.raises(ValueError):
+        Layout.from_arrays(
+            synthetic_layout.names,
+            center,
+            synthetic_layout.size,
+            synthetic_layout.routes,
+            synthetic_layout.ratio,
+        )
+
+
+@pytest.mark.parametrize("mode", ["pairwise", "multi"])
+def test_reused_buffers_give_the_same_routes(synthetic_layout, mode):
+    evaluator = PlacementEvaluator.from_layout(synthetic_layout, mode=mode)
+    for center in jitter_candidates(synthetic_layout, 4, seed=1):
+        try:
+            reused = evaluator.evaluate(center, return_paths=True)
+        except ValueError:
+            continue
+        fresh = PlacementEvaluator.from_layout(synthetic_layout, mode=mode)
+        assert fresh.evaluate(center, return_paths=True) == reused
+
+
+def test_buffers_follow_graphs_of_any_size(astar, data1_sg, synthetic_sg):
+    buffers = astar.SearchBuffers()
+    # 先大图后小图, 小图只用到数组的前一部分
+    for sg in (synthetic_sg, data1_sg, synthetic_sg):
+        graph = sg.to_csr()
+        for start, target in [
+            (sg.compo_dict[a], sg.compo_dict[b])
+            for a, b in zip(list(sg.compo_dict)[:4], list(sg.compo_dict)[1:5])
+        ]:
+            start_ids, target_ids = graph.node_ids(start), graph.node_ids(target)
+            expected = astar._pairwise_search_csr(graph, start_ids, target_ids)
+            found = astar._pairwise_search_csr(
+                graph, start_ids, target_ids, buffers=buffers
+            )
+            assert found[:2] == expected[:2]
+            np.testing.assert_array_equal(found[2], expected[2])
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   test_route_array.py
+@Time    :   2024/09/04 16:02:45
+@Author  :   chenziyang
+@description   :   RouteArray keeps the nested routes through packing and files
+"""
+
+import numpy as np
+import pytest
+
+from Route_Array import RouteArray
+
+
+def assert_same_routes(left: RouteArray, right: RouteArray) -> None:
+    assert left.arrays().keys() == right.arrays().keys()
+    for field, arr in left.arrays().items():
+        np.testing.assert_array_equal(arr, right.arrays()[field])
+
+
+def is_mapped(arr) -> bool:
+    # 视图沿 base 追溯到 np.memmap 即为文件映射
+    while isinstance(arr, np.ndarray):
+        if isinstance(arr, np.memmap):
+            return True
+        arr = arr.base
+    return False
+
+
+def test_nested_list_round_trip(synthetic_paths):
+    # 加入一条未找到路径的段和一条没有段的路径
+    paths = synthetic_paths + [[None, synthetic_paths[0][0]], []]
+    routes = RouteArray.from_paths(paths)
+    assert len(routes) == len(paths)
+    assert routes.to_list() == paths
+    assert routes[-2][0] is None and routes[-1] == []
+
+
+def test_node_ids_match_coordinates(astar, synthetic_layout, synthetic_sg, synthetic_paths):
+    graph = synthetic_sg.to_csr()
+    routes = astar.construct_path(
+        synthetic_layout,
+        synthetic_sg.nearest_incomp,
+        synthetic_sg.nearest_outcomp,
+        synthetic_sg.compo_dict,
+        graph,
+        compact=True,
+    )
+    np.testing.assert_array_equal(graph.coords[routes.node_ids], routes.coords)
+    assert routes.to_list() == synthetic_paths
+    assert astar.calcu_length(routes) == pytest.approx(astar.calcu_length(synthetic_paths))
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_file_round_trip(tmp_path, astar, synthetic_layout, synthetic_sg, mmap):
+    routes = astar.construct_path(
+        synthetic_layout,
+        synthetic_sg.nearest_incomp,
+        synthetic_sg.nearest_outcomp,
+        synthetic_sg.compo_dict,
+        synthetic_sg.to_csr(),
+        compact=True,
+    )
+    routes.save(str(tmp_path / "routes.npz"))
+    assert_same_routes(RouteArray.load(str(tmp_path / "routes.npz")), routes)
+
+    prefix = str(tmp_path / "routes")
+    assert len(routes.save_npy(prefix)) == 4
+    loaded = RouteArray.load(prefix, mmap=mmap)
+    assert is_mapped(loaded.coords) == mmap
+    assert_same_routes(loaded, routes)
+    assert loaded.to_list() == routes.to_list()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@File    :   test_search.py
+@Time    :   2024/09/02 10:40:18
+@Author  :   chenziyang
+@description   :   CSR and networkx backends of the A* search and greedy detail routing
+"""
+
+import numpy as np
+import pytest
+
+
+def netlist_pairs(astar, layout, sg) -> list[tuple[str, str]]:
+    pairs: list[tuple[str, str]] = []
+    for route in astar.read_routes(layout, sg.nearest_incomp, sg.nearest_outcomp):
+        pairs.extend(zip(route[:-1], route[1:]))
+    return list(dict.fromkeys(pairs))
+
+
+@pytest.mark.parametrize("which", ["data1", "synthetic"])
+def test_csr_search_equals_nx(astar, request, which):
+    layout = request.getfixturevalue(f"{which}_layout")
+    sg = request.getfixturevalue(f"{which}_sg")
+    csr = sg.to_csr()
+    for start, target in netlist_pairs(astar, layout, sg):
+        nx_result = astar.find_shortest_path(start, target, sg.compo_dict, sg.graph)
+        csr_result = astar.find_shortest_path(start, target, sg.compo_dict, csr)
+        assert nx_result[:2] == csr_result[:2]
+        assert nx_result[2] == csr_result[2]
+
+
+def corner_segments(csr, paths) -> list[list[tuple]]:
+    """
+    routed segments that pass a component corner between their ends
+    """
+    found: list[list[tuple]] = []
+    for route in paths:
+        for seg in route:
+            if seg is None or len(seg) <= 2:
+                continue
+            if np.isnan(csr.mid_ends[csr.node_ids(seg[1:-1])]).any():
+                found.append(seg)
+    return found
+
+
+def test_greedy_detail_routing_keeps_corners(astar, synthetic_sg, synthetic_paths):
+    csr = synthetic_sg.to_csr()
+    segments = corner_segments(csr, synthetic_paths)
+    assert segments, "the layout should route some segment past a component corner"
+    for seg in segments:
+        is_corner = np.isnan(csr.mid_ends[csr.node_ids(seg[1:-1])]).any(axis=(1, 2))
+        for backend in (csr, synthetic_sg):
+            routed = astar.one_detail_routing(backend, seg, 4)
+            assert len(routed) == len(seg)
+            # 途经的角点原样保留在同一位置
+            for idx in np.flatnonzero(is_corner) + 1:
+                assert tuple(map(float, routed[idx])) == tuple(map(float, seg[idx]))
+
+
+@pytest.mark.parametrize("mode", ["multi", "bidirectional"])
+def test_exact_modes_find_shortest_corner_pair(astar, synthetic_layout, synthetic_sg, mode):
+    csr = synthetic_sg.to_csr()
+    names, distance = synthetic_sg.build_component_distance(csr)
+    for start, target in netlist_pairs(astar, synthetic_layout, synthetic_sg):
+        exact = astar.find_shortest_path(start, target, synthetic_sg.compo_dict, csr, mode)
+        pairwise = astar.find_shortest_path(start, target, synthetic_sg.compo_dict, csr)
+        expect = distance[names.index(start), names.index(target)]
+        if exact[2] is None:
+            assert not np.isfinite(expect)
+            continue
+        exact_length = astar.calcu_length([[exact[2]]])
+        pairwise_length = astar.calcu_length([[pairwise[2]]])
+        assert exact_length == pytest.approx(expect)
+        # pairwise 的启发式不可采纳, 只保证不比最短路径短
+        assert pairwise_length >= exact_length - 1e-9